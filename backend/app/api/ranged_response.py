@@ -0,0 +1,160 @@
+import os
+import stat
+from email.utils import parsedate_to_datetime
+from typing import Optional, Tuple
+
+import anyio
+import anyio.to_thread
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+
+class RangedFileResponse(FileResponse):
+    """
+    支持 HTTP Range 和条件请求的文件响应
+    - Range: bytes=start-end / bytes=-suffix，返回 206 和 Content-Range；多段范围按完整文件返回
+    - If-None-Match / If-Modified-Since 命中时返回 304，If-Range 不匹配时忽略 Range
+    - 服务器支持 ASGI zerocopy / pathsend 扩展时直接交给服务器发送文件
+    """
+    chunk_size = 256 * 1024
+
+    def __init__(self, path: str, media_type: Optional[str] = None, filename: Optional[str] = None):
+        super().__init__(path, media_type=media_type, filename=filename)
+        self.headers["accept-ranges"] = "bytes"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+        except FileNotFoundError:
+            raise RuntimeError(f"File at path {self.path} does not exist.")
+        if not stat.S_ISREG(stat_result.st_mode):
+            raise RuntimeError(f"File at path {self.path} is not a file.")
+
+        self.set_stat_headers(stat_result)
+        file_size = stat_result.st_size
+        request_headers = Headers(scope=scope)
+
+        if self._not_modified(request_headers, stat_result):
+            await self._send_empty(send, 304, keep=("etag", "last-modified", "accept-ranges"))
+            return
+
+        byte_range = None
+        range_header = request_headers.get("range")
+        if range_header and self._if_range_matches(request_headers):
+            byte_range = self._parse_range(range_header, file_size)
+            if byte_range == "unsatisfiable":
+                self.headers["content-range"] = f"bytes */{file_size}"
+                await self._send_empty(send, 416, keep=("content-range", "accept-ranges"))
+                return
+
+        if byte_range is None:
+            # 完整文件沿用 FileResponse 的发送逻辑（含 pathsend 扩展）
+            await super().__call__(scope, receive, send)
+            return
+
+        start, end = byte_range
+        length = end - start + 1
+        self.status_code = 206
+        self.headers["content-range"] = f"bytes {start}-{end}/{file_size}"
+        self.headers["content-length"] = str(length)
+
+        await send({"type": "http.response.start", "status": 206, "headers": self.raw_headers})
+
+        extensions = scope.get("extensions") or {}
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif "http.response.zerocopy" in extensions:
+            with open(self.path, "rb") as file:
+                await send({
+                    "type": "http.response.zerocopy",
+                    "file": file,
+                    "offset": start,
+                    "count": length,
+                    "more_body": False,
+                })
+        else:
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                await file.seek(start)
+                remaining = length
+                while remaining > 0:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    await send({
+                        "type": "http.response.body",
+                        "body": chunk,
+                        "more_body": remaining > 0,
+                    })
+                if remaining > 0:
+                    # 文件在发送过程中被截断
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+        if self.background is not None:
+            await self.background()
+
+    def _not_modified(self, request_headers: Headers, stat_result: os.stat_result) -> bool:
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match:
+            etag = self.headers["etag"]
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or etag in tags
+
+        if_modified_since = request_headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(stat_result.st_mtime) <= since
+
+        return False
+
+    def _if_range_matches(self, request_headers: Headers) -> bool:
+        """If-Range 与当前 ETag 或 Last-Modified 一致时 Range 才有效"""
+        if_range = request_headers.get("if-range")
+        if not if_range:
+            return True
+        return if_range in (self.headers["etag"], self.headers["last-modified"])
+
+    @staticmethod
+    def _parse_range(range_header: str, file_size: int):
+        """
+        解析单段字节范围，返回 (start, end)；
+        无法解析或多段范围返回 None（按完整文件响应），范围越界返回 "unsatisfiable"
+        """
+        unit, _, ranges = range_header.partition("=")
+        if unit.strip().lower() != "bytes" or "," in ranges:
+            return None
+
+        start_text, sep, end_text = ranges.strip().partition("-")
+        if not sep:
+            return None
+
+        try:
+            if not start_text:
+                # bytes=-N 表示最后 N 个字节
+                suffix = int(end_text)
+                if suffix <= 0:
+                    return "unsatisfiable"
+                return max(0, file_size - suffix), file_size - 1
+
+            start = int(start_text)
+            end = int(end_text) if end_text else file_size - 1
+        except ValueError:
+            return None
+
+        if start >= file_size:
+            return "unsatisfiable"
+        if start > end:
+            return None
+        return start, min(end, file_size - 1)
+
+    async def _send_empty(self, send: Send, status_code: int, keep: Tuple[str, ...]):
+        headers = [
+            (name, value) for name, value in self.raw_headers
+            if name.decode("latin-1") in keep
+        ]
+        await send({"type": "http.response.start", "status": status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
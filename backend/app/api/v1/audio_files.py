@@ -1,22 +1,37 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query, BackgroundTasks
 from typing import List, Optional
 import os
+import mimetypes
 import tempfile
 import uuid
 
+from app.api.ranged_response import RangedFileResponse
 from app.services.audio.upload_service import AudioUploadService
 from app.services.audio.ffmpeg_service import FFmpegService
+from app.services.audio.ingest_pipeline import IngestPipeline
+from app.services.audio.peaks import load_peaks
+from app.services.audio.trim_service import TrimService
+from app.config.settings import settings
+from app.models import AudioFile
 
 router = APIRouter()
 
 # 服务实例
 upload_service = AudioUploadService()
 ffmpeg_service = FFmpegService()
+ingest_pipeline = IngestPipeline(ffmpeg_service)
+trim_service = TrimService(upload_service.upload_dir, ffmpeg_service)
+
+
+def _schedule_ingest(background_tasks: BackgroundTasks, result: dict):
+    """上传成功后在响应返回后进行后台分析"""
+    if result.get('upload_success'):
+        background_tasks.add_task(ingest_pipeline.run, result['file_id'], result['file_path'])
 
 
 @router.post("/upload")
 async def upload_audio_file(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     category: str = "dialogue",
     project_id: Optional[str] = None
@@ -31,9 +46,10 @@ async def upload_audio_file(
     
     try:
         result = await upload_service.upload_audio_file(file, category, project_id)
+        _schedule_ingest(background_tasks, result)
         return {
             "success": True,
-            "message": "文件上传成功",
+            "message": "文件上传成功，正在后台分析",
             "data": result
         }
     except Exception as e:
@@ -42,6 +58,7 @@ async def upload_audio_file(
 
 @router.post("/upload/multiple")
 async def upload_multiple_audio_files(
+    background_tasks: BackgroundTasks,
     files: List[UploadFile] = File(...),
     category: str = "dialogue",
     project_id: Optional[str] = None
@@ -59,6 +76,8 @@ async def upload_multiple_audio_files(
     
     try:
         results = await upload_service.upload_multiple_files(files, category, project_id)
+        for result in results:
+            _schedule_ingest(background_tasks, result)
         
         success_count = sum(1 for r in results if r.get('upload_success', False))
         
@@ -72,16 +91,37 @@ async def upload_multiple_audio_files(
 
 
 @router.get("/list")
-async def list_audio_files(project_id: Optional[str] = None):
+async def list_audio_files(
+    project_id: Optional[str] = None,
+    category: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
     """
-    获取已上传的音频文件列表
+    分页获取已上传的音频文件列表
+    cursor 传入上一页返回的 next_cursor；fields 为逗号分隔的字段列表，只返回这些字段
     """
+    valid_categories = ["dialogue", "environment", "theme"]
+    if category and category not in valid_categories:
+        raise HTTPException(status_code=400, detail=f"无效的分类: {category}. 有效分类: {valid_categories}")
+    
     try:
-        files = await upload_service.list_uploaded_files(project_id)
+        page = await upload_service.list_uploaded_files(
+            project_id,
+            category,
+            limit,
+            cursor,
+            [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+        )
         return {
             "success": True,
-            "data": files
+            "data": page["items"],
+            "next_cursor": page["next_cursor"],
+            "has_more": page["has_more"]
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -106,19 +146,47 @@ async def get_audio_file_info(file_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/status/{file_id}")
+async def get_audio_file_status(file_id: str):
+    """
+    查询文件后台分析状态（analyzing/ready/failed）
+    """
+    try:
+        record = await upload_service.get_file_record(
+            file_id, ["file_id", "status", "error_message", "duration", "sample_rate", "channels"]
+        )
+        if not record:
+            raise HTTPException(status_code=404, detail="文件不存在")
+        
+        return {
+            "success": True,
+            "data": AudioFile.serialize(record)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/waveform/{file_id}")
 async def get_audio_waveform(file_id: str, width: int = 800, height: int = 100):
     """
     获取音频文件波形数据
     """
     try:
-        info = await upload_service.get_file_info(file_id)
-        if not info:
-            raise HTTPException(status_code=404, detail="文件不存在")
+        # 优先使用上传后预计算的峰值数据
+        record = await upload_service.get_file_record(file_id, ["peaks_path"])
+        waveform_data = await load_peaks(record and record["peaks_path"], width, settings.PEAKS_RESOLUTION)
         
-        waveform_data = await ffmpeg_service.extract_waveform_data(
-            info['file_path'], width, height
-        )
+        if waveform_data is None:
+            # 波形只需低分辨率数据，优先使用代理文件
+            file_path = await upload_service.get_file_path(file_id, prefer_proxy=True)
+            if not file_path:
+                raise HTTPException(status_code=404, detail="文件不存在")
+            
+            waveform_data = await ffmpeg_service.extract_waveform_data(
+                file_path, width, height
+            )
         
         return {
             "success": True,
@@ -195,19 +263,16 @@ async def download_audio_file(file_id: str):
     下载音频文件
     """
     try:
-        info = await upload_service.get_file_info(file_id)
-        if not info:
-            raise HTTPException(status_code=404, detail="文件不存在")
-        
-        file_path = info['file_path']
-        if not os.path.exists(file_path):
+        file_path = await upload_service.get_file_path(file_id)
+        if not file_path:
             raise HTTPException(status_code=404, detail="文件不存在")
         
         filename = os.path.basename(file_path)
-        return FileResponse(
+        media_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        return RangedFileResponse(
             path=file_path,
             filename=filename,
-            media_type='application/octet-stream'
+            media_type=media_type
         )
     except HTTPException:
         raise
@@ -219,42 +284,36 @@ async def download_audio_file(file_id: str):
 async def trim_audio_file(
     file_id: str,
     start_time: float,
-    duration: float
+    duration: float,
+    background_tasks: BackgroundTasks,
+    mode: str = Query("accurate", description="accurate: 采样精确的 WAV; copy: 流复制保留原编码")
 ):
     """
-    裁剪音频文件
+    裁剪音频文件，相同参数的裁剪结果会被复用
     """
     try:
-        info = await upload_service.get_file_info(file_id)
-        if not info:
+        result = await trim_service.trim(file_id, start_time, duration, mode)
+        if not result:
             raise HTTPException(status_code=404, detail="文件不存在")
         
-        # 生成输出文件路径
-        import uuid
-        trim_id = str(uuid.uuid4())
-        output_filename = f"{trim_id}_trimmed.wav"
-        output_path = os.path.join(upload_service.upload_dir, output_filename)
-        
-        result_path = await ffmpeg_service.trim_audio(
-            info['file_path'], output_path, start_time, duration
-        )
-        
-        # 获取裁剪后文件信息
-        trimmed_info = await ffmpeg_service.get_audio_info(result_path)
+        if not result["cached"]:
+            # 补全波形、响度等分析数据
+            background_tasks.add_task(ingest_pipeline.run, result['file_id'], result['file_path'])
         
         return {
             "success": True,
             "message": "音频裁剪成功",
             "data": {
-                "trim_id": trim_id,
-                "output_path": result_path,
-                "start_time": start_time,
-                "duration": duration,
-                "file_info": trimmed_info
+                **result,
+                "trim_id": result["file_id"],
+                "output_path": result["file_path"],
+                "start_time": start_time
             }
         }
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
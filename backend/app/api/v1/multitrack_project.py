@@ -3,20 +3,46 @@ import json
 import os
 from datetime import datetime
 from typing import List, Optional
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Query, Request
 from app.schemas.multitrack_project import (
     MultitrackProject, 
     MultitrackProjectResponse, 
     MultitrackProjectRequest,
+    ProjectPatchRequest,
+    ProjectPatchResponse,
     ConversionRequest,
     ProjectInfo
 )
+from app.api.ranged_response import RangedFileResponse
+from app.config.settings import settings
+from app.services.audio.encoding_profiles import find_preview_file
+from app.services.audio.render_quality import get_render_quality
 from app.services.multitrack_service import MultitrackService
-from app.services.conversion_service import ConversionService
+from app.services.project_patch_service import RevisionConflictError
+from app.services.conversion_service import ConversionService, ImportRecordError
 
 router = APIRouter()
 
+def _schedule_export(
+    background_tasks: BackgroundTasks,
+    service: MultitrackService,
+    project_id: str,
+    normalize_loudness: bool,
+    render_quality: str
+) -> str:
+    """
+    添加后台导出任务，返回导出任务ID
+    """
+    export_task_id = str(uuid.uuid4())
+    background_tasks.add_task(
+        service.export_project_audio,
+        project_id,
+        export_task_id,
+        normalize_loudness,
+        render_quality
+    )
+    return export_task_id
+
 @router.post("/create", response_model=MultitrackProjectResponse)
 async def create_project(request: MultitrackProjectRequest):
     """
@@ -73,6 +99,36 @@ async def save_project(project_id: str, request: MultitrackProjectRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"保存项目失败: {str(e)}")
 
+@router.patch("/patch/{project_id}", response_model=ProjectPatchResponse)
+async def patch_project(project_id: str, request: ProjectPatchRequest):
+    """
+    增量修改多音轨项目（移动片段、调整音量、增删片段、调整轨道顺序）
+    """
+    try:
+        service = MultitrackService()
+        project = await service.patch_project(
+            project_id, request.operations, request.baseRevision
+        )
+        
+        if not project:
+            raise HTTPException(status_code=404, detail="项目不存在")
+            
+        return ProjectPatchResponse(
+            success=True,
+            revision=project.project.revision,
+            applied=len(request.operations),
+            totalDuration=project.project.totalDuration,
+            message="项目修改成功"
+        )
+    except HTTPException:
+        raise
+    except RevisionConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"修改操作无效: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"修改项目失败: {str(e)}")
+
 @router.get("/list", response_model=List[ProjectInfo])
 async def list_projects():
     """
@@ -114,7 +170,8 @@ async def convert_to_standard_format(request: ConversionRequest):
             dialogue_data=request.dialogueData,
             environment_data=request.environmentData,
             background_music=request.backgroundMusic,
-            project_info=request.projectInfo
+            project_info=request.projectInfo,
+            probe_durations=request.probeDurations
         )
         
         return MultitrackProjectResponse(
@@ -125,29 +182,121 @@ async def convert_to_standard_format(request: ConversionRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"格式转换失败: {str(e)}")
 
+@router.post("/generate")
+async def generate_project(
+    request: ConversionRequest,
+    background_tasks: BackgroundTasks,
+    export: bool = Query(False, description="保存后立即在后台导出音频"),
+    normalize_loudness: bool = Query(False, description="导出时按预先测得的响度归一化各源文件"),
+    render_quality: str = Query(settings.EXPORT_RENDER_QUALITY, description="导出渲染质量: draft/master")
+):
+    """
+    服务端一步完成格式转换、保存项目和（可选）导出，
+    项目数据不再经客户端往返，只返回项目ID和导出任务ID
+    """
+    try:
+        if export:
+            get_render_quality(render_quality)
+        
+        project = await ConversionService().convert_to_standard_format(
+            dialogue_data=request.dialogueData,
+            environment_data=request.environmentData,
+            background_music=request.backgroundMusic,
+            project_info=request.projectInfo,
+            probe_durations=request.probeDurations
+        )
+        service = MultitrackService()
+        project = await service.create_project(project)
+        project_id = project.project.id
+        
+        export_task_id = None
+        if export:
+            export_task_id = _schedule_export(background_tasks, service, project_id, normalize_loudness, render_quality)
+        
+        return {
+            "success": True,
+            "message": "项目已生成" + ("，导出任务已开始" if export else ""),
+            "project_id": project_id,
+            "export_task_id": export_task_id
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"生成项目失败: {str(e)}")
+
+@router.post("/convert/stream")
+async def convert_stream(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    probe_durations: bool = Query(False, description="获取未提供时长的对话音频的实际时长"),
+    export: bool = Query(False, description="保存后立即在后台导出音频"),
+    normalize_loudness: bool = Query(False, description="导出时按预先测得的响度归一化各源文件"),
+    render_quality: str = Query(settings.EXPORT_RENDER_QUALITY, description="导出渲染质量: draft/master")
+):
+    """
+    流式导入：请求体为 NDJSON（每行一条 project/dialogue/environment/background 记录），
+    边接收边构建项目并直接保存，只返回项目概要，适合数万行的长篇输入；可同时开始导出
+    """
+    try:
+        if export:
+            get_render_quality(render_quality)
+        
+        project = await ConversionService().convert_ndjson_stream(request.stream(), probe_durations)
+        service = MultitrackService()
+        project = await service.create_project(project)
+        
+        export_task_id = None
+        if export:
+            export_task_id = _schedule_export(
+                background_tasks, service, project.project.id, normalize_loudness, render_quality
+            )
+        
+        return {
+            "success": True,
+            "message": "导入成功",
+            "data": {
+                "project_id": project.project.id,
+                "title": project.project.title,
+                "totalDuration": project.project.totalDuration,
+                "tracks": {track.type.value: len(track.clips) for track in project.tracks},
+                "markers": len(project.markers),
+                "export_task_id": export_task_id
+            }
+        }
+    except HTTPException:
+        raise
+    except ImportRecordError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"导入失败: {str(e)}")
+
 @router.post("/export/{project_id}")
-async def export_project(project_id: str, background_tasks: BackgroundTasks):
+async def export_project(
+    project_id: str,
+    background_tasks: BackgroundTasks,
+    normalize_loudness: bool = Query(False, description="按预先测得的响度归一化各源文件"),
+    render_quality: str = Query(settings.EXPORT_RENDER_QUALITY, description="渲染质量: draft/master")
+):
     """
     导出多音轨项目为音频文件
     """
     try:
+        # 渲染质量在后台任务开始前校验
+        get_render_quality(render_quality)
         service = MultitrackService()
         
-        # 生成导出任务ID
-        export_task_id = str(uuid.uuid4())
-        
         # 添加后台导出任务
-        background_tasks.add_task(
-            service.export_project_audio, 
-            project_id, 
-            export_task_id
-        )
+        export_task_id = _schedule_export(background_tasks, service, project_id, normalize_loudness, render_quality)
         
         return {
             "success": True,
             "export_task_id": export_task_id,
             "message": "导出任务已开始，请查询任务状态"
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"启动导出任务失败: {str(e)}")
 
@@ -175,7 +324,7 @@ async def download_exported_audio(export_task_id: str):
         if not file_path or not os.path.exists(file_path):
             raise HTTPException(status_code=404, detail="导出文件不存在")
             
-        return FileResponse(
+        return RangedFileResponse(
             path=file_path,
             filename=f"multitrack_export_{export_task_id}.wav",
             media_type='audio/wav'
@@ -201,7 +350,11 @@ async def validate_project(project_id: str):
 async def preview_project_audio(
     project_id: str,
     start_time: float = 0,
-    duration: Optional[float] = None
+    duration: Optional[float] = None,
+    format: str = Query(settings.PREVIEW_FORMAT, description="预览编码: wav/opus/aac/mp3"),
+    quality: str = Query(settings.PREVIEW_QUALITY, description="压缩格式码率档位: low/medium/high"),
+    normalize_loudness: bool = Query(False, description="按预先测得的响度归一化各源文件"),
+    render_quality: str = Query(settings.PREVIEW_RENDER_QUALITY, description="渲染质量: draft/master")
 ):
     """
     生成项目音频预览，用于实时播放
@@ -209,7 +362,7 @@ async def preview_project_audio(
     try:
         service = MultitrackService()
         result = await service.generate_preview_audio(
-            project_id, start_time, duration
+            project_id, start_time, duration, format, quality, normalize_loudness, render_quality
         )
         
         if result:
@@ -220,12 +373,19 @@ async def preview_project_audio(
                     "preview_file": result["preview_file"],
                     "start_time": start_time,
                     "duration": result["duration"],
-                    "sample_rate": result.get("sample_rate", 44100)
+                    "sample_rate": result.get("sample_rate", 44100),
+                    "format": result["format"],
+                    "media_type": result["media_type"],
+                    "bitrate": result["bitrate"]
                 }
             }
         else:
             raise HTTPException(status_code=404, detail="项目不存在或生成失败")
             
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"生成预览失败: {str(e)}")
 
@@ -236,15 +396,15 @@ async def download_preview_audio(file_id: str):
     """
     try:
         # 使用绝对路径，确保文件在backend目录下的outputs文件夹
-        file_path = os.path.abspath(f"outputs/preview_{file_id}.wav")
+        file_path, profile = find_preview_file(os.path.abspath("outputs"), file_id)
         
-        if not os.path.exists(file_path):
+        if not file_path:
             raise HTTPException(status_code=404, detail="预览文件不存在")
         
-        return FileResponse(
+        return RangedFileResponse(
             path=file_path,
-            filename=f"preview_{file_id}.wav",
-            media_type='audio/wav'
+            filename=os.path.basename(file_path),
+            media_type=profile.media_type
         )
         
     except HTTPException:
@@ -13,8 +13,72 @@ class Settings:
     # 音频处理相关
     AUDIO_OUTPUT_DIR = os.getenv("AUDIO_OUTPUT_DIR", "./outputs")
     FFmpeg_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+    # 同时运行的 FFmpeg/FFprobe 进程数上限，超出的调用排队等待
+    FFMPEG_MAX_PROCESSES = int(os.getenv("FFMPEG_MAX_PROCESSES", "8"))
     
+    # 项目存储
+    # 增量修改日志累计多少条后合并为完整快照
+    PROJECT_OPLOG_COMPACT_THRESHOLD = int(os.getenv("PROJECT_OPLOG_COMPACT_THRESHOLD", "50"))
+    # 进程内缓存的已解析项目数量上限
+    PROJECT_CACHE_SIZE = int(os.getenv("PROJECT_CACHE_SIZE", "64"))
+    # 项目验证：同一轨道相邻片段间隔超过该值（秒）时报告空隙
+    VALIDATION_GAP_THRESHOLD = float(os.getenv("VALIDATION_GAP_THRESHOLD", "5.0"))
+    # 片段时长超过源文件时长的容差（秒）
+    VALIDATION_DURATION_TOLERANCE = float(os.getenv("VALIDATION_DURATION_TOLERANCE", "0.05"))
+
+    # 上传后台分析：同时分析的文件数、波形峰值预计算点数及存储目录
+    INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "2"))
+    PEAKS_RESOLUTION = int(os.getenv("PEAKS_RESOLUTION", "2000"))
+    PEAKS_DIR = os.getenv("PEAKS_DIR", "uploads/peaks")
+    # 批量导入：同时运行的 ffprobe 进程数上限与进程内时长缓存条数
+    IMPORT_PROBE_CONCURRENCY = int(os.getenv("IMPORT_PROBE_CONCURRENCY", "8"))
+    IMPORT_PROBE_CACHE_SIZE = int(os.getenv("IMPORT_PROBE_CACHE_SIZE", "10000"))
+    # 响度归一化：目标综合响度（LUFS）与真峰值上限（dBTP）
+    LOUDNESS_TARGET_LUFS = float(os.getenv("LOUDNESS_TARGET_LUFS", "-16.0"))
+    LOUDNESS_TRUE_PEAK_CEILING = float(os.getenv("LOUDNESS_TRUE_PEAK_CEILING", "-1.0"))
+    # 循环片段接缝处的交叉淡化时长（秒）
+    LOOP_CROSSFADE = float(os.getenv("LOOP_CROSSFADE", "0.5"))
+    # 变速片段的渲染缓存目录（按源文件和速度缓存变速后的 PCM）
+    STRETCH_CACHE_DIR = os.getenv("STRETCH_CACHE_DIR", "uploads/stretched")
+    # 代理文件：上传后在后台生成低采样率副本，预览混音和波形提取使用代理，导出使用原始文件
+    PROXY_ENABLED = os.getenv("PROXY_ENABLED", "true").lower() == "true"
+    PROXY_DIR = os.getenv("PROXY_DIR", "uploads/proxies")
+    PROXY_FORMAT = os.getenv("PROXY_FORMAT", "wav")
+    PROXY_SAMPLE_RATE = int(os.getenv("PROXY_SAMPLE_RATE", "22050"))
+    PROXY_CHANNELS = int(os.getenv("PROXY_CHANNELS", "1"))
+    # 工作副本：入库时转换为统一采样率和声道数的 PCM，混音时不再逐次重采样
+    WORKING_COPY_ENABLED = os.getenv("WORKING_COPY_ENABLED", "true").lower() == "true"
+    WORKING_DIR = os.getenv("WORKING_DIR", "uploads/working")
+    WORKING_SAMPLE_RATE = int(os.getenv("WORKING_SAMPLE_RATE", "44100"))
+    WORKING_CHANNELS = int(os.getenv("WORKING_CHANNELS", "2"))
+    # 预览是否使用代理文件
+    PREVIEW_USE_PROXIES = os.getenv("PREVIEW_USE_PROXIES", "true").lower() == "true"
+
+    # 预览音频默认编码（wav/opus/aac/mp3）与码率档位（low/medium/high）
+    PREVIEW_FORMAT = os.getenv("PREVIEW_FORMAT", "wav")
+    PREVIEW_QUALITY = os.getenv("PREVIEW_QUALITY", "medium")
+    # 混音渲染质量（重采样器配置）：draft 速度优先，master 音质优先
+    PREVIEW_RENDER_QUALITY = os.getenv("PREVIEW_RENDER_QUALITY", "draft")
+    EXPORT_RENDER_QUALITY = os.getenv("EXPORT_RENDER_QUALITY", "master")
+
+    # 链路追踪导出：none（不输出）、console（输出到 stderr）或 file（追加写入 TRACE_FILE）
+    TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none").lower()
+    TRACE_FILE = os.getenv("TRACE_FILE", "logs/traces.jsonl")
+
     # 数据库配置
     DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./sound_edit.db")
+    # 异步驱动URL，未设置时由 DATABASE_URL 推导（sqlite -> sqlite+aiosqlite）
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "")
+    # 连接池
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    # SQLite 性能配置: default（SQLite 默认行为）或 performance（WAL 等调优）
+    DB_PROFILE = os.getenv("DB_PROFILE", "performance")
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "10000"))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "32768"))
 
 settings = Settings()
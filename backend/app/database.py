@@ -1,24 +1,140 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from app.config.settings import settings
 
+# 异步驱动对应的数据库URL前缀
+_ASYNC_DRIVERS = {
+    "sqlite://": "sqlite+aiosqlite://",
+    "postgresql://": "postgresql+asyncpg://",
+    "mysql://": "mysql+aiomysql://",
+}
+
+
+def _async_database_url(url: str) -> str:
+    """根据同步数据库URL推导异步驱动URL"""
+    for prefix, async_prefix in _ASYNC_DRIVERS.items():
+        if url.startswith(prefix):
+            return async_prefix + url[len(prefix):]
+    return url
+
+
+def _pool_options(url: str, poolclass) -> dict:
+    """连接池配置（内存 SQLite 只能使用单连接，不做池化配置）"""
+    if "sqlite" in url and (":memory:" in url or url.rstrip("/").endswith("sqlite:")):
+        return {}
+    return {
+        # aiosqlite 默认不使用连接池，显式指定
+        "poolclass": poolclass,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+def sqlite_pragmas(profile: str) -> dict:
+    """
+    SQLite 性能配置
+    default: 保持 SQLite 默认行为
+    performance: WAL 日志（读写互不阻塞）、synchronous=NORMAL、加大忙等待和页缓存
+    """
+    if profile == "default":
+        return {}
+    if profile == "performance":
+        return {
+            "journal_mode": settings.SQLITE_JOURNAL_MODE,
+            "synchronous": settings.SQLITE_SYNCHRONOUS,
+            "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+            # 负数表示以 KiB 为单位
+            "cache_size": -settings.SQLITE_CACHE_SIZE_KB,
+            "temp_store": "MEMORY",
+        }
+    raise ValueError(f"未知的数据库性能配置: {profile}")
+
+
+def _apply_sqlite_pragmas(sync_engine, profile: str):
+    """在每个新建连接上执行 PRAGMA"""
+    pragmas = sqlite_pragmas(profile)
+    if not pragmas or sync_engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(sync_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def create_database_engine(url: str, profile: str = settings.DB_PROFILE):
+    """创建同步数据库引擎"""
+    sync_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False} if "sqlite" in url else {},
+        **_pool_options(url, QueuePool)
+    )
+    _apply_sqlite_pragmas(sync_engine, profile)
+    return sync_engine
+
+
+def create_async_database_engine(url: str, profile: str = settings.DB_PROFILE):
+    """创建异步数据库引擎"""
+    engine_ = create_async_engine(url, **_pool_options(url, AsyncAdaptedQueuePool))
+    _apply_sqlite_pragmas(engine_.sync_engine, profile)
+    return engine_
+
+
 # 创建数据库引擎
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
-)
+engine = create_database_engine(settings.DATABASE_URL)
 
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 异步引擎与会话工厂：供 async 接口使用，避免数据库操作阻塞事件循环
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or _async_database_url(settings.DATABASE_URL)
+async_engine = create_async_database_engine(ASYNC_DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 # 创建基础模型类
 Base = declarative_base()
 
+def ensure_columns():
+    """create_all 不会为已存在的表补加新列，这里为缺失的可空列执行 ALTER TABLE ADD COLUMN"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+def ensure_indexes():
+    """create_all 不会为已存在的表补建索引，这里逐个检查并创建"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
 def get_db():
     """获取数据库会话"""
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    """获取异步数据库会话"""
+    async with AsyncSessionLocal() as db:
+        yield db
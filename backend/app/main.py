@@ -1,23 +1,75 @@
 from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from app.api.v1 import audio_editor, multitrack_project, audio_files
-from app.database import engine
+from app.database import engine, async_engine, ensure_columns, ensure_indexes
 from app.models import Base
+from app.services.metrics import registry
+from app.services.tracing import tracer, parse_traceparent
 
 
 app = FastAPI(title="sound-Edit 多轨音频合成服务")
 
 # 创建数据库表
 Base.metadata.create_all(bind=engine)
+ensure_columns()
+ensure_indexes()
+
+@app.on_event("shutdown")
+async def dispose_database_engines():
+    """关闭异步连接池，释放数据库连接"""
+    await async_engine.dispose()
+
+class TracingMiddleware:
+    """
+    为 /api 下的每个请求创建服务端 span，接口、服务和 FFmpeg 子进程的 span 都挂在其下；
+    请求头带 traceparent 时延续调用方的 trace
+    纯 ASGI 中间件：只包装 send 记录状态码，消息原样转发，
+    下载接口的 zerocopy/pathsend 等扩展消息不经过额外的内存流
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+        
+        method, path = scope["method"], scope["path"]
+        parent = parse_traceparent(Headers(scope=scope).get("traceparent"))
+        with tracer.span(f"{method} {path}", kind="server", parent=parent, **{
+            "http.request.method": method,
+            "url.path": path,
+        }) as span:
+            async def send_wrapper(message: Message):
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    span.set_attribute("http.response.status_code", status_code)
+                    if status_code >= 500:
+                        span.set_error(f"HTTP {status_code}")
+                await send(message)
+            
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                # 路由匹配后以路由模板命名，便于按接口聚合
+                route = scope.get("route")
+                if route is not None:
+                    span.name = f"{method} {route.path}"
+                    span.set_attribute("http.route", route.path)
+                for name, value in (scope.get("path_params") or {}).items():
+                    span.set_attribute(f"url.path_param.{name}", value)
+
+app.add_middleware(TracingMiddleware)
 
 # 配置 CORS
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["*"],
 )
 
@@ -30,7 +82,7 @@ app.include_router(audio_files.router, prefix="/api/v1/audio-files", tags=["Audi
 async def options_handler(full_path: str):
     return Response(headers={
         "Access-Control-Allow-Origin": "*",
-        "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
+        "Access-Control-Allow-Methods": "GET, POST, PUT, PATCH, DELETE, OPTIONS",
         "Access-Control-Allow-Headers": "*",
         "Access-Control-Allow-Credentials": "true"
     })
@@ -38,3 +90,8 @@ async def options_handler(full_path: str):
 @app.get("/ping")
 def ping():
     return {"msg": "pong"}
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus 指标（文本格式 0.0.4）"""
+    return Response(content=registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, DateTime, Text, Enum as SQLEnum
+from sqlalchemy import Column, String, Integer, Float, DateTime, Text, Index, Enum as SQLEnum
 from sqlalchemy.sql import func
 from enum import Enum
 from app.database import Base
@@ -9,6 +9,12 @@ class AudioCategory(str, Enum):
     environment = "environment"  # 环境音
     theme = "theme"           # 主题音
 
+class AudioFileStatus(str, Enum):
+    """音频文件处理状态枚举"""
+    analyzing = "analyzing"    # 已保存，后台分析中
+    ready = "ready"            # 分析完成
+    failed = "failed"          # 分析失败（不是有效的音频文件）
+
 class AudioFile(Base):
     """音频文件模型"""
     __tablename__ = "audio_files"
@@ -27,27 +33,53 @@ class AudioFile(Base):
     format = Column(String, nullable=True, comment="音频格式")
     codec = Column(String, nullable=True, comment="编解码器")
     bitrate = Column(Integer, nullable=True, comment="比特率")
+    proxy_path = Column(String, nullable=True, comment="代理文件路径（低采样率单声道，用于预览和波形）")
+    working_path = Column(String, nullable=True, comment="工作副本路径（统一采样率和声道数的 PCM，用于混音）")
+    working_sample_rate = Column(Integer, nullable=True, comment="工作副本采样率")
+    peaks_path = Column(String, nullable=True, comment="预计算波形峰值数据路径")
+    loudness_lufs = Column(Float, nullable=True, comment="EBU R128 综合响度(LUFS)")
+    true_peak_db = Column(Float, nullable=True, comment="真峰值(dBTP)")
+    
+    # 后台分析状态（旧记录为空，视为 ready）
+    status = Column(SQLEnum(AudioFileStatus), nullable=True, default=AudioFileStatus.ready, comment="处理状态")
+    error_message = Column(Text, nullable=True, comment="分析失败原因")
     
     # 时间戳
     created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="创建时间")
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), comment="更新时间")
     
+    __table_args__ = (
+        # 列表接口按项目/分类过滤并按 (创建时间, file_id) 倒序游标分页
+        Index("ix_audio_files_project_created", "project_id", "created_at", "file_id"),
+        Index("ix_audio_files_category_created", "category", "created_at", "file_id"),
+        Index("ix_audio_files_created", "created_at", "file_id"),
+    )
+    
+    # 列表接口允许投影的字段
+    LIST_FIELDS = (
+        "file_id", "original_name", "file_path", "category", "project_id", "file_size",
+        "duration", "sample_rate", "channels", "format", "codec", "bitrate", "loudness_lufs",
+        "true_peak_db", "proxy_path", "working_path", "status", "error_message", "created_at",
+    )
+    
     def to_dict(self):
         """转换为字典格式"""
-        return {
-            "file_id": self.file_id,
-            "original_name": self.original_name,
-            "filename": self.original_name,  # 兼容前端
-            "file_path": self.file_path,
-            "category": self.category.value if self.category else "dialogue",
-            "project_id": self.project_id,
-            "file_size": self.file_size,
-            "duration": self.duration,
-            "sample_rate": self.sample_rate,
-            "channels": self.channels,
-            "format": self.format,
-            "codec": self.codec,
-            "bitrate": self.bitrate,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-            "upload_time": self.created_at.timestamp() if self.created_at else None,
-        }
\ No newline at end of file
+        return self.serialize({field: getattr(self, field) for field in self.LIST_FIELDS})
+    
+    @staticmethod
+    def serialize(values: dict) -> dict:
+        """将字段值（完整对象或列投影的查询结果）转换为接口字典格式"""
+        data = dict(values)
+        if "original_name" in data:
+            data["filename"] = data["original_name"]  # 兼容前端
+        if "category" in data:
+            category = data["category"]
+            data["category"] = category.value if category else "dialogue"
+        if "status" in data:
+            status = data["status"]
+            data["status"] = status.value if status else AudioFileStatus.ready.value
+        if "created_at" in data:
+            created_at = data["created_at"]
+            data["created_at"] = created_at.isoformat() if created_at else None
+            data["upload_time"] = created_at.timestamp() if created_at else None
+        return data
\ No newline at end of file
@@ -20,6 +20,7 @@ class ProjectInfo(BaseModel):
     exportFormat: str = Field("wav", description="导出格式")
     createdAt: Optional[datetime] = Field(None, description="创建时间")
     version: str = Field("1.0", description="格式版本")
+    revision: int = Field(0, description="修订号（每次保存或增量修改后递增）")
 
 class Character(BaseModel):
     id: str = Field(..., description="角色唯一标识")
@@ -34,10 +35,12 @@ class AudioClip(BaseModel):
     filePath: str = Field(..., description="音频文件路径")
     startTime: float = Field(..., description="开始时间（秒）")
     duration: float = Field(..., description="持续时间（秒）")
+    sourceStart: float = Field(0.0, description="源文件入点（秒），非破坏性裁剪")
+    sourceEnd: Optional[float] = Field(None, description="源文件出点（秒），为空时播放到 sourceStart + duration")
     volume: float = Field(1.0, description="片段音量")
     fadeIn: float = Field(0.0, description="淡入时长（秒）")
     fadeOut: float = Field(0.0, description="淡出时长（秒）")
-    playbackRate: float = Field(1.0, description="播放速度")
+    playbackRate: float = Field(1.0, gt=0, description="播放速度（变速不变调）")
     loop: Optional[bool] = Field(False, description="是否循环播放")
     character: Optional[Character] = Field(None, description="角色信息（对话轨专用）")
     text: Optional[str] = Field(None, description="原始文本内容")
@@ -75,6 +78,42 @@ class MultitrackProjectResponse(BaseModel):
 class MultitrackProjectRequest(BaseModel):
     project: MultitrackProject = Field(..., description="多音轨项目数据")
 
+# 增量修改（patch）的数据模型
+class PatchOpType(str, Enum):
+    move_clip = "move_clip"
+    set_volume = "set_volume"
+    add_clip = "add_clip"
+    remove_clip = "remove_clip"
+    reorder_tracks = "reorder_tracks"
+    trim_clip = "trim_clip"
+
+class ProjectPatchOperation(BaseModel):
+    """单个增量修改操作"""
+    op: PatchOpType = Field(..., description="操作类型")
+    trackId: Optional[str] = Field(None, description="目标轨道ID")
+    clipId: Optional[str] = Field(None, description="目标片段ID")
+    targetTrackId: Optional[str] = Field(None, description="移动片段时的目标轨道ID（跨轨移动）")
+    startTime: Optional[float] = Field(None, description="新的开始时间（秒）")
+    duration: Optional[float] = Field(None, description="裁剪片段时的新持续时间（秒）")
+    sourceStart: Optional[float] = Field(None, description="裁剪片段时的源文件入点（秒）")
+    sourceEnd: Optional[float] = Field(None, description="裁剪片段时的源文件出点（秒）")
+    volume: Optional[float] = Field(None, description="新的音量，未指定clipId时修改轨道音量")
+    clip: Optional[AudioClip] = Field(None, description="新增的音频片段")
+    index: Optional[int] = Field(None, description="新增片段的插入位置，默认追加到末尾")
+    trackOrder: Optional[List[str]] = Field(None, description="轨道ID的新顺序")
+
+class ProjectPatchRequest(BaseModel):
+    """增量修改请求"""
+    baseRevision: Optional[int] = Field(None, description="客户端所基于的修订号，与服务端不一致时拒绝修改")
+    operations: List[ProjectPatchOperation] = Field(..., description="按顺序执行的操作列表")
+
+class ProjectPatchResponse(BaseModel):
+    success: bool = Field(True, description="操作是否成功")
+    revision: int = Field(..., description="修改后的修订号")
+    applied: int = Field(0, description="已应用的操作数量")
+    totalDuration: float = Field(0.0, description="修改后的项目总时长（秒）")
+    message: Optional[str] = Field(None, description="响应消息")
+
 # 转换工具的数据模型
 class DialogueData(BaseModel):
     """原始角色对话数据格式"""
@@ -91,4 +130,5 @@ class ConversionRequest(BaseModel):
     dialogueData: Dict[str, Any] = Field(..., description="角色对话数据")
     environmentData: Optional[Dict[str, Any]] = Field(None, description="环境音数据")
     backgroundMusic: Optional[Dict[str, Any]] = Field(None, description="背景音乐配置")
-    projectInfo: Optional[Dict[str, Any]] = Field(None, description="项目基本信息") 
\ No newline at end of file
+    projectInfo: Optional[Dict[str, Any]] = Field(None, description="项目基本信息")
+    probeDurations: bool = Field(False, description="批量导入模式：获取未提供时长的对话音频的实际时长") 
\ No newline at end of file
@@ -0,0 +1,87 @@
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.config.settings import settings
+from .ffmpeg_service import FFmpegService
+from .source_resolver import ClipSourceResolver
+
+# 进程内的探测结果缓存：(绝对路径, mtime, 大小) -> 时长，文件被替换后自动失效
+_duration_cache: "OrderedDict[Tuple[str, int, int], float]" = OrderedDict()
+
+
+class DurationProber:
+    """
+    批量获取音频时长
+    先用入库时记录的元数据（AudioFile.duration）和进程内缓存，
+    其余文件以有限并发调用 ffprobe 探测，而不是逐个串行探测
+    """
+
+    def __init__(self, resolver: Optional[ClipSourceResolver] = None,
+                 ffmpeg_service: Optional[FFmpegService] = None,
+                 concurrency: int = settings.IMPORT_PROBE_CONCURRENCY):
+        self.resolver = resolver or ClipSourceResolver()
+        self._ffmpeg_service = ffmpeg_service
+        self.concurrency = max(1, concurrency)
+
+    @property
+    def ffmpeg_service(self) -> FFmpegService:
+        # 所有时长都能从缓存取得时不需要 FFmpeg
+        if self._ffmpeg_service is None:
+            self._ffmpeg_service = FFmpegService()
+        return self._ffmpeg_service
+
+    async def probe_many(self, file_refs: List[str]) -> Dict[str, Optional[float]]:
+        """
+        返回 文件引用 -> 时长（秒），文件不存在或探测失败时为 None
+        """
+        file_refs = [ref for ref in dict.fromkeys(file_refs) if ref]
+        durations: Dict[str, Optional[float]] = {}
+        pending: List[Tuple[str, str, Tuple[str, int, int]]] = []
+
+        for file_ref, source in zip(file_refs, self.resolver.resolve_many(file_refs)):
+            if source is None:
+                durations[file_ref] = None
+            elif source.duration:
+                durations[file_ref] = source.duration
+            else:
+                key = self._cache_key(source.file_path)
+                if key is not None and key in _duration_cache:
+                    _duration_cache.move_to_end(key)
+                    durations[file_ref] = _duration_cache[key]
+                else:
+                    pending.append((file_ref, source.file_path, key))
+
+        if pending:
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def probe(file_path: str) -> Optional[float]:
+                async with semaphore:
+                    try:
+                        return await self.ffmpeg_service.probe_duration(file_path)
+                    except Exception as e:
+                        print(f"探测音频时长失败 {file_path}: {e}")
+                        return None
+
+            results = await asyncio.gather(*(probe(file_path) for _, file_path, _ in pending))
+            for (file_ref, _, key), duration in zip(pending, results):
+                durations[file_ref] = duration
+                if duration and key is not None:
+                    self._remember(key, duration)
+
+        return durations
+
+    @staticmethod
+    def _cache_key(file_path: str) -> Optional[Tuple[str, int, int]]:
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+
+    @staticmethod
+    def _remember(key: Tuple[str, int, int], duration: float):
+        _duration_cache[key] = duration
+        while len(_duration_cache) > settings.IMPORT_PROBE_CACHE_SIZE:
+            _duration_cache.popitem(last=False)
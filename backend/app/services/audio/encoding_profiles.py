@@ -0,0 +1,80 @@
+import os
+from typing import Dict, List, Optional
+
+
+class EncodingProfile:
+    """
+    预览音频编码配置
+    bitrates 为各质量档位的码率，sample_rate 为编码器要求的固定采样率（None 表示沿用项目采样率）
+    """
+    __slots__ = ("name", "extension", "codec", "media_type", "bitrates", "sample_rate", "encoder_options")
+
+    def __init__(self, name: str, extension: str, codec: str, media_type: str,
+                 bitrates: Optional[Dict[str, str]] = None, sample_rate: Optional[int] = None,
+                 encoder_options: Optional[List[str]] = None):
+        self.name = name
+        self.extension = extension
+        self.codec = codec
+        self.media_type = media_type
+        self.bitrates = bitrates or {}
+        self.sample_rate = sample_rate
+        self.encoder_options = encoder_options or []
+
+    def output_sample_rate(self, sample_rate: int) -> int:
+        return self.sample_rate or sample_rate
+
+    def bitrate(self, quality: str) -> Optional[str]:
+        return self.bitrates.get(quality)
+
+    def ffmpeg_args(self, quality: str) -> List[str]:
+        """
+        编码参数：均选用编码器的低复杂度模式，预览生成以速度优先
+        """
+        args = ['-c:a', self.codec, *self.encoder_options]
+        bitrate = self.bitrate(quality)
+        if bitrate:
+            args.extend(['-b:a', bitrate])
+        return args
+
+
+PREVIEW_QUALITIES = ("low", "medium", "high")
+
+PREVIEW_PROFILES: Dict[str, EncodingProfile] = {
+    "wav": EncodingProfile("wav", "wav", "pcm_s16le", "audio/wav"),
+    # Opus 只支持 48kHz 等固定采样率；compression_level 越低编码越快
+    "opus": EncodingProfile(
+        "opus", "opus", "libopus", "audio/ogg",
+        bitrates={"low": "48k", "medium": "64k", "high": "96k"},
+        sample_rate=48000,
+        encoder_options=['-application', 'audio', '-compression_level', '3', '-vbr', 'on']
+    ),
+    # 使用 FFmpeg 内置 AAC 编码器的快速量化模式，moov 前置便于边下边播
+    "aac": EncodingProfile(
+        "aac", "m4a", "aac", "audio/mp4",
+        bitrates={"low": "96k", "medium": "128k", "high": "192k"},
+        encoder_options=['-aac_coder', 'fast', '-movflags', '+faststart']
+    ),
+    "mp3": EncodingProfile(
+        "mp3", "mp3", "libmp3lame", "audio/mpeg",
+        bitrates={"low": "96k", "medium": "128k", "high": "192k"},
+        encoder_options=['-compression_level', '7']
+    ),
+}
+
+
+def get_preview_profile(format: str) -> EncodingProfile:
+    profile = PREVIEW_PROFILES.get((format or "").lower())
+    if profile is None:
+        raise ValueError(f"不支持的预览格式: {format}. 支持的格式: {', '.join(PREVIEW_PROFILES)}")
+    return profile
+
+
+def find_preview_file(output_dir: str, preview_id: str):
+    """
+    按预览ID查找已生成的预览文件，返回 (文件路径, 编码配置)
+    """
+    for profile in PREVIEW_PROFILES.values():
+        file_path = os.path.join(output_dir, f"preview_{preview_id}.{profile.extension}")
+        if os.path.exists(file_path):
+            return file_path, profile
+    return None, None
@@ -2,9 +2,48 @@ import os
 import subprocess
 import json
 import asyncio
+import resource
+import time
 from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 
+from app.config.settings import settings
+from app.services.metrics import registry
+from app.services.tracing import tracer
+from .loudness import parse_ebur128_summary
+
+# 同时运行的 FFmpeg/FFprobe 进程数上限，超出时排队
+_process_semaphore = asyncio.Semaphore(settings.FFMPEG_MAX_PROCESSES)
+
+# 子进程被回收时其 CPU 时间累加到 RUSAGE_CHILDREN，每个进程结束时取增量
+_children_cpu_seconds = sum(resource.getrusage(resource.RUSAGE_CHILDREN)[:2])
+
+FFMPEG_INVOCATIONS = registry.counter(
+    "ffmpeg_invocations_total", "FFmpeg/FFprobe 调用次数", ["operation", "status"]
+)
+FFMPEG_QUEUE_WAIT_SECONDS = registry.histogram(
+    "ffmpeg_queue_wait_seconds", "等待进程槽位的时间（秒）", ["operation"]
+)
+FFMPEG_SPAWN_SECONDS = registry.histogram(
+    "ffmpeg_spawn_seconds", "启动进程耗时（秒）", ["operation"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+FFMPEG_WALL_SECONDS = registry.histogram(
+    "ffmpeg_wall_seconds", "进程从启动到退出的时长（秒）", ["operation"]
+)
+FFMPEG_CPU_SECONDS = registry.counter(
+    "ffmpeg_cpu_seconds_total", "进程消耗的 CPU 时间（用户态+内核态，秒）", ["operation"]
+)
+FFMPEG_INPUT_BYTES = registry.counter(
+    "ffmpeg_input_bytes_total", "输入文件大小之和（字节）", ["operation"]
+)
+FFMPEG_OUTPUT_BYTES = registry.counter(
+    "ffmpeg_output_bytes_total", "输出字节数（输出文件与标准输出）", ["operation"]
+)
+FFMPEG_IN_FLIGHT = registry.gauge(
+    "ffmpeg_processes_in_flight", "正在运行的进程数", ["operation"]
+)
+
 
 class FFmpegService:
     """
@@ -15,6 +54,7 @@ class FFmpegService:
     def __init__(self):
         self.ffmpeg_path = self._find_ffmpeg()
         self.ffprobe_path = self._find_ffprobe()
+        self._soxr_available: Optional[bool] = None
         
     def _find_ffmpeg(self) -> str:
         """查找FFmpeg可执行文件路径"""
@@ -63,6 +103,84 @@ class FFmpegService:
             
         raise RuntimeError("FFprobe未找到")
     
+    async def run_command(self, operation: str, cmd: List[str],
+                          output_path: Optional[str] = None) -> Tuple[int, bytes, bytes]:
+        """
+        执行 FFmpeg/FFprobe 命令，记录指标并创建 span，返回 (返回码, stdout, stderr)
+        operation 为指标中的操作类型（probe/waveform/mix/trim/convert 等），
+        output_path 为输出文件，用于统计输出字节数
+        """
+        with tracer.span(f"ffmpeg.{operation}", **{
+            "ffmpeg.operation": operation,
+            "process.executable.name": os.path.basename(cmd[0]),
+            "ffmpeg.input_count": cmd.count('-i'),
+        }) as span:
+            queued_at = time.perf_counter()
+            async with _process_semaphore:
+                queue_wait = time.perf_counter() - queued_at
+                FFMPEG_QUEUE_WAIT_SECONDS.observe(queue_wait, operation=operation)
+                FFMPEG_IN_FLIGHT.inc(operation=operation)
+                status = "error"
+                try:
+                    input_bytes = self._input_bytes(cmd)
+                    FFMPEG_INPUT_BYTES.inc(input_bytes, operation=operation)
+                    started_at = time.perf_counter()
+                    process = await asyncio.create_subprocess_exec(
+                        *cmd,
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.PIPE
+                    )
+                    spawn_time = time.perf_counter() - started_at
+                    FFMPEG_SPAWN_SECONDS.observe(spawn_time, operation=operation)
+                    
+                    stdout, stderr = await process.communicate()
+                    
+                    FFMPEG_WALL_SECONDS.observe(time.perf_counter() - started_at, operation=operation)
+                    FFMPEG_CPU_SECONDS.inc(self._children_cpu_delta(), operation=operation)
+                    output_bytes = len(stdout)
+                    if output_path and os.path.isfile(output_path):
+                        output_bytes += os.path.getsize(output_path)
+                    FFMPEG_OUTPUT_BYTES.inc(output_bytes, operation=operation)
+                    if process.returncode == 0:
+                        status = "ok"
+                    else:
+                        span.set_error(stderr.decode(errors='ignore')[-500:])
+                    span.set_attributes(**{
+                        "ffmpeg.queue_wait_seconds": queue_wait,
+                        "ffmpeg.spawn_seconds": spawn_time,
+                        "ffmpeg.input_bytes": input_bytes,
+                        "ffmpeg.output_bytes": output_bytes,
+                        "process.exit_code": process.returncode,
+                    })
+                    return process.returncode, stdout, stderr
+                finally:
+                    FFMPEG_IN_FLIGHT.dec(operation=operation)
+                    FFMPEG_INVOCATIONS.inc(operation=operation, status=status)
+    
+    @staticmethod
+    def _input_bytes(cmd: List[str]) -> int:
+        total = 0
+        for flag, value in zip(cmd, cmd[1:]):
+            if flag == '-i' and os.path.isfile(value):
+                total += os.path.getsize(value)
+        # FFprobe 的输入文件是最后一个参数
+        if '-i' not in cmd and os.path.isfile(cmd[-1]):
+            total += os.path.getsize(cmd[-1])
+        return total
+    
+    @staticmethod
+    def _children_cpu_delta() -> float:
+        """
+        自上次调用以来回收的子进程 CPU 时间
+        多个进程几乎同时结束时可能互相计入对方的操作类型，但总量准确
+        """
+        global _children_cpu_seconds
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        total = usage.ru_utime + usage.ru_stime
+        delta = max(0.0, total - _children_cpu_seconds)
+        _children_cpu_seconds = total
+        return delta
+    
     async def get_audio_info(self, file_path: str) -> Dict:
         """
         获取音频文件信息
@@ -80,17 +198,11 @@ class FFmpegService:
         ]
         
         try:
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
+            returncode, stdout, stderr = await self.run_command('probe', cmd)
             
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
+            if returncode != 0:
                 error_msg = stderr.decode() if stderr else "无错误信息"
-                print(f"FFprobe错误 - 返回码: {process.returncode}, 错误信息: {error_msg}")
+                print(f"FFprobe错误 - 返回码: {returncode}, 错误信息: {error_msg}")
                 print(f"FFprobe命令: {' '.join(cmd)}")
                 raise RuntimeError(f"FFprobe执行失败: {error_msg}")
             
@@ -123,6 +235,60 @@ class FFmpegService:
         except Exception as e:
             raise RuntimeError(f"获取音频信息失败: {str(e)}")
     
+    async def probe_duration(self, file_path: str) -> float:
+        """
+        只读取容器时长，比 get_audio_info 输出少，适合批量探测
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"音频文件不存在: {file_path}")
+        
+        cmd = [
+            self.ffprobe_path,
+            '-v', 'error',
+            '-show_entries', 'format=duration',
+            '-of', 'default=noprint_wrappers=1:nokey=1',
+            file_path
+        ]
+        
+        try:
+            returncode, stdout, stderr = await self.run_command('probe', cmd)
+            
+            if returncode != 0:
+                raise RuntimeError(stderr.decode(errors='ignore'))
+            
+            return float(stdout.decode().strip())
+            
+        except Exception as e:
+            raise RuntimeError(f"获取音频时长失败: {str(e)}")
+    
+    async def analyze_loudness(self, file_path: str) -> Dict:
+        """
+        EBU R128 响度分析，返回综合响度（LUFS）和真峰值（dBTP）
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"音频文件不存在: {file_path}")
+        
+        cmd = [
+            self.ffmpeg_path,
+            '-hide_banner',
+            '-nostats',
+            '-i', file_path,
+            '-af', 'ebur128=peak=true',
+            '-f', 'null',
+            '-'
+        ]
+        
+        try:
+            returncode, stdout, stderr = await self.run_command('loudness', cmd)
+            
+            if returncode != 0:
+                raise RuntimeError(stderr.decode(errors='ignore'))
+            
+            return parse_ebur128_summary(stderr.decode(errors='ignore'))
+            
+        except Exception as e:
+            raise RuntimeError(f"响度分析失败: {str(e)}")
+    
     async def convert_audio(self, input_path: str, output_path: str, 
                           format: str = 'wav', sample_rate: int = 44100,
                           channels: int = 2, bitrate: Optional[str] = None) -> str:
@@ -149,15 +315,9 @@ class FFmpegService:
         cmd.append(output_path)
         
         try:
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
+            returncode, stdout, stderr = await self.run_command('convert', cmd, output_path)
             
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
+            if returncode != 0:
                 raise RuntimeError(f"音频转换失败: {stderr.decode()}")
             
             return output_path
@@ -184,15 +344,9 @@ class FFmpegService:
         ]
         
         try:
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            stdout, stderr = await process.communicate()
+            returncode, stdout, stderr = await self.run_command('waveform', cmd)
             
-            if process.returncode != 0:
+            if returncode != 0:
                 raise RuntimeError(f"提取波形失败: {stderr.decode()}")
             
             # 将二进制数据转换为浮点数组
@@ -223,17 +377,26 @@ class FFmpegService:
             raise RuntimeError(f"提取波形失败: {str(e)}")
     
     async def mix_audio_tracks(self, tracks: List[Dict], output_path: str, 
-                             total_duration: float, sample_rate: int = 44100) -> str:
+                             total_duration: float, sample_rate: int = 44100,
+                             encoder_args: Optional[List[str]] = None,
+                             resampler_options: Optional[str] = None) -> str:
         """
         混合多个音轨
+        encoder_args: 输出编码参数（如 ['-c:a', 'libopus', '-b:a', '64k']），默认由输出扩展名决定
+        resampler_options: 重采样器参数（如 'resampler=soxr:precision=28'），
+                           指定时每个输入显式重采样到 sample_rate，否则由 FFmpeg 按默认设置自动插入
         tracks: [
             {
                 'file_path': str,
                 'start_time': float,
+                'source_start': float,  # 源文件入点（可选）
                 'duration': float,
                 'volume': float,
                 'fade_in': float,
-                'fade_out': float
+                'fade_out': float,
+                'loop': bool,           # 循环播放（可选），需同时提供 loop_length
+                'loop_length': float,   # 循环单元在源文件中的长度（秒）
+                'loop_offset': float    # 从循环序列的该位置开始播放（秒，可选）
             }
         ]
         """
@@ -246,29 +409,41 @@ class FFmpegService:
         # 构建复杂的FFmpeg命令
         cmd = [self.ffmpeg_path]
         
-        # 添加所有输入文件
-        input_files = []
-        for i, track in enumerate(tracks):
-            if os.path.exists(track['file_path']):
-                cmd.extend(['-i', track['file_path']])
-                input_files.append(i)
+        # 每个源文件只检查一次是否存在（多个片段常引用同一文件）
+        existing = {path: os.path.exists(path) for path in {track['file_path'] for track in tracks}}
+        valid_tracks = [track for track in tracks if existing[track['file_path']]]
         
-        if not input_files:
+        if not valid_tracks:
             raise ValueError("没有有效的音频文件")
         
+        # 添加所有输入文件：按片段入点定位并限制读取时长，只解码实际播放的部分
+        # 循环片段只读取一个循环单元，在滤镜图中平铺；另以单元开头的几百毫秒作为接缝交叉淡化的输入
+        input_index = []
+        loop_heads = {}
+        for i, track in enumerate(valid_tracks):
+            read_duration = track['loop_length'] if track.get('loop') else track.get('duration', 0)
+            input_index.append(self._append_input(cmd, track['file_path'], track.get('source_start', 0), read_duration))
+            if track.get('loop'):
+                crossfade = min(settings.LOOP_CROSSFADE, track['loop_length'] / 4)
+                if crossfade > 0:
+                    head_index = self._append_input(cmd, track['file_path'], track.get('source_start', 0), crossfade)
+                    loop_heads[i] = (head_index, crossfade)
+        
         # 构建滤镜图
         filter_complex = []
         
-        for i, track in enumerate(tracks):
-            if not os.path.exists(track['file_path']):
-                continue
-                
-            input_idx = input_files.index(i) if i in input_files else None
-            if input_idx is None:
-                continue
+        for i, track in enumerate(valid_tracks):
+            input_label = f"[{input_index[i]}:a]"
+            if track.get('loop'):
+                filter_complex.append(
+                    self._loop_filter(i, input_index[i], loop_heads.get(i), track, sample_rate, resampler_options)
+                )
+                input_label = f"[loop{i}]"
+            elif resampler_options is not None:
+                input_label += f"{self._aresample(sample_rate, resampler_options)},"
             
             # 音量调节
-            volume_filter = f"[{input_idx}:a]volume={track['volume']}"
+            volume_filter = f"{input_label}volume={track['volume']}"
             
             # 淡入淡出
             if track.get('fade_in', 0) > 0:
@@ -286,9 +461,8 @@ class FFmpegService:
             filter_complex.append(volume_filter)
         
         # 混合所有音轨
-        mix_inputs = ''.join([f"[a{i}]" for i, track in enumerate(tracks) 
-                             if os.path.exists(track['file_path'])])
-        mix_filter = f"{mix_inputs}amix=inputs={len([t for t in tracks if os.path.exists(t['file_path'])])}:duration=longest[out]"
+        mix_inputs = ''.join([f"[a{i}]" for i in range(len(valid_tracks))])
+        mix_filter = f"{mix_inputs}amix=inputs={len(valid_tracks)}:duration=longest[out]"
         filter_complex.append(mix_filter)
         
         # 添加滤镜复合参数
@@ -298,20 +472,15 @@ class FFmpegService:
             '-ar', str(sample_rate),
             '-ac', '2',  # 立体声输出
             '-t', str(total_duration),  # 限制输出时长
+            *(encoder_args or []),
             '-y',  # 覆盖输出文件
             output_path
         ])
         
         try:
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            stdout, stderr = await process.communicate()
+            returncode, stdout, stderr = await self.run_command('mix', cmd, output_path)
             
-            if process.returncode != 0:
+            if returncode != 0:
                 raise RuntimeError(f"音频混合失败: {stderr.decode()}")
             
             return output_path
@@ -319,10 +488,58 @@ class FFmpegService:
         except Exception as e:
             raise RuntimeError(f"音频混合失败: {str(e)}")
     
+    @staticmethod
+    def _append_input(cmd: List[str], file_path: str, source_start: float, duration: float) -> int:
+        """
+        添加一个输入文件，返回其输入序号
+        """
+        if source_start > 0:
+            cmd.extend(['-ss', str(source_start)])
+        if duration > 0:
+            cmd.extend(['-t', str(duration)])
+        cmd.extend(['-i', file_path])
+        return cmd.count('-i') - 1
+    
+    @staticmethod
+    def _aresample(sample_rate: int, resampler_options: Optional[str] = None) -> str:
+        if resampler_options:
+            return f"aresample={sample_rate}:{resampler_options}"
+        return f"aresample={sample_rate}"
+    
+    def _loop_filter(self, index: int, body_index: int, head: Optional[Tuple[int, float]],
+                     track: Dict, sample_rate: int, resampler_options: Optional[str] = None) -> str:
+        """
+        循环片段的滤镜链：循环单元只解码一次，在内存中平铺并在接缝处交叉淡化
+        循环单元 = 源片段去掉开头 X 秒，其结尾 X 秒与开头 X 秒（head 输入）交叉淡化，
+        单元首尾与下一单元衔接连续；aloop 按单元采样数重复，最后按片段时长截断
+        """
+        head_index, crossfade = head or (None, 0.0)
+        unit_samples = max(1, round((track['loop_length'] - crossfade) * sample_rate))
+        loop_offset = track.get('loop_offset', 0)
+        end = loop_offset + track.get('duration', 0)
+        
+        aresample = self._aresample(sample_rate, resampler_options)
+        chain = f"[{body_index}:a]{aresample}"
+        if head_index is not None:
+            chain += (
+                f",atrim=start={crossfade},asetpts=PTS-STARTPTS[lbody{index}];"
+                f"[{head_index}:a]{aresample}[lhead{index}];"
+                f"[lbody{index}][lhead{index}]acrossfade=d={crossfade}:c1=tri:c2=tri"
+            )
+        chain += (
+            f",aloop=loop=-1:size={unit_samples},asetpts=N/SR/TB"
+            f",atrim=start={loop_offset}:end={end},asetpts=PTS-STARTPTS[loop{index}]"
+        )
+        return chain
+    
     async def trim_audio(self, input_path: str, output_path: str, 
-                        start_time: float, duration: float) -> str:
+                        start_time: float, duration: float,
+                        stream_copy: bool = False) -> str:
         """
         裁剪音频片段
+        -ss 放在 -i 之前做输入端定位，直接跳到起点附近而不是从头解码。
+        stream_copy=True 时复制原编码（无损但只能在编码帧边界切分，输出需与源格式相同）；
+        否则只解码所需区间并重新编码为 PCM，切点精确到采样
         """
         if not os.path.exists(input_path):
             raise FileNotFoundError(f"输入文件不存在: {input_path}")
@@ -331,24 +548,23 @@ class FFmpegService:
         
         cmd = [
             self.ffmpeg_path,
-            '-i', input_path,
             '-ss', str(start_time),
+            '-i', input_path,
             '-t', str(duration),
-            '-c', 'copy',  # 复制编码，不重新编码
-            '-y',
-            output_path
+            '-map', '0:a:0'
         ]
         
+        if stream_copy:
+            cmd.extend(['-c:a', 'copy'])  # 复制编码，不重新编码
+        else:
+            cmd.extend(['-c:a', 'pcm_s16le'])
+        
+        cmd.extend(['-y', output_path])
+        
         try:
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
+            returncode, stdout, stderr = await self.run_command('trim', cmd, output_path)
             
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
+            if returncode != 0:
                 raise RuntimeError(f"音频裁剪失败: {stderr.decode()}")
             
             return output_path
@@ -356,6 +572,61 @@ class FFmpegService:
         except Exception as e:
             raise RuntimeError(f"音频裁剪失败: {str(e)}")
     
+    async def time_stretch(self, input_path: str, output_path: str, rate: float) -> str:
+        """
+        变速不变调：按 rate 倍速重新渲染整个文件，输出 PCM WAV（保持原采样率和声道）
+        atempo 单级只支持 0.5~2.0 倍，超出范围时串联多级
+        """
+        if not os.path.exists(input_path):
+            raise FileNotFoundError(f"输入文件不存在: {input_path}")
+        if rate <= 0:
+            raise ValueError("播放速度必须大于0")
+    
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    
+        cmd = [
+            self.ffmpeg_path,
+            '-i', input_path,
+            '-map', '0:a:0',
+            '-af', ','.join(f"atempo={factor}" for factor in self._atempo_factors(rate)),
+            '-c:a', 'pcm_s16le',
+            '-y', output_path
+        ]
+    
+        try:
+            returncode, stdout, stderr = await self.run_command('stretch', cmd, output_path)
+    
+            if returncode != 0:
+                raise RuntimeError(f"音频变速失败: {stderr.decode()}")
+    
+            return output_path
+    
+        except Exception as e:
+            raise RuntimeError(f"音频变速失败: {str(e)}")
+    
+    @staticmethod
+    def _atempo_factors(rate: float) -> List[float]:
+        factors = []
+        while rate > 2.0:
+            factors.append(2.0)
+            rate /= 2.0
+        while rate < 0.5:
+            factors.append(0.5)
+            rate /= 0.5
+        factors.append(round(rate, 6))
+        return factors
+    
+    def supports_soxr(self) -> bool:
+        """检查FFmpeg是否编译了 libsoxr 重采样器（结果缓存）"""
+        if self._soxr_available is None:
+            try:
+                result = subprocess.run([self.ffmpeg_path, '-hide_banner', '-buildconf'],
+                                        capture_output=True, text=True)
+                self._soxr_available = '--enable-libsoxr' in result.stdout
+            except Exception:
+                self._soxr_available = False
+        return self._soxr_available
+    
     def is_available(self) -> bool:
         """检查FFmpeg是否可用"""
         try:
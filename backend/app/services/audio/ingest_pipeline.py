@@ -0,0 +1,136 @@
+import asyncio
+import os
+from typing import Optional
+
+from sqlalchemy import update
+
+from app.config.settings import settings
+from app.database import AsyncSessionLocal
+from app.models import AudioFile, AudioFileStatus
+from .ffmpeg_service import FFmpegService
+from .peaks import save_peaks
+from .proxy_service import ProxyService
+from .working_copy_service import WorkingCopyService
+
+# 同时进行分析的文件数上限，避免批量上传时同时启动过多 FFmpeg 进程
+_ingest_semaphore = asyncio.Semaphore(settings.INGEST_CONCURRENCY)
+
+
+class IngestPipeline:
+    """
+    上传文件后台分析流水线
+    上传接口写入文件和 analyzing 状态的记录后立即返回，由本流水线依次完成：
+    probe（时长/采样率等元数据）-> working copy（统一规格的工作副本）-> loudness（EBU R128 响度）
+    -> peaks（波形峰值）-> proxy（代理文件），最后标记为 ready。
+    probe 失败说明文件不是有效音频，标记为 failed；其余阶段失败不影响文件可用性
+    """
+
+    def __init__(self, ffmpeg_service: Optional[FFmpegService] = None):
+        self.ffmpeg_service = ffmpeg_service or FFmpegService()
+        self.proxy_service = ProxyService(self.ffmpeg_service)
+        self.working_copy_service = WorkingCopyService(self.ffmpeg_service)
+        self.peaks_dir = settings.PEAKS_DIR
+        self.peaks_resolution = settings.PEAKS_RESOLUTION
+
+    def peaks_path_for(self, file_id: str) -> str:
+        return os.path.join(self.peaks_dir, f"{file_id}.json")
+
+    async def run(self, file_id: str, file_path: str):
+        async with _ingest_semaphore:
+            try:
+                audio_info = await self.ffmpeg_service.get_audio_info(file_path)
+            except Exception as e:
+                print(f"音频分析失败 {file_id}: {e}")
+                await self._update(file_id, status=AudioFileStatus.failed, error_message=str(e))
+                return
+
+            await self._update(
+                file_id,
+                duration=audio_info['duration'],
+                sample_rate=audio_info['sample_rate'],
+                channels=audio_info['channels'],
+                format=audio_info['format'],
+                codec=audio_info['codec'],
+                bitrate=audio_info['bitrate']
+            )
+
+            values = await self._analyze_loudness(file_id, file_path)
+            working_path = await self._generate_working_copy(file_id, file_path, audio_info)
+            if working_path:
+                values['working_path'] = working_path
+                values['working_sample_rate'] = self.working_copy_service.sample_rate
+            peaks_path = await self._generate_peaks(file_id, file_path)
+            if peaks_path:
+                values['peaks_path'] = peaks_path
+
+            proxy_path = await self._generate_proxy(file_id, file_path, audio_info)
+            if proxy_path:
+                values['proxy_path'] = proxy_path
+
+            if not await self._update(file_id, status=AudioFileStatus.ready, **values):
+                # 分析期间文件已被删除，清理生成的附属文件
+                for path in (working_path, peaks_path, proxy_path):
+                    if path and os.path.exists(path):
+                        os.remove(path)
+
+    async def _analyze_loudness(self, file_id: str, file_path: str) -> dict:
+        """
+        响度只在入库时测量一次，混音时据此计算归一化增益
+        """
+        try:
+            loudness = await self.ffmpeg_service.analyze_loudness(file_path)
+        except Exception as e:
+            print(f"响度分析失败 {file_id}: {e}")
+            return {}
+        return {
+            'loudness_lufs': loudness['integrated_lufs'],
+            'true_peak_db': loudness['true_peak_db']
+        }
+
+    async def _generate_peaks(self, file_id: str, file_path: str) -> Optional[str]:
+        try:
+            peaks = await self.ffmpeg_service.extract_waveform_data(file_path, width=self.peaks_resolution)
+            return await save_peaks(self.peaks_path_for(file_id), peaks)
+        except Exception as e:
+            print(f"波形提取失败 {file_id}: {e}")
+            return None
+
+    async def _generate_working_copy(self, file_id: str, file_path: str, audio_info: dict) -> Optional[str]:
+        if not settings.WORKING_COPY_ENABLED or not self.working_copy_service.needs_working_copy(
+            audio_info['sample_rate'], audio_info['channels'], audio_info['codec']
+        ):
+            return None
+
+        try:
+            return await self.working_copy_service.create_working_copy(file_id, file_path)
+        except Exception as e:
+            print(f"生成工作副本失败 {file_id}: {e}")
+            return None
+
+    async def _generate_proxy(self, file_id: str, file_path: str, audio_info: dict) -> Optional[str]:
+        if not settings.PROXY_ENABLED or not self.proxy_service.needs_proxy(
+            audio_info['sample_rate'], audio_info['channels'], audio_info['format']
+        ):
+            return None
+
+        try:
+            return await self.proxy_service.create_proxy(file_id, file_path)
+        except Exception as e:
+            print(f"生成代理文件失败 {file_id}: {e}")
+            return None
+
+    async def _update(self, file_id: str, **values) -> bool:
+        """
+        更新文件记录，返回记录是否仍然存在
+        """
+        async with AsyncSessionLocal() as db:
+            try:
+                result = await db.execute(
+                    update(AudioFile).where(AudioFile.file_id == file_id).values(**values)
+                )
+                await db.commit()
+                return result.rowcount > 0
+            except Exception as e:
+                await db.rollback()
+                print(f"更新文件记录失败 {file_id}: {e}")
+                return False
@@ -0,0 +1,44 @@
+import re
+from typing import Dict, Optional
+
+from app.config.settings import settings
+
+# ebur128 滤镜结束时输出的汇总信息，例如:
+#   Integrated loudness:
+#     I:         -23.0 LUFS
+#   True peak:
+#     Peak:       -1.2 dBFS
+_INTEGRATED_PATTERN = re.compile(r"Integrated loudness:\s*I:\s*(-?[\d.]+|-inf)\s*LUFS")
+_TRUE_PEAK_PATTERN = re.compile(r"True peak:\s*Peak:\s*(-?[\d.]+|-inf)\s*dBFS")
+
+
+def parse_ebur128_summary(output: str) -> Dict[str, Optional[float]]:
+    """
+    解析 ebur128 滤镜的汇总输出，静音文件的 -inf 返回 None
+    """
+    def _value(pattern):
+        matches = pattern.findall(output)
+        if not matches or matches[-1] == "-inf":
+            return None
+        return float(matches[-1])
+
+    return {
+        "integrated_lufs": _value(_INTEGRATED_PATTERN),
+        "true_peak_db": _value(_TRUE_PEAK_PATTERN),
+    }
+
+
+def loudness_gain(integrated_lufs: Optional[float], true_peak_db: Optional[float],
+                  target_lufs: float = settings.LOUDNESS_TARGET_LUFS,
+                  peak_ceiling_db: float = settings.LOUDNESS_TRUE_PEAK_CEILING) -> float:
+    """
+    根据预先测得的响度计算归一化线性增益
+    增益使响度达到目标值，但提升后的真峰值不超过上限；没有测量数据时返回 1.0
+    """
+    if integrated_lufs is None:
+        return 1.0
+
+    gain_db = target_lufs - integrated_lufs
+    if true_peak_db is not None:
+        gain_db = min(gain_db, peak_ceiling_db - true_peak_db)
+    return 10 ** (gain_db / 20)
@@ -0,0 +1,48 @@
+import json
+import os
+from typing import List, Optional
+
+import aiofiles
+
+
+async def save_peaks(peaks_path: str, peaks: List[float]) -> str:
+    """
+    保存波形峰值数据（JSON 数组），先写临时文件再替换，避免读到半个文件
+    """
+    os.makedirs(os.path.dirname(peaks_path), exist_ok=True)
+    temp_path = f"{peaks_path}.tmp"
+    async with aiofiles.open(temp_path, 'w') as f:
+        await f.write(json.dumps([round(value, 5) for value in peaks]))
+    os.replace(temp_path, peaks_path)
+    return peaks_path
+
+
+async def load_peaks(peaks_path: Optional[str], width: int, resolution: int) -> Optional[List[float]]:
+    """
+    读取预计算的峰值数据并降采样到 width 个点
+    resolution 为预计算时的点数；点数少于 resolution 说明已包含全部采样，可满足任意宽度。
+    数据不存在或精度不足时返回 None
+    """
+    if not peaks_path or not os.path.isfile(peaks_path):
+        return None
+
+    async with aiofiles.open(peaks_path, 'r') as f:
+        peaks = json.loads(await f.read())
+
+    if width >= len(peaks):
+        return peaks if width == len(peaks) or len(peaks) < resolution else None
+    return resample_peaks(peaks, width)
+
+
+def resample_peaks(peaks: List[float], width: int) -> List[float]:
+    """
+    按区间取平均，将峰值数据降采样到 width 个点（与 extract_waveform_data 的算法一致）
+    """
+    chunk_size = len(peaks) / width
+    resampled = []
+    for i in range(width):
+        start = int(i * chunk_size)
+        end = max(start + 1, int((i + 1) * chunk_size))
+        chunk = peaks[start:end]
+        resampled.append(sum(chunk) / len(chunk))
+    return resampled
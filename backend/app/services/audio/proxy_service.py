@@ -0,0 +1,45 @@
+import os
+from typing import Optional
+
+from app.config.settings import settings
+from .ffmpeg_service import FFmpegService
+
+
+class ProxyService:
+    """
+    代理文件服务
+    为上传的原始音频生成低采样率单声道副本，交互操作（预览混音、波形）使用代理，导出仍使用原始文件
+    """
+
+    def __init__(self, ffmpeg_service: Optional[FFmpegService] = None):
+        self.proxy_dir = settings.PROXY_DIR
+        self.sample_rate = settings.PROXY_SAMPLE_RATE
+        self.channels = settings.PROXY_CHANNELS
+        self.format = settings.PROXY_FORMAT
+        self.ffmpeg_service = ffmpeg_service or FFmpegService()
+
+    def proxy_path_for(self, file_id: str) -> str:
+        return os.path.join(self.proxy_dir, f"{file_id}.{self.format}")
+
+    def needs_proxy(self, sample_rate: Optional[int], channels: Optional[int], format: Optional[str] = None) -> bool:
+        """
+        原始文件已经不高于代理规格且为 PCM WAV 时直接使用原始文件
+        """
+        if not sample_rate or not channels:
+            return True
+        if sample_rate > self.sample_rate or channels > self.channels:
+            return True
+        return (format or "").lower() != "wav"
+
+    async def create_proxy(self, file_id: str, source_path: str) -> str:
+        """
+        生成代理文件，返回代理文件路径
+        """
+        return await self.ffmpeg_service.convert_audio(
+            source_path,
+            self.proxy_path_for(file_id),
+            format=self.format,
+            sample_rate=self.sample_rate,
+            channels=self.channels
+        )
+
@@ -0,0 +1,40 @@
+from typing import Dict, Optional
+
+
+class RenderQuality:
+    """
+    混音渲染质量配置（滤镜图中 aresample 的重采样器参数）
+    requires_soxr 的配置在 FFmpeg 未编译 libsoxr 时改用 fallback_options
+    """
+    __slots__ = ("name", "resampler_options", "requires_soxr", "fallback_options")
+
+    def __init__(self, name: str, resampler_options: str, requires_soxr: bool = False,
+                 fallback_options: Optional[str] = None):
+        self.name = name
+        self.resampler_options = resampler_options
+        self.requires_soxr = requires_soxr
+        self.fallback_options = fallback_options
+
+    def resampler_args(self, soxr_available: bool = True) -> str:
+        if self.requires_soxr and not soxr_available:
+            return self.fallback_options or ""
+        return self.resampler_options
+
+
+RENDER_QUALITIES: Dict[str, RenderQuality] = {
+    # 预览：缩短 swr 的插值滤波器并减少相位数，重采样开销约为默认设置的 60%
+    "draft": RenderQuality("draft", "filter_size=8:phase_shift=6"),
+    # 导出：soxr 高精度重采样；没有 libsoxr 时使用长滤波器的 swr
+    "master": RenderQuality(
+        "master", "resampler=soxr:precision=28",
+        requires_soxr=True,
+        fallback_options="filter_size=64:phase_shift=10:cutoff=0.97"
+    ),
+}
+
+
+def get_render_quality(name: str) -> RenderQuality:
+    quality = RENDER_QUALITIES.get(name)
+    if quality is None:
+        raise ValueError(f"不支持的渲染质量: {name}. 支持的质量: {', '.join(RENDER_QUALITIES)}")
+    return quality
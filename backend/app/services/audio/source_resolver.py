@@ -0,0 +1,153 @@
+import os
+from typing import Dict, List, Optional
+from app.database import SessionLocal
+from app.models import AudioFile
+
+# SQLite 单条语句的参数数量有限，IN 查询按批次执行
+_QUERY_BATCH_SIZE = 500
+
+
+class ClipSource:
+    """片段引用的源文件"""
+    __slots__ = ("file_ref", "file_id", "file_path", "format", "duration", "sample_rate", "channels", "proxy_path",
+                 "working_path", "working_sample_rate", "loudness_lufs", "true_peak_db")
+
+    def __init__(self, file_ref: str, file_path: str, file_id: Optional[str] = None,
+                 format: Optional[str] = None, duration: Optional[float] = None,
+                 sample_rate: Optional[int] = None, channels: Optional[int] = None,
+                 proxy_path: Optional[str] = None, working_path: Optional[str] = None,
+                 working_sample_rate: Optional[int] = None, loudness_lufs: Optional[float] = None,
+                 true_peak_db: Optional[float] = None):
+        self.file_ref = file_ref
+        self.file_id = file_id
+        self.file_path = file_path
+        self.format = format or os.path.splitext(file_path)[1].lstrip('.').lower()
+        self.duration = duration
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.proxy_path = proxy_path
+        self.working_path = working_path
+        self.working_sample_rate = working_sample_rate
+        self.loudness_lufs = loudness_lufs
+        self.true_peak_db = true_peak_db
+
+    def render_path(self, use_proxy: bool = False, sample_rate: Optional[int] = None) -> str:
+        """
+        渲染使用的文件路径：交互预览可使用代理文件；
+        否则工作副本的采样率与渲染采样率一致（或未指定渲染采样率）时使用工作副本，免去重采样
+        """
+        if use_proxy and self.proxy_path:
+            return self.proxy_path
+        if self.working_path and (sample_rate is None or sample_rate == self.working_sample_rate):
+            return self.working_path
+        return self.file_path
+
+
+class ClipSourceResolver:
+    """
+    片段源文件解析器
+    将片段的 filePath（通常是上传文件ID）批量解析为实际存储路径和格式，
+    一次数据库查询加一次上传目录列举，结果在实例内缓存（按请求创建实例）
+    """
+
+    def __init__(self, upload_dir: str = "uploads/audio"):
+        self.upload_dir = upload_dir
+        self._resolved: Dict[str, Optional[ClipSource]] = {}
+        self._stored_names: Optional[Dict[str, str]] = None
+        self._stored_filenames: set = set()
+
+    def resolve(self, file_ref: str) -> Optional[ClipSource]:
+        return self.resolve_many([file_ref])[0]
+
+    def resolve_many(self, file_refs: List[str]) -> List[Optional[ClipSource]]:
+        """
+        返回与 file_refs 对齐的列表，不存在的文件为 None
+        """
+        pending = [ref for ref in dict.fromkeys(file_refs) if ref not in self._resolved]
+        if pending:
+            self._resolve_pending(pending)
+        return [self._resolved[ref] for ref in file_refs]
+
+    def _resolve_pending(self, file_refs: List[str]):
+        records = self._query_records(file_refs)
+        stored_names = self._list_upload_dir()
+
+        for file_ref in file_refs:
+            record = records.get(file_ref)
+            if record and self._file_exists(record.file_path):
+                self._resolved[file_ref] = ClipSource(
+                    file_ref,
+                    record.file_path,
+                    file_id=record.file_id,
+                    format=os.path.splitext(record.file_path)[1].lstrip('.').lower(),
+                    duration=record.duration,
+                    sample_rate=record.sample_rate,
+                    channels=record.channels,
+                    proxy_path=record.proxy_path if record.proxy_path and os.path.isfile(record.proxy_path) else None,
+                    working_path=record.working_path if record.working_path and os.path.isfile(record.working_path) else None,
+                    working_sample_rate=record.working_sample_rate,
+                    loudness_lufs=record.loudness_lufs,
+                    true_peak_db=record.true_peak_db
+                )
+            elif file_ref in stored_names:
+                # 没有数据库记录但上传目录中存在同ID文件（保留原始扩展名）
+                file_path = os.path.join(self.upload_dir, stored_names[file_ref])
+                self._resolved[file_ref] = ClipSource(file_ref, file_path, file_id=file_ref)
+            elif file_ref and os.path.isfile(file_ref):
+                # 直接引用的文件路径（非上传目录中的文件）
+                self._resolved[file_ref] = ClipSource(file_ref, file_ref)
+            else:
+                self._resolved[file_ref] = None
+
+    def _query_records(self, file_refs: List[str]) -> Dict[str, AudioFile]:
+        records: Dict[str, AudioFile] = {}
+        db = SessionLocal()
+        try:
+            for offset in range(0, len(file_refs), _QUERY_BATCH_SIZE):
+                batch = file_refs[offset:offset + _QUERY_BATCH_SIZE]
+                rows = db.query(
+                    AudioFile.file_id,
+                    AudioFile.file_path,
+                    AudioFile.duration,
+                    AudioFile.sample_rate,
+                    AudioFile.channels,
+                    AudioFile.proxy_path,
+                    AudioFile.working_path,
+                    AudioFile.working_sample_rate,
+                    AudioFile.loudness_lufs,
+                    AudioFile.true_peak_db
+                ).filter(AudioFile.file_id.in_(batch)).all()
+                for row in rows:
+                    records[row.file_id] = row
+        except Exception as e:
+            # 数据库不可用时仍可按上传目录解析
+            print(f"查询音频文件记录失败: {e}")
+        finally:
+            db.close()
+        return records
+
+    def _file_exists(self, file_path: str) -> bool:
+        """
+        上传目录中的文件按目录列举结果判断，其他位置的文件单独检查
+        """
+        self._list_upload_dir()
+        if os.path.normpath(os.path.dirname(file_path)) == os.path.normpath(self.upload_dir):
+            return os.path.basename(file_path) in self._stored_filenames
+        return os.path.isfile(file_path)
+
+    def _list_upload_dir(self) -> Dict[str, str]:
+        """
+        上传目录中的文件：文件名（不含扩展名）-> 文件名
+        """
+        if self._stored_names is None:
+            self._stored_names = {}
+            try:
+                for filename in os.listdir(self.upload_dir):
+                    self._stored_filenames.add(filename)
+                    stem = os.path.splitext(filename)[0]
+                    # 同一ID存在多个文件时优先保留 .wav（兼容旧的命名约定）
+                    if stem not in self._stored_names or filename.endswith('.wav'):
+                        self._stored_names[stem] = filename
+            except FileNotFoundError:
+                pass
+        return self._stored_names
@@ -0,0 +1,55 @@
+import asyncio
+import hashlib
+import os
+import weakref
+from typing import Optional
+
+from app.config.settings import settings
+from .ffmpeg_service import FFmpegService
+
+# 同一变速结果同时只渲染一次
+_stretch_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+class StretchService:
+    """
+    变速渲染服务
+    变速不变调的计算开销较大，按 (源文件, 速度) 缓存整个文件的变速 PCM 渲染，
+    同一源文件以相同速度出现在多个片段或多次预览中时只渲染一次；片段的入点/出点在渲染结果上定位
+    """
+
+    def __init__(self, ffmpeg_service: Optional[FFmpegService] = None):
+        self.cache_dir = settings.STRETCH_CACHE_DIR
+        self.ffmpeg_service = ffmpeg_service or FFmpegService()
+
+    def stretched_path_for(self, source_path: str, rate: float) -> str:
+        """
+        缓存键包含源文件的修改时间和大小，源文件被替换后自动重新渲染
+        """
+        stat = os.stat(source_path)
+        key = f"{os.path.abspath(source_path)}:{stat.st_mtime_ns}:{stat.st_size}:{rate:.6f}"
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.wav")
+
+    async def get_stretched(self, source_path: str, rate: float) -> str:
+        """
+        返回变速渲染文件路径，缓存不存在时渲染
+        """
+        output_path = self.stretched_path_for(source_path, rate)
+        if os.path.exists(output_path):
+            return output_path
+
+        lock = _stretch_locks.setdefault(output_path, asyncio.Lock())
+        async with lock:
+            if os.path.exists(output_path):
+                return output_path
+
+            temp_path = os.path.join(self.cache_dir, f".{os.path.basename(output_path)}.tmp.wav")
+            try:
+                await self.ffmpeg_service.time_stretch(source_path, temp_path, rate)
+                os.replace(temp_path, output_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+        return output_path
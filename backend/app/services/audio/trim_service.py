@@ -0,0 +1,124 @@
+import asyncio
+import os
+import uuid
+import weakref
+from pathlib import Path
+from typing import Dict, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from app.database import AsyncSessionLocal
+from app.models import AudioFile, AudioFileStatus
+from .ffmpeg_service import FFmpegService
+
+# 裁剪结果ID由 (源文件, 起点, 时长, 模式) 确定，相同参数的请求复用同一文件和记录
+_TRIM_NAMESPACE = uuid.UUID("6f1c2a4e-3d7b-5e8f-9a0b-1c2d3e4f5a6b")
+
+TRIM_MODES = ("accurate", "copy")
+
+# 同一裁剪结果同时只生成一次
+_trim_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+class TrimService:
+    """
+    音频裁剪服务
+    - accurate: 输入端定位后只解码所需区间，输出采样精确的 WAV（PCM 源的解码几乎没有开销）
+    - copy: 输入端定位加流复制，保留原编码和容器，切点对齐到编码帧
+    裁剪结果按参数缓存，并登记为 AudioFile 记录，可像普通上传文件一样在项目中引用
+    """
+
+    def __init__(self, upload_dir: str = "uploads/audio", ffmpeg_service: Optional[FFmpegService] = None):
+        self.upload_dir = upload_dir
+        self.ffmpeg_service = ffmpeg_service or FFmpegService()
+
+    @staticmethod
+    def trim_id_for(file_id: str, start_time: float, duration: float, mode: str) -> str:
+        return str(uuid.uuid5(_TRIM_NAMESPACE, f"{file_id}:{start_time:.6f}:{duration:.6f}:{mode}"))
+
+    async def trim(self, file_id: str, start_time: float, duration: float, mode: str = "accurate") -> Optional[Dict]:
+        """
+        裁剪上传文件，返回裁剪结果的文件记录（含 cached 标记）；源文件不存在时返回 None
+        """
+        if mode not in TRIM_MODES:
+            raise ValueError(f"不支持的裁剪模式: {mode}. 支持的模式: {', '.join(TRIM_MODES)}")
+        if start_time < 0:
+            raise ValueError("裁剪起点不能为负数")
+        if duration <= 0:
+            raise ValueError("裁剪时长必须大于0")
+
+        trim_id = self.trim_id_for(file_id, start_time, duration, mode)
+        lock = _trim_locks.setdefault(trim_id, asyncio.Lock())
+
+        async with lock:
+            cached = await self._load_trimmed(trim_id)
+            if cached is not None:
+                return {**cached.to_dict(), "cached": True}
+
+            async with AsyncSessionLocal() as db:
+                source = await db.get(AudioFile, file_id)
+            if source is None or not os.path.exists(source.file_path):
+                return None
+
+            if source.duration and start_time >= source.duration:
+                raise ValueError(f"裁剪起点 {start_time}s 超出文件时长 {source.duration:.2f}s")
+
+            extension = Path(source.file_path).suffix if mode == "copy" else ".wav"
+            output_path = os.path.join(self.upload_dir, f"{trim_id}{extension}")
+            temp_path = os.path.join(self.upload_dir, f".{trim_id}.tmp{extension}")
+
+            try:
+                await self.ffmpeg_service.trim_audio(
+                    source.file_path, temp_path, start_time, duration, stream_copy=(mode == "copy")
+                )
+                os.replace(temp_path, output_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+            actual_duration = duration
+            if source.duration:
+                actual_duration = min(duration, source.duration - start_time)
+
+            trimmed = AudioFile(
+                file_id=trim_id,
+                original_name=self._trimmed_name(source.original_name, start_time, actual_duration, extension),
+                file_path=output_path,
+                category=source.category,
+                project_id=source.project_id,
+                file_size=os.path.getsize(output_path),
+                duration=actual_duration,
+                sample_rate=source.sample_rate,
+                channels=source.channels,
+                format="wav" if mode == "accurate" else source.format,
+                codec="pcm_s16le" if mode == "accurate" else source.codec,
+                status=AudioFileStatus.analyzing
+            )
+
+            async with AsyncSessionLocal() as db:
+                try:
+                    db.add(trimmed)
+                    await db.commit()
+                    await db.refresh(trimmed)
+                except IntegrityError:
+                    # 其他进程已登记同一裁剪结果
+                    await db.rollback()
+                    existing = await self._load_trimmed(trim_id)
+                    return {**existing.to_dict(), "cached": True}
+
+            return {**trimmed.to_dict(), "cached": False}
+
+    async def _load_trimmed(self, trim_id: str) -> Optional[AudioFile]:
+        async with AsyncSessionLocal() as db:
+            record = await db.get(AudioFile, trim_id)
+            if record is None or os.path.exists(record.file_path):
+                return record
+            # 裁剪文件已被删除，清除失效记录后重新生成
+            await db.delete(record)
+            await db.commit()
+            return None
+
+    @staticmethod
+    def _trimmed_name(original_name: str, start_time: float, duration: float, extension: str) -> str:
+        stem = Path(original_name).stem
+        return f"{stem}_trim_{start_time:.2f}-{start_time + duration:.2f}{extension}"
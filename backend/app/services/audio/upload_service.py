@@ -1,14 +1,16 @@
 import os
 import uuid
+import asyncio
 import aiofiles
 from typing import List, Dict, Optional
 from fastapi import UploadFile, HTTPException
 from pathlib import Path
-from sqlalchemy.orm import Session
+from sqlalchemy import select, or_, and_
 
 from .ffmpeg_service import FFmpegService
-from app.models import AudioFile, AudioCategory
-from app.database import SessionLocal
+from app.models import AudioFile, AudioCategory, AudioFileStatus
+from app.database import AsyncSessionLocal
+from app.services.tracing import traced, set_span_attributes
 
 
 class AudioUploadService:
@@ -19,6 +21,7 @@ class AudioUploadService:
     def __init__(self):
         self.upload_dir = "uploads/audio"
         self.max_file_size = 100 * 1024 * 1024  # 100MB
+        self.chunk_size = 1024 * 1024
         self.allowed_extensions = {
             '.mp3', '.wav', '.flac', '.aac', '.ogg', 
             '.m4a', '.wma', '.opus', '.aiff'
@@ -28,9 +31,11 @@ class AudioUploadService:
         # 确保上传目录存在
         os.makedirs(self.upload_dir, exist_ok=True)
     
+    @traced()
     async def upload_audio_file(self, file: UploadFile, category: str = "dialogue", project_id: Optional[str] = None) -> Dict:
         """
         上传单个音频文件
+        文件落盘并写入 analyzing 状态的记录后立即返回，分析由 IngestPipeline 在后台完成
         """
         # 验证文件
         self._validate_file(file)
@@ -41,66 +46,62 @@ class AudioUploadService:
         file_name = f"{file_id}{file_extension}"
         file_path = os.path.join(self.upload_dir, file_name)
         
-        db = SessionLocal()
         try:
-            # 保存文件
+            # 分块写入，避免大文件整体读入内存
+            file_size = 0
             async with aiofiles.open(file_path, 'wb') as f:
-                content = await file.read()
-                await f.write(content)
+                while chunk := await file.read(self.chunk_size):
+                    file_size += len(chunk)
+                    if file_size > self.max_file_size:
+                        raise HTTPException(
+                            status_code=400,
+                            detail=f"文件太大: 超过 {self.max_file_size} bytes"
+                        )
+                    await f.write(chunk)
+                await f.flush()
+                await asyncio.to_thread(os.fsync, f.fileno())
             
-            print(f"文件已保存: {file_path}, 大小: {len(content)} bytes")
-            
-            # 获取音频信息
-            audio_info = await self.ffmpeg_service.get_audio_info(file_path)
-            
-            # 生成波形数据
+            print(f"文件已保存: {file_path}, 大小: {file_size} bytes")
+            set_span_attributes(**{"file.id": file_id, "upload.category": category, "upload.bytes": file_size})
+        except Exception:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            raise
+        
+        # 元数据、波形和代理文件由后台分析流水线补全
+        async with AsyncSessionLocal() as db:
             try:
-                waveform_data = await self.ffmpeg_service.extract_waveform_data(file_path)
-            except Exception as e:
-                print(f"波形提取失败: {e}")
-                waveform_data = []
-            
-            # 保存到数据库
-            audio_file = AudioFile(
-                file_id=file_id,
-                original_name=file.filename,
-                file_path=file_path,
-                category=AudioCategory(category),
-                project_id=project_id,
-                file_size=len(content),
-                duration=audio_info['duration'],
-                sample_rate=audio_info['sample_rate'],
-                channels=audio_info['channels'],
-                format=audio_info['format'],
-                codec=audio_info['codec'],
-                bitrate=audio_info['bitrate']
-            )
+                audio_file = AudioFile(
+                    file_id=file_id,
+                    original_name=file.filename,
+                    file_path=file_path,
+                    category=AudioCategory(category),
+                    project_id=project_id,
+                    file_size=file_size,
+                    status=AudioFileStatus.analyzing
+                )
             
-            db.add(audio_file)
-            db.commit()
-            db.refresh(audio_file)
+                db.add(audio_file)
+                await db.commit()
+                await db.refresh(audio_file)
             
-            result = audio_file.to_dict()
-            result.update({
-                'waveform_data': waveform_data,
-                'upload_success': True
-            })
+                result = audio_file.to_dict()
+                result['upload_success'] = True
+                return result
             
-            return result
-            
-        except Exception as e:
-            db.rollback()
-            # 如果处理失败，删除已上传的文件
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            raise HTTPException(status_code=500, detail=f"文件处理失败: {str(e)}")
-        finally:
-            db.close()
+            except Exception as e:
+                await db.rollback()
+                # 如果处理失败，删除已上传的文件
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                raise HTTPException(status_code=500, detail=f"文件处理失败: {str(e)}")
     
+    @traced()
     async def upload_multiple_files(self, files: List[UploadFile], category: str = "dialogue", project_id: Optional[str] = None) -> List[Dict]:
         """
         批量上传音频文件
         """
+        set_span_attributes(**{"upload.file_count": len(files)})
         results = []
         
         for file in files:
@@ -139,6 +140,7 @@ class AudioUploadService:
                 detail=f"文件太大: {file.size} bytes. 最大允许: {self.max_file_size} bytes"
             )
     
+    @traced()
     async def get_file_info(self, file_id: str) -> Optional[Dict]:
         """
         获取已上传文件的信息
@@ -165,51 +167,137 @@ class AudioUploadService:
             print(f"获取文件信息失败: {e}")
             return None
     
+    @traced()
+    async def get_file_record(self, file_id: str, fields: List[str]) -> Optional[Dict]:
+        """
+        按 file_id 查询文件记录的指定列，记录不存在时返回 None
+        """
+        query = select(*[getattr(AudioFile, field) for field in fields]).where(AudioFile.file_id == file_id)
+        async with AsyncSessionLocal() as db:
+            row = (await db.execute(query)).mappings().first()
+        return dict(row) if row else None
+    
+    @traced()
+    async def get_file_path(self, file_id: str, prefer_proxy: bool = False) -> Optional[str]:
+        """
+        查找已上传文件的存储路径（只查数据库记录和上传目录，不调用 ffprobe）
+        prefer_proxy 为 True 时优先返回已生成的代理文件
+        """
+        row = None
+        async with AsyncSessionLocal() as db:
+            try:
+                row = (await db.execute(
+                    select(AudioFile.file_path, AudioFile.proxy_path).where(AudioFile.file_id == file_id)
+                )).first()
+            except Exception as e:
+                print(f"查询文件路径失败: {e}")
+
+        if row:
+            if prefer_proxy and row.proxy_path and os.path.isfile(row.proxy_path):
+                return row.proxy_path
+            if os.path.isfile(row.file_path):
+                return row.file_path
+
+        # 没有数据库记录时按文件名前缀查找上传目录
+        try:
+            for filename in os.listdir(self.upload_dir):
+                if filename.startswith(file_id):
+                    return os.path.join(self.upload_dir, filename)
+        except FileNotFoundError:
+            pass
+        return None
+
+    @traced()
     async def delete_file(self, file_id: str) -> bool:
         """
         删除上传的文件（同时删除文件和数据库记录）
         """
-        db = SessionLocal()
-        try:
-            # 从数据库获取文件信息
-            audio_file = db.query(AudioFile).filter(AudioFile.file_id == file_id).first()
-            if not audio_file:
+        async with AsyncSessionLocal() as db:
+            try:
+                # 从数据库获取文件信息
+                audio_file = await db.get(AudioFile, file_id)
+                if not audio_file:
+                    return False
+                
+                # 删除物理文件及其工作副本、代理文件、波形数据
+                for path in (audio_file.file_path, audio_file.working_path, audio_file.proxy_path, audio_file.peaks_path):
+                    if path and os.path.exists(path):
+                        try:
+                            os.remove(path)
+                        except Exception as e:
+                            print(f"删除物理文件失败: {e}")
+                
+                # 删除数据库记录
+                await db.delete(audio_file)
+                await db.commit()
+                return True
+                
+            except Exception as e:
+                await db.rollback()
+                print(f"删除文件失败: {e}")
                 return False
-            
-            # 删除物理文件
-            if os.path.exists(audio_file.file_path):
-                try:
-                    os.remove(audio_file.file_path)
-                except Exception as e:
-                    print(f"删除物理文件失败: {e}")
-            
-            # 删除数据库记录
-            db.delete(audio_file)
-            db.commit()
-            return True
-            
-        except Exception as e:
-            db.rollback()
-            print(f"删除文件失败: {e}")
-            return False
-        finally:
-            db.close()
     
-    async def list_uploaded_files(self, project_id: Optional[str] = None) -> List[Dict]:
+    @traced()
+    async def list_uploaded_files(
+        self,
+        project_id: Optional[str] = None,
+        category: Optional[str] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict:
         """
-        列出所有已上传的文件（从数据库读取）
+        分页列出已上传的文件（从数据库读取）
+        按创建时间倒序的游标分页，cursor 为上一页最后一条记录的 file_id（记录不存在时抛出 ValueError）；
+        fields 指定时只查询这些列
         """
-        db = SessionLocal()
-        try:
-            query = db.query(AudioFile)
-            if project_id:
-                query = query.filter(AudioFile.project_id == project_id)
-            
-            audio_files = query.order_by(AudioFile.created_at.desc()).all()
-            return [file.to_dict() for file in audio_files]
-        finally:
-            db.close()
+        if fields:
+            invalid = [field for field in fields if field not in AudioFile.LIST_FIELDS]
+            if invalid:
+                raise ValueError(f"无效的字段: {invalid}. 可选字段: {list(AudioFile.LIST_FIELDS)}")
+            # 游标需要 file_id
+            fields = list(dict.fromkeys(["file_id", *fields]))
+        else:
+            fields = list(AudioFile.LIST_FIELDS)
+        
+        query = select(*[getattr(AudioFile, field) for field in fields])
+        if project_id:
+            query = query.where(AudioFile.project_id == project_id)
+        if category:
+            query = query.where(AudioFile.category == AudioCategory(category))
+        
+        if cursor:
+            # 与游标记录的创建时间直接在数据库中比较，避免时间格式转换带来的误差
+            cursor_created_at = (
+                select(AudioFile.created_at)
+                .where(AudioFile.file_id == cursor)
+                .scalar_subquery()
+            )
+            query = query.where(or_(
+                AudioFile.created_at < cursor_created_at,
+                and_(AudioFile.created_at == cursor_created_at, AudioFile.file_id < cursor)
+            ))
+        
+        # 多取一条用于判断是否还有下一页
+        query = query.order_by(AudioFile.created_at.desc(), AudioFile.file_id.desc()).limit(limit + 1)
+        
+        async with AsyncSessionLocal() as db:
+            # 游标记录已被删除时子查询为 NULL，会返回空页并误判为没有更多数据
+            if cursor and await db.scalar(select(AudioFile.file_id).where(AudioFile.file_id == cursor)) is None:
+                raise ValueError(f"无效的游标: {cursor}，请从第一页重新获取")
+            result = await db.execute(query)
+            rows = result.mappings().all()
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        return {
+            "items": [AudioFile.serialize(row) for row in rows],
+            "next_cursor": rows[-1]["file_id"] if has_more else None,
+            "has_more": has_more
+        }
     
+    @traced()
     async def convert_to_standard_format(self, file_id: str, 
                                        output_format: str = 'wav',
                                        sample_rate: int = 44100) -> Optional[str]:
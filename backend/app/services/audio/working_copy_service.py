@@ -0,0 +1,42 @@
+import os
+from typing import Optional
+
+from app.config.settings import settings
+from .ffmpeg_service import FFmpegService
+
+
+class WorkingCopyService:
+    """
+    工作副本服务
+    上传文件的采样率和声道数各不相同（TTS 常为 22.05kHz 单声道，音乐为 48kHz 立体声），
+    入库时生成统一规格（项目标准采样率、立体声 PCM WAV）的工作副本，混音时直接读取，不再逐次重采样
+    """
+
+    def __init__(self, ffmpeg_service: Optional[FFmpegService] = None):
+        self.working_dir = settings.WORKING_DIR
+        self.sample_rate = settings.WORKING_SAMPLE_RATE
+        self.channels = settings.WORKING_CHANNELS
+        self.ffmpeg_service = ffmpeg_service or FFmpegService()
+
+    def working_path_for(self, file_id: str) -> str:
+        return os.path.join(self.working_dir, f"{file_id}.wav")
+
+    def needs_working_copy(self, sample_rate: Optional[int], channels: Optional[int], codec: Optional[str]) -> bool:
+        """
+        原始文件已是统一规格的 PCM 时直接使用原始文件
+        """
+        if sample_rate != self.sample_rate or channels != self.channels:
+            return True
+        return not (codec or "").startswith("pcm_")
+
+    async def create_working_copy(self, file_id: str, source_path: str) -> str:
+        """
+        生成工作副本，返回工作副本路径
+        """
+        return await self.ffmpeg_service.convert_audio(
+            source_path,
+            self.working_path_for(file_id),
+            format="wav",
+            sample_rate=self.sample_rate,
+            channels=self.channels
+        )
@@ -1,6 +1,8 @@
+import json
 import uuid
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import AsyncIterator, Dict, List, Any, Optional
+from pydantic import ValidationError
 from app.schemas.multitrack_project import (
     MultitrackProject, 
     ProjectInfo, 
@@ -9,47 +11,143 @@ from app.schemas.multitrack_project import (
     Character, 
     Marker
 )
+from app.services.audio.duration_prober import DurationProber
+
+# 对话之间的默认间隙（秒）
+DIALOGUE_GAP = 0.5
+# 对话未提供时长且无法获取实际时长时的默认时长（秒）
+DEFAULT_DIALOGUE_DURATION = 3.0
+# 导入记录中各字段应有的类型，其余字段不做检查
+_STRING_FIELDS = (
+    "character", "speaker", "voice", "voice_id", "text", "file_path", "audio_file",
+    "name", "description", "emotion", "genre", "mood"
+)
+_NUMBER_FIELDS = ("start_time", "duration", "volume", "fade_in", "fade_out")
+
+
+class ImportRecordError(ValueError):
+    """流式导入中某一行的记录无效"""
+
 
 class ConversionService:
     """
     格式转换服务 - 将现有JSON格式转换为标准多音轨格式
     """
     
+    def __init__(self, duration_prober: Optional[DurationProber] = None):
+        self.duration_prober = duration_prober
+    
     async def convert_to_standard_format(
         self,
         dialogue_data: Dict[str, Any],
         environment_data: Optional[Dict[str, Any]] = None,
         background_music: Optional[Dict[str, Any]] = None,
-        project_info: Optional[Dict[str, Any]] = None
+        project_info: Optional[Dict[str, Any]] = None,
+        probe_durations: bool = False
     ) -> MultitrackProject:
         """
         将角色对话JSON和环境音JSON转换为标准多音轨格式
+        probe_durations 为 True 时（批量导入模式）并发获取未提供时长的对话音频的实际时长，按实际时长排布时间线
         """
+        builder = ProjectBuilder(self)
         
-        # 创建项目信息
-        project = self._create_project_info(dialogue_data, project_info)
-        
-        # 转换对话音轨
-        dialogue_track = await self._convert_dialogue_track(dialogue_data)
+        # 对话
+        dialogues = dialogue_data.get("dialogues", [])
+        if not dialogues and "segments" in dialogue_data:
+            dialogues = dialogue_data["segments"]
+        for dialogue in dialogues:
+            builder.add_dialogue(dialogue)
         
-        # 转换环境音轨
-        environment_track = await self._convert_environment_track(environment_data)
+        # 环境音
+        if environment_data:
+            environments = environment_data.get("environments", [])
+            if not environments and "effects" in environment_data:
+                environments = environment_data["effects"]
+            for env in environments:
+                builder.add_environment(env)
         
-        # 转换背景音乐轨
-        background_track = await self._convert_background_track(background_music)
+        # 背景音乐：单个文件或多个音乐轨
+        if background_music:
+            if "file_path" in background_music or "audio_file" in background_music:
+                builder.add_background(background_music, single=True)
+            elif "music_tracks" in background_music:
+                for music in background_music["music_tracks"]:
+                    builder.add_background(music)
         
-        # 生成时间标记
-        markers = self._generate_markers(dialogue_data, environment_data)
+        return await builder.build(self._create_project_info(dialogue_data, project_info), probe_durations)
+    
+    async def convert_ndjson_stream(self, chunks: AsyncIterator[bytes], probe_durations: bool = False) -> MultitrackProject:
+        """
+        流式导入：逐行解析 NDJSON，每行一条记录，按 type 字段区分：
+        project（项目信息，可选）/ dialogue / environment / background（背景音乐轨）
+        边接收边生成片段，不在内存中保留完整的请求体
+        """
+        builder = ProjectBuilder(self)
+        project_info: Dict[str, Any] = {}
+        handlers = {
+            "dialogue": builder.add_dialogue,
+            "environment": builder.add_environment,
+            "background": builder.add_background,
+        }
         
-        # 计算总时长
-        total_duration = self._calculate_total_duration([dialogue_track, environment_track, background_track])
-        project.totalDuration = total_duration
+        line_number = 0
+        async for line in self._iter_lines(chunks):
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise ImportRecordError(f"第 {line_number} 行不是有效的JSON: {e}")
+            if not isinstance(record, dict):
+                raise ImportRecordError(f"第 {line_number} 行必须是JSON对象")
+            
+            record_type = record.pop("type", None)
+            if record_type == "project":
+                project_info.update(record)
+            elif record_type in handlers:
+                self._validate_record(record, line_number)
+                try:
+                    handlers[record_type](record)
+                except ValidationError as e:
+                    raise ImportRecordError(f"第 {line_number} 行数据无效: {e}")
+            else:
+                raise ImportRecordError(f"第 {line_number} 行的记录类型无效: {record_type}")
         
-        return MultitrackProject(
-            project=project,
-            tracks=[dialogue_track, environment_track, background_track],
-            markers=markers
-        )
+        return await builder.build(self._create_project_info({}, project_info), probe_durations)
+    
+    @staticmethod
+    def _validate_record(record: Dict[str, Any], line_number: int):
+        """
+        检查记录中已知字段的类型，避免类型错误的字段在生成片段时引发非预期异常
+        """
+        for field in _STRING_FIELDS:
+            if field in record and not isinstance(record[field], str):
+                raise ImportRecordError(f"第 {line_number} 行字段 {field} 必须是字符串")
+        for field in _NUMBER_FIELDS:
+            value = record.get(field)
+            if field in record and (isinstance(value, bool) or not isinstance(value, (int, float))):
+                raise ImportRecordError(f"第 {line_number} 行字段 {field} 必须是数字")
+    
+    @staticmethod
+    async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+        """
+        按换行拆分数据块：只扫描新到达的数据块，未结束的行保留在缓冲区中，
+        长行跨越多个数据块时也是线性复杂度
+        """
+        buffer = bytearray()
+        async for chunk in chunks:
+            start = 0
+            newline = chunk.find(b"\n")
+            while newline != -1:
+                buffer += chunk[start:newline]
+                yield buffer.decode("utf-8")
+                buffer.clear()
+                start = newline + 1
+                newline = chunk.find(b"\n", start)
+            buffer += chunk[start:]
+        if buffer:
+            yield buffer.decode("utf-8")
     
     def _create_project_info(self, dialogue_data: Dict[str, Any], project_info: Optional[Dict[str, Any]]) -> ProjectInfo:
         """
@@ -78,230 +176,235 @@ class ConversionService:
             
         return ProjectInfo(**default_info)
     
-    async def _convert_dialogue_track(self, dialogue_data: Dict[str, Any]) -> Track:
+    async def _probe_durations(self, file_refs: List[str]) -> Dict[str, Optional[float]]:
         """
-        转换对话音轨
+        获取音频文件的实际时长
         """
-        clips = []
-        characters = {}
-        current_time = 0.0
+        if not any(file_refs):
+            return {}
         
-        # 解析对话数据
-        dialogues = dialogue_data.get("dialogues", [])
-        if not dialogues and "segments" in dialogue_data:
-            dialogues = dialogue_data["segments"]
+        if self.duration_prober is None:
+            self.duration_prober = DurationProber()
+        return await self.duration_prober.probe_many(file_refs)
+    
+    def _calculate_total_duration(self, tracks: List[Track]) -> float:
+        """
+        计算总时长
+        """
+        max_duration = 0.0
         
-        for i, dialogue in enumerate(dialogues):
-            # 提取角色信息
-            character_name = dialogue.get("character", dialogue.get("speaker", f"角色{i+1}"))
-            voice_id = dialogue.get("voice", dialogue.get("voice_id", "default"))
-            
-            # 创建角色记录
-            if character_name not in characters:
-                characters[character_name] = Character(
-                    id=f"char_{len(characters) + 1}",
-                    name=character_name,
-                    voice=voice_id,
-                    color=self._get_character_color(len(characters)),
-                    avatar=""
-                )
-            
-            # 创建音频片段
-            start_time = dialogue.get("start_time", current_time)
-            duration = dialogue.get("duration", 3.0)  # 默认3秒
-            file_path = dialogue.get("file_path", dialogue.get("audio_file", ""))
-            
-            clip = AudioClip(
-                id=f"dialogue_{i+1}",
-                name=dialogue.get("text", f"对话 {i+1}")[:30] + "...",
-                filePath=file_path,
-                startTime=start_time,
-                duration=duration,
-                volume=dialogue.get("volume", 1.0),
-                fadeIn=dialogue.get("fade_in", 0.1),
-                fadeOut=dialogue.get("fade_out", 0.1),
-                metadata={
-                    "text": dialogue.get("text", ""),
-                    "character": character_name,
-                    "voice": voice_id,
-                    "emotion": dialogue.get("emotion", "neutral")
-                }
-            )
-            
-            clips.append(clip)
-            current_time = start_time + duration + 0.5  # 添加间隙
+        for track in tracks:
+            for clip in track.clips:
+                end_time = clip.startTime + clip.duration
+                max_duration = max(max_duration, end_time)
         
-        return Track(
-            id="track_dialogue",
-            name="角色对话",
-            type="dialogue",
-            clips=clips,
-            volume=1.0,
-            muted=False,
-            solo=False,
-            color="#3498db",
-            order=1,
-            metadata={
-                "characters": [char.dict() for char in characters.values()],
-                "total_dialogues": len(clips)
-            }
-        )
+        return max_duration
     
-    async def _convert_environment_track(self, environment_data: Optional[Dict[str, Any]]) -> Track:
+    def _get_character_color(self, index: int) -> str:
         """
-        转换环境音轨
+        获取角色颜色
         """
-        clips = []
+        colors = [
+            "#3498db", "#e74c3c", "#2ecc71", "#f39c12", 
+            "#9b59b6", "#1abc9c", "#34495e", "#e67e22"
+        ]
+        return colors[index % len(colors)]
+
+
+class ProjectBuilder:
+    """
+    逐条构建多音轨项目
+    对话、环境音、背景音乐逐条加入并立即生成片段，结束时排布对话时间线、生成轨道和标记。
+    批量转换与流式导入共用，流式导入时不需要在内存中保留完整的输入数据
+    """
+    
+    def __init__(self, service: ConversionService):
+        self.service = service
+        self.dialogue_clips: List[AudioClip] = []
+        self.environment_clips: List[AudioClip] = []
+        self.background_clips: List[AudioClip] = []
+        self.characters: Dict[str, Character] = {}
+        self.single_background = False
+        # 对话是否显式给出开始时间/时长，未给出的在 build 时排布
+        self._explicit_start: List[bool] = []
+        self._explicit_duration: List[bool] = []
+    
+    def add_dialogue(self, dialogue: Dict[str, Any]):
+        i = len(self.dialogue_clips)
         
-        if environment_data:
-            environments = environment_data.get("environments", [])
-            if not environments and "effects" in environment_data:
-                environments = environment_data["effects"]
-            
-            for i, env in enumerate(environments):
-                clip = AudioClip(
-                    id=f"env_{i+1}",
-                    name=env.get("name", f"环境音 {i+1}"),
-                    filePath=env.get("file_path", env.get("audio_file", "")),
-                    startTime=env.get("start_time", 0.0),
-                    duration=env.get("duration", 10.0),
-                    volume=env.get("volume", 0.6),
-                    fadeIn=env.get("fade_in", 1.0),
-                    fadeOut=env.get("fade_out", 1.0),
-                    metadata={
-                        "type": env.get("type", "ambient"),
-                        "description": env.get("description", ""),
-                        "loop": env.get("loop", True)
-                    }
-                )
-                clips.append(clip)
+        # 提取角色信息
+        character_name = dialogue.get("character", dialogue.get("speaker", f"角色{i+1}"))
+        voice_id = dialogue.get("voice", dialogue.get("voice_id", "default"))
+        
+        # 创建角色记录
+        if character_name not in self.characters:
+            self.characters[character_name] = Character(
+                id=f"char_{len(self.characters) + 1}",
+                name=character_name,
+                voice=voice_id,
+                color=self.service._get_character_color(len(self.characters)),
+                avatar=""
+            )
         
-        return Track(
-            id="track_environment",
-            name="环境音效",
-            type="environment",
-            clips=clips,
-            volume=0.8,
-            muted=False,
-            solo=False,
-            color="#27ae60",
-            order=2,
+        # 开始时间和时长未给出时先占位，build 时排布
+        self.dialogue_clips.append(AudioClip(
+            id=f"dialogue_{i+1}",
+            name=dialogue.get("text", f"对话 {i+1}")[:30] + "...",
+            filePath=dialogue.get("file_path", dialogue.get("audio_file", "")),
+            startTime=dialogue.get("start_time", 0.0),
+            duration=dialogue.get("duration", DEFAULT_DIALOGUE_DURATION),
+            volume=dialogue.get("volume", 1.0),
+            fadeIn=dialogue.get("fade_in", 0.1),
+            fadeOut=dialogue.get("fade_out", 0.1),
             metadata={
-                "total_effects": len(clips)
+                "text": dialogue.get("text", ""),
+                "character": character_name,
+                "voice": voice_id,
+                "emotion": dialogue.get("emotion", "neutral")
             }
-        )
+        ))
+        self._explicit_start.append("start_time" in dialogue)
+        self._explicit_duration.append("duration" in dialogue)
+    
+    def add_environment(self, env: Dict[str, Any]):
+        i = len(self.environment_clips)
+        self.environment_clips.append(AudioClip(
+            id=f"env_{i+1}",
+            name=env.get("name", f"环境音 {i+1}"),
+            filePath=env.get("file_path", env.get("audio_file", "")),
+            startTime=env.get("start_time", 0.0),
+            duration=env.get("duration", 10.0),
+            volume=env.get("volume", 0.6),
+            fadeIn=env.get("fade_in", 1.0),
+            fadeOut=env.get("fade_out", 1.0),
+            metadata={
+                "type": env.get("type", "ambient"),
+                "description": env.get("description", ""),
+                "loop": env.get("loop", True)
+            }
+        ))
     
-    async def _convert_background_track(self, background_music: Optional[Dict[str, Any]]) -> Track:
+    def add_background(self, music: Dict[str, Any], single: bool = False):
         """
-        转换背景音乐轨
+        single 为 True 表示整个项目只有这一个背景音乐文件（默认铺满 60 秒并循环）
         """
-        clips = []
-        
-        if background_music:
-            # 处理单个背景音乐文件
-            if "file_path" in background_music or "audio_file" in background_music:
-                clip = AudioClip(
-                    id="bg_music_1",
-                    name=background_music.get("name", "背景音乐"),
-                    filePath=background_music.get("file_path", background_music.get("audio_file", "")),
-                    startTime=background_music.get("start_time", 0.0),
-                    duration=background_music.get("duration", 60.0),
-                    volume=background_music.get("volume", 0.3),
-                    fadeIn=background_music.get("fade_in", 2.0),
-                    fadeOut=background_music.get("fade_out", 2.0),
-                    metadata={
-                        "genre": background_music.get("genre", ""),
-                        "mood": background_music.get("mood", ""),
-                        "loop": background_music.get("loop", True)
-                    }
-                )
-                clips.append(clip)
-            
-            # 处理多个背景音乐
-            elif "music_tracks" in background_music:
-                for i, music in enumerate(background_music["music_tracks"]):
-                    clip = AudioClip(
-                        id=f"bg_music_{i+1}",
-                        name=music.get("name", f"背景音乐 {i+1}"),
-                        filePath=music.get("file_path", music.get("audio_file", "")),
-                        startTime=music.get("start_time", 0.0),
-                        duration=music.get("duration", 30.0),
-                        volume=music.get("volume", 0.3),
-                        fadeIn=music.get("fade_in", 2.0),
-                        fadeOut=music.get("fade_out", 2.0),
-                        metadata={
-                            "genre": music.get("genre", ""),
-                            "mood": music.get("mood", "")
-                        }
-                    )
-                    clips.append(clip)
+        i = len(self.background_clips)
+        metadata = {
+            "genre": music.get("genre", ""),
+            "mood": music.get("mood", "")
+        }
+        if single:
+            metadata["loop"] = music.get("loop", True)
         
-        return Track(
-            id="track_background",
-            name="背景音乐",
-            type="background",
-            clips=clips,
-            volume=0.5,
-            muted=False,
-            solo=False,
-            color="#e74c3c",
-            order=3,
-            metadata={
-                "total_music": len(clips)
-            }
-        )
+        self.background_clips.append(AudioClip(
+            id=f"bg_music_{i+1}",
+            name=music.get("name", "背景音乐" if single else f"背景音乐 {i+1}"),
+            filePath=music.get("file_path", music.get("audio_file", "")),
+            startTime=music.get("start_time", 0.0),
+            duration=music.get("duration", 60.0 if single else 30.0),
+            volume=music.get("volume", 0.3),
+            fadeIn=music.get("fade_in", 2.0),
+            fadeOut=music.get("fade_out", 2.0),
+            metadata=metadata
+        ))
     
-    def _generate_markers(self, dialogue_data: Dict[str, Any], environment_data: Optional[Dict[str, Any]]) -> List[Marker]:
+    async def build(self, project: ProjectInfo, probe_durations: bool = False) -> MultitrackProject:
         """
-        生成时间标记
+        排布对话时间线并生成项目
+        probe_durations 为 True 时先获取未提供时长的对话音频的实际时长
         """
-        markers = []
+        durations: Dict[str, Optional[float]] = {}
+        if probe_durations:
+            durations = await self.service._probe_durations([
+                clip.filePath for clip, explicit in zip(self.dialogue_clips, self._explicit_duration) if not explicit
+            ])
+        
+        # 未给出开始时间的对话紧接上一条对话，间隔 DIALOGUE_GAP
+        current_time = 0.0
+        for clip, explicit_start, explicit_duration in zip(
+            self.dialogue_clips, self._explicit_start, self._explicit_duration
+        ):
+            if not explicit_duration:
+                clip.duration = durations.get(clip.filePath) or DEFAULT_DIALOGUE_DURATION
+            if not explicit_start:
+                clip.startTime = current_time
+            current_time = clip.startTime + clip.duration + DIALOGUE_GAP
+        
+        tracks = [
+            Track(
+                id="track_dialogue",
+                name="角色对话",
+                type="dialogue",
+                clips=self.dialogue_clips,
+                volume=1.0,
+                muted=False,
+                solo=False,
+                color="#3498db",
+                order=1,
+                metadata={
+                    "characters": [char.dict() for char in self.characters.values()],
+                    "total_dialogues": len(self.dialogue_clips)
+                }
+            ),
+            Track(
+                id="track_environment",
+                name="环境音效",
+                type="environment",
+                clips=self.environment_clips,
+                volume=0.8,
+                muted=False,
+                solo=False,
+                color="#27ae60",
+                order=2,
+                metadata={
+                    "total_effects": len(self.environment_clips)
+                }
+            ),
+            Track(
+                id="track_background",
+                name="背景音乐",
+                type="background",
+                clips=self.background_clips,
+                volume=0.5,
+                muted=False,
+                solo=False,
+                color="#e74c3c",
+                order=3,
+                metadata={
+                    "total_music": len(self.background_clips)
+                }
+            )
+        ]
         
-        # 从对话数据生成章节标记
-        dialogues = dialogue_data.get("dialogues", dialogue_data.get("segments", []))
+        # 计算总时长
+        project.totalDuration = self.service._calculate_total_duration(tracks)
         
-        # 添加开始标记
-        markers.append(Marker(
+        return MultitrackProject(
+            project=project,
+            tracks=tracks,
+            markers=self._build_markers()
+        )
+    
+    def _build_markers(self) -> List[Marker]:
+        """
+        生成时间标记：开始标记和每 10 条对话一个章节标记
+        章节标记取排布后对应对话的开始时间，须在 build 排布完成后调用
+        """
+        markers = [Marker(
             id="marker_start",
             name="开始",
             time=0.0,
             type="chapter",
             color="#9b59b6"
-        ))
+        )]
         
-        # 每10个对话添加一个章节标记
-        for i in range(0, len(dialogues), 10):
-            if i > 0:
-                dialogue = dialogues[i]
-                markers.append(Marker(
-                    id=f"marker_chapter_{i//10 + 1}",
-                    name=f"第 {i//10 + 1} 章节",
-                    time=dialogue.get("start_time", i * 3.0),
-                    type="chapter",
-                    color="#9b59b6"
-                ))
+        for chapter, clip in enumerate(self.dialogue_clips[10::10], start=2):
+            markers.append(Marker(
+                id=f"marker_chapter_{chapter}",
+                name=f"第 {chapter} 章节",
+                time=clip.startTime,
+                type="chapter",
+                color="#9b59b6"
+            ))
         
         return markers
-    
-    def _calculate_total_duration(self, tracks: List[Track]) -> float:
-        """
-        计算总时长
-        """
-        max_duration = 0.0
-        
-        for track in tracks:
-            for clip in track.clips:
-                end_time = clip.startTime + clip.duration
-                max_duration = max(max_duration, end_time)
-        
-        return max_duration
-    
-    def _get_character_color(self, index: int) -> str:
-        """
-        获取角色颜色
-        """
-        colors = [
-            "#3498db", "#e74c3c", "#2ecc71", "#f39c12", 
-            "#9b59b6", "#1abc9c", "#34495e", "#e67e22"
-        ]
-        return colors[index % len(colors)] 
\ No newline at end of file
@@ -3,10 +3,24 @@ import json
 import uuid
 import asyncio
 from datetime import datetime
-from typing import List, Optional, Dict, Any
-from app.schemas.multitrack_project import MultitrackProject, ProjectInfo
+from typing import List, Optional, Dict, Any, Tuple
+from app.config.settings import settings
+from app.schemas.multitrack_project import MultitrackProject, ProjectInfo, ProjectPatchOperation
 from app.services.audio_mix_service import AudioMixService
 from app.services.audio.ffmpeg_service import FFmpegService
+from app.services.audio.source_resolver import ClipSourceResolver, ClipSource
+from app.services.audio.encoding_profiles import get_preview_profile, PREVIEW_QUALITIES
+from app.services.audio.loudness import loudness_gain
+from app.services.audio.render_quality import get_render_quality
+from app.services.audio.stretch_service import StretchService
+from app.services.project_patch_service import ProjectPatchService, RevisionConflictError
+from app.services.project_cache import ProjectCache, ProjectSignature
+from app.services.timeline import CompiledTimeline
+from app.services.tracing import traced, set_span_attributes, set_span_error
+from app.services.project_validator import ProjectValidator
+
+# 进程内共享的已解析项目缓存，同时作为增量修改的内存工作副本
+_project_cache = ProjectCache(settings.PROJECT_CACHE_SIZE)
 
 class MultitrackService:
     """
@@ -19,7 +33,10 @@ class MultitrackService:
         os.makedirs(self.projects_dir, exist_ok=True)
         os.makedirs(self.exports_dir, exist_ok=True)
         self.ffmpeg_service = FFmpegService()
+        self.stretch_service = StretchService(self.ffmpeg_service)
+        self.patch_service = ProjectPatchService()
         
+    @traced()
     async def create_project(self, project: MultitrackProject) -> MultitrackProject:
         """
         创建新的多音轨项目
@@ -37,23 +54,17 @@ class MultitrackService:
         
         return project
     
+    @traced()
     async def load_project(self, project_id: str) -> Optional[MultitrackProject]:
         """
         加载多音轨项目
+        返回的是缓存中的共享对象，调用方只读不改；修改通过 save_project / patch_project 完成，
+        两者都用新对象替换缓存条目，已持有旧对象的导出/预览不受影响
         """
-        project_file = os.path.join(self.projects_dir, f"{project_id}.json")
-        
-        if not os.path.exists(project_file):
-            return None
-            
-        try:
-            with open(project_file, 'r', encoding='utf-8') as f:
-                project_data = json.load(f)
-                return MultitrackProject(**project_data)
-        except Exception as e:
-            print(f"加载项目 {project_id} 失败: {e}")
-            return None
+        project, _ = self._load_project_with_oplog(project_id)
+        return project
     
+    @traced()
     async def save_project(self, project_id: str, project: MultitrackProject) -> MultitrackProject:
         """
         保存多音轨项目
@@ -61,11 +72,56 @@ class MultitrackService:
         # 确保项目ID一致
         project.project.id = project_id
         
+        # 完整保存同样推进修订号，使基于旧修订号的增量修改失效
+        cached = _project_cache.peek(project_id)
+        known_revision = cached.project.project.revision if cached else 0
+        project.project.revision = max(project.project.revision, known_revision) + 1
+        
         # 保存项目文件
         await self._save_project_file(project_id, project)
         
         return project
     
+    @traced()
+    async def patch_project(
+        self,
+        project_id: str,
+        operations: List[ProjectPatchOperation],
+        base_revision: Optional[int] = None
+    ) -> Optional[MultitrackProject]:
+        """
+        增量修改项目：操作应用到内存工作副本并追加到操作日志，
+        日志累计到阈值后再合并写入完整快照
+        """
+        project, pending = self._load_project_with_oplog(project_id)
+        if not project:
+            return None
+        
+        if base_revision is not None and base_revision != project.project.revision:
+            raise RevisionConflictError(
+                f"项目已被修改，当前修订号 {project.project.revision}，请求基于 {base_revision}"
+            )
+        
+        # 在浅拷贝上应用操作（只复制被修改的轨道和片段），成功后再替换缓存：
+        # 并发的导出/预览不会读到改了一半的项目，操作失败时缓存中的对象也保持原样
+        project = project.model_copy(update={
+            "project": project.project.model_copy(),
+            "tracks": list(project.tracks)
+        })
+        self.patch_service.apply_operations(project, operations)
+        
+        project.project.revision += 1
+        self._append_oplog(project_id, project.project.revision, operations)
+        pending += 1
+        
+        if pending >= settings.PROJECT_OPLOG_COMPACT_THRESHOLD:
+            await self._save_project_file(project_id, project)
+        else:
+            _project_cache.put(project_id, project, self._project_signature(project_id), pending)
+        
+        return project
+    
+    @traced()
     async def list_projects(self) -> List[ProjectInfo]:
         """
         获取所有项目列表
@@ -78,12 +134,31 @@ class MultitrackService:
         for filename in os.listdir(self.projects_dir):
             if filename.endswith('.json'):
                 project_id = filename[:-5]  # 移除 .json 后缀
-                project = await self.load_project(project_id)
-                if project:
-                    projects.append(project.project)
+                project_info = self._read_project_info(project_id)
+                if project_info:
+                    projects.append(project_info)
                     
         return sorted(projects, key=lambda x: x.createdAt or datetime.min, reverse=True)
     
+    def _read_project_info(self, project_id: str) -> Optional[ProjectInfo]:
+        """
+        读取项目信息，不经过项目缓存（列表不应挤掉正在编辑的项目）
+        缓存中已有最新版本时直接使用；否则只解析快照中的 project 部分，
+        尚未合并的操作日志中的修改在合并后才会体现
+        """
+        cached = _project_cache.peek(project_id)
+        if cached and cached.signature == self._project_signature(project_id):
+            return cached.project.project
+        
+        project_file = os.path.join(self.projects_dir, f"{project_id}.json")
+        try:
+            with open(project_file, 'r', encoding='utf-8') as f:
+                return ProjectInfo(**json.load(f)["project"])
+        except Exception as e:
+            print(f"读取项目 {project_id} 信息失败: {e}")
+            return None
+    
+    @traced()
     async def delete_project(self, project_id: str) -> bool:
         """
         删除多音轨项目
@@ -95,16 +170,24 @@ class MultitrackService:
             
         try:
             os.remove(project_file)
+            self._remove_oplog(project_id)
+            _project_cache.invalidate(project_id)
             return True
         except Exception as e:
             print(f"删除项目 {project_id} 失败: {e}")
             return False
     
-    async def export_project_audio(self, project_id: str, export_task_id: str):
+    @traced()
+    async def export_project_audio(self, project_id: str, export_task_id: str, normalize_loudness: bool = False,
+                                   render_quality: str = "master"):
         """
         导出多音轨项目为音频文件（后台任务）
+        normalize_loudness 为 True 时按预先测得的响度为每个源文件施加归一化增益；
+        render_quality 为重采样器配置（draft/master）
         """
         try:
+            resampler_options = get_render_quality(render_quality).resampler_args(self.ffmpeg_service.supports_soxr())
+            
             # 加载项目
             project = await self.load_project(project_id)
             if not project:
@@ -115,28 +198,15 @@ class MultitrackService:
             await self._save_export_status(export_task_id, "processing", "正在处理音频...")
             
             # 转换为音频合成请求格式
-            audio_tracks = []
-            for track in project.tracks:
-                if track.muted:
-                    continue
-                    
-                for clip in track.clips:
-                    # 将文件ID转换为完整路径
-                    audio_file_path = f"uploads/audio/{clip.filePath}.wav"
-                    
-                    # 检查文件是否存在
-                    if not os.path.exists(audio_file_path):
-                        print(f"警告: 音频文件不存在 {audio_file_path}")
-                        continue
-                        
-                    audio_tracks.append({
-                        "file_path": audio_file_path,
-                        "start_time": clip.startTime,
-                        "duration": clip.duration,
-                        "volume": clip.volume * track.volume,
-                        "fade_in": clip.fadeIn,
-                        "fade_out": clip.fadeOut
-                    })
+            timeline = self._get_timeline(project_id, project)
+            resolver = ClipSourceResolver()
+            file_paths = self._resolve_timeline_files(timeline, resolver, sample_rate=timeline.sample_rate)
+            file_gains = self._loudness_gains(timeline, resolver, file_paths) if normalize_loudness else None
+            audio_tracks = timeline.mix_inputs(
+                timeline.audible(), file_paths,
+                file_gains=file_gains,
+                file_durations=self._source_durations(timeline, resolver, file_paths)
+            )
             
             if not audio_tracks:
                 await self._save_export_status(export_task_id, "failed", "没有有效的音频文件")
@@ -146,18 +216,28 @@ class MultitrackService:
             output_format = project.project.exportFormat or "wav"
             output_path = os.path.join(self.exports_dir, f"{export_task_id}.{output_format}")
             
+            set_span_attributes(**{
+                "project.id": project_id,
+                "render.quality": render_quality,
+                "mix.clip_count": len(audio_tracks),
+                "output.duration_seconds": project.project.totalDuration,
+            })
+            
             # 调用FFmpeg服务进行音频混合
             try:
+                audio_tracks = await self._apply_playback_rates(audio_tracks)
                 result_path = await self.ffmpeg_service.mix_audio_tracks(
                     audio_tracks, 
                     output_path, 
                     project.project.totalDuration,
-                    project.project.sampleRate or 44100
+                    project.project.sampleRate or 44100,
+                    resampler_options=resampler_options
                 )
                 
                 # 验证输出文件
                 if not os.path.exists(result_path):
                     raise RuntimeError("音频合成完成但输出文件不存在")
+                set_span_attributes(**{"output.bytes": os.path.getsize(result_path)})
                     
             except Exception as e:
                 await self._save_export_status(export_task_id, "failed", f"音频合成失败: {str(e)}")
@@ -174,6 +254,7 @@ class MultitrackService:
         except Exception as e:
             await self._save_export_status(export_task_id, "failed", f"导出失败: {str(e)}")
     
+    @traced()
     async def get_export_status(self, export_task_id: str) -> Dict[str, Any]:
         """
         获取导出任务状态
@@ -197,6 +278,7 @@ class MultitrackService:
                 "message": f"读取状态失败: {str(e)}"
             }
     
+    @traced()
     async def get_exported_file_path(self, export_task_id: str) -> Optional[str]:
         """
         获取导出文件路径
@@ -208,6 +290,7 @@ class MultitrackService:
             
         return None
     
+    @traced()
     async def validate_project(self, project_id: str) -> Dict[str, Any]:
         """
         验证项目数据完整性
@@ -220,41 +303,12 @@ class MultitrackService:
                 "errors": ["项目不存在"]
             }
             
-        errors = []
-        warnings = []
-        
-        # 验证项目基本信息
-        if not project.project.title:
-            errors.append("项目标题不能为空")
-            
-        if project.project.totalDuration <= 0:
-            errors.append("项目总时长必须大于0")
-        
-        # 验证音轨
-        if not project.tracks:
-            warnings.append("项目没有音轨")
-        else:
-            for track in project.tracks:
-                # 验证音频文件是否存在
-                for clip in track.clips:
-                    audio_file_path = f"uploads/audio/{clip.filePath}.wav"
-                    if not os.path.exists(audio_file_path):
-                        warnings.append(f"音频文件不存在: {audio_file_path}")
-                        
-                    # 验证时间范围
-                    if clip.startTime < 0:
-                        errors.append(f"音频片段 {clip.id} 开始时间不能为负数")
-                        
-                    if clip.duration <= 0:
-                        errors.append(f"音频片段 {clip.id} 持续时间必须大于0")
-        
-        return {
-            "valid": len(errors) == 0,
-            "errors": errors,
-            "warnings": warnings,
-            "project_id": project_id
-        }
+        timeline = self._get_timeline(project_id, project)
+        result = ProjectValidator(ClipSourceResolver()).validate(project, timeline)
+        result["project_id"] = project_id
+        return result
     
+    @traced()
     async def _save_project_file(self, project_id: str, project: MultitrackProject):
         """
         保存项目文件到磁盘
@@ -266,13 +320,243 @@ class MultitrackService:
         if project_dict["project"]["createdAt"]:
             project_dict["project"]["createdAt"] = project_dict["project"]["createdAt"].isoformat()
             
-        with open(project_file, 'w', encoding='utf-8') as f:
+        # 先写临时文件再替换，避免中途失败留下损坏的快照
+        temp_file = f"{project_file}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
             json.dump(project_dict, f, ensure_ascii=False, indent=2)
+        os.replace(temp_file, project_file)
+        
+        # 快照已包含全部修改，日志可以清空
+        self._remove_oplog(project_id)
+        _project_cache.put(project_id, project, self._project_signature(project_id))
+    
+    @traced()
+    def _load_project_with_oplog(self, project_id: str) -> Tuple[Optional[MultitrackProject], int]:
+        """
+        读取项目快照并重放尚未合并的操作日志，返回 (项目, 未合并日志条数)
+        文件签名未变化时直接返回缓存，不再读取磁盘和重新校验
+        """
+        set_span_attributes(**{"project.id": project_id})
+        signature = self._project_signature(project_id)
+        if signature is None:
+            _project_cache.invalidate(project_id)
+            return None, 0
+        
+        cached = _project_cache.get(project_id, signature)
+        set_span_attributes(**{"project.cache_hit": cached is not None})
+        if cached:
+            return cached.project, cached.pending
+        
+        project_file = os.path.join(self.projects_dir, f"{project_id}.json")
+            
+        try:
+            with open(project_file, 'r', encoding='utf-8') as f:
+                project_data = json.load(f)
+                project = MultitrackProject(**project_data)
+        except Exception as e:
+            print(f"加载项目 {project_id} 失败: {e}")
+            return None, 0
+        
+        pending = 0
+        oplog_file = self._oplog_path(project_id)
+        if os.path.exists(oplog_file):
+            try:
+                with open(oplog_file, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        entry = json.loads(line)
+                        # 快照之前已合并的条目直接跳过
+                        if entry["revision"] <= project.project.revision:
+                            continue
+                        operations = [ProjectPatchOperation(**op) for op in entry["operations"]]
+                        self.patch_service.apply_operations(project, operations)
+                        project.project.revision = entry["revision"]
+                        pending += 1
+            except Exception as e:
+                print(f"重放项目 {project_id} 操作日志失败: {e}")
+                return None, 0
+        
+        _project_cache.put(project_id, project, signature, pending)
+        return project, pending
+    
+    @traced()
+    def _get_timeline(self, project_id: str, project: MultitrackProject) -> CompiledTimeline:
+        """
+        获取项目的编译时间线，同一缓存条目（即同一项目版本）只编译一次
+        """
+        cached = _project_cache.peek(project_id)
+        if cached is None or cached.project is not project:
+            return CompiledTimeline(project)
+        
+        if cached.timeline is None:
+            cached.timeline = CompiledTimeline(project)
+        return cached.timeline
+    
+    @traced()
+    def _resolve_timeline_files(
+        self,
+        timeline: CompiledTimeline,
+        resolver: ClipSourceResolver,
+        indices: Optional[List[int]] = None,
+        use_proxy: bool = False,
+        sample_rate: Optional[int] = None
+    ) -> List[Optional[str]]:
+        """
+        将时间线中的源文件引用批量解析为实际存储路径，不存在的文件为 None
+        indices 不为空时只解析这些片段引用的文件；use_proxy 为 True 时优先使用代理文件；
+        工作副本采样率与渲染采样率 sample_rate 一致时使用工作副本
+        """
+        if indices is None:
+            needed = list(range(len(timeline.files)))
+        else:
+            needed = sorted({timeline.file_index[i] for i in indices})
+        
+        sources = resolver.resolve_many([timeline.files[file_idx] for file_idx in needed])
+        
+        file_paths: List[Optional[str]] = [None] * len(timeline.files)
+        for file_idx, source in zip(needed, sources):
+            if source:
+                file_paths[file_idx] = source.render_path(use_proxy, sample_rate)
+            else:
+                print(f"警告: 音频文件不存在 {timeline.files[file_idx]}")
+        
+        set_span_attributes(**{
+            "timeline.file_count": len(needed),
+            "timeline.missing_files": sum(1 for source in sources if source is None),
+        })
+        return file_paths
+    
+    def _loudness_gains(
+        self,
+        timeline: CompiledTimeline,
+        resolver: ClipSourceResolver,
+        file_paths: List[Optional[str]]
+    ) -> List[float]:
+        """
+        按入库时测得的响度计算每个源文件的归一化增益，与 timeline.files 一一对应
+        只处理已解析的文件（resolver 内有缓存，不会重复查询）
+        """
+        return [
+            loudness_gain(source.loudness_lufs, source.true_peak_db) if source else 1.0
+            for source in self._resolved_sources(timeline, resolver, file_paths)
+        ]
     
-    async def generate_preview_audio(self, project_id: str, start_time: float = 0, duration: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    def _source_durations(
+        self,
+        timeline: CompiledTimeline,
+        resolver: ClipSourceResolver,
+        file_paths: List[Optional[str]]
+    ) -> List[Optional[float]]:
+        """
+        每个源文件的时长（循环片段据此确定循环长度），与 timeline.files 一一对应
+        """
+        return [
+            source.duration if source else None
+            for source in self._resolved_sources(timeline, resolver, file_paths)
+        ]
+    
+    def _resolved_sources(
+        self,
+        timeline: CompiledTimeline,
+        resolver: ClipSourceResolver,
+        file_paths: List[Optional[str]]
+    ) -> List[Optional[ClipSource]]:
+        """
+        已解析源文件的详细信息，与 timeline.files 一一对应
+        只处理已解析的文件（resolver 内有缓存，不会重复查询）
+        """
+        sources: List[Optional[ClipSource]] = [None] * len(timeline.files)
+        resolved = [file_idx for file_idx, file_path in enumerate(file_paths) if file_path]
+        for file_idx, source in zip(resolved, resolver.resolve_many([timeline.files[i] for i in resolved])):
+            sources[file_idx] = source
+        return sources
+    
+    @traced()
+    async def _apply_playback_rates(self, audio_tracks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        变速片段改用缓存的变速渲染文件，入点和循环长度换算到渲染文件的时间轴上
+        同一 (源文件, 速度) 只渲染一次，多个片段共享
+        """
+        keys = list({(track["file_path"], track["playback_rate"]) for track in audio_tracks if "playback_rate" in track})
+        if not keys:
+            return audio_tracks
+        paths = await asyncio.gather(*(self.stretch_service.get_stretched(*key) for key in keys))
+        renders = dict(zip(keys, paths))
+        
+        stretched_tracks = []
+        for track in audio_tracks:
+            rate = track.get("playback_rate")
+            if rate is None:
+                stretched_tracks.append(track)
+                continue
+            track = {key: value for key, value in track.items() if key != "playback_rate"}
+            track["file_path"] = renders[(track["file_path"], rate)]
+            track["source_start"] = track["source_start"] / rate
+            if track.get("loop"):
+                track["loop_length"] = track["loop_length"] / rate
+            stretched_tracks.append(track)
+        return stretched_tracks
+    
+    def _project_signature(self, project_id: str) -> Optional[ProjectSignature]:
+        """
+        根据快照和操作日志的 mtime/大小生成缓存签名，项目不存在时返回 None
+        """
+        try:
+            snapshot_stat = os.stat(os.path.join(self.projects_dir, f"{project_id}.json"))
+        except FileNotFoundError:
+            return None
+        
+        try:
+            oplog_stat = os.stat(self._oplog_path(project_id))
+            oplog_signature = (oplog_stat.st_mtime_ns, oplog_stat.st_size)
+        except FileNotFoundError:
+            oplog_signature = (0, 0)
+        
+        return (snapshot_stat.st_mtime_ns, snapshot_stat.st_size) + oplog_signature
+    
+    def _oplog_path(self, project_id: str) -> str:
+        return os.path.join(self.projects_dir, f"{project_id}.oplog.jsonl")
+    
+    def _append_oplog(self, project_id: str, revision: int, operations: List[ProjectPatchOperation]):
+        """
+        追加一条操作日志
+        """
+        entry = {
+            "revision": revision,
+            "timestamp": datetime.now().isoformat(),
+            "operations": [op.dict(exclude_none=True) for op in operations]
+        }
+        with open(self._oplog_path(project_id), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    
+    def _remove_oplog(self, project_id: str):
+        oplog_file = self._oplog_path(project_id)
+        if os.path.exists(oplog_file):
+            os.remove(oplog_file)
+    
+    @traced()
+    async def generate_preview_audio(
+        self,
+        project_id: str,
+        start_time: float = 0,
+        duration: Optional[float] = None,
+        format: str = "wav",
+        quality: str = "medium",
+        normalize_loudness: bool = False,
+        render_quality: str = "draft"
+    ) -> Optional[Dict[str, Any]]:
         """
         生成项目音频预览
+        format 为 wav/opus/aac/mp3，压缩格式按 quality 档位选择码率；
+        normalize_loudness 与导出相同，使用预先测得的响度增益；
+        render_quality 为重采样器配置，预览默认使用速度优先的 draft
         """
+        profile = get_preview_profile(format)
+        if quality not in PREVIEW_QUALITIES:
+            raise ValueError(f"不支持的预览质量: {quality}. 支持的质量: {', '.join(PREVIEW_QUALITIES)}")
+        resampler_options = get_render_quality(render_quality).resampler_args(self.ffmpeg_service.supports_soxr())
+
         try:
             # 加载项目
             project = await self.load_project(project_id)
@@ -286,90 +570,89 @@ class MultitrackService:
             if duration is None:
                 duration = max(1.0, project.project.totalDuration - start_time)
             
-            # 转换为音频合成请求格式
-            audio_tracks = []
-            for track in project.tracks:
-                if track.muted:
-                    continue
-                    
-                for clip in track.clips:
-                    # 检查片段是否在预览时间范围内
-                    clip_end = clip.startTime + clip.duration
-                    preview_end = start_time + duration
-                    
-                    if clip_end <= start_time or clip.startTime >= preview_end:
-                        continue  # 片段不在预览范围内
-                    
-                    # 将文件ID转换为完整路径
-                    audio_file_path = f"uploads/audio/{clip.filePath}.wav"
-                    
-                    # 检查文件是否存在
-                    if not os.path.exists(audio_file_path):
-                        print(f"警告: 音频文件不存在 {audio_file_path}")
-                        continue
-                    
-                    # 计算相对于预览开始时间的偏移
-                    relative_start = max(0, clip.startTime - start_time)
-                    
-                    audio_tracks.append({
-                        "file_path": audio_file_path,
-                        "start_time": relative_start,
-                        "duration": clip.duration,
-                        "volume": clip.volume * track.volume,
-                        "fade_in": clip.fadeIn,
-                        "fade_out": clip.fadeOut
-                    })
+            sample_rate = profile.output_sample_rate(project.project.sampleRate or 44100)
+            
+            # 转换为音频合成请求格式，只取与预览时间范围重叠的片段
+            timeline = self._get_timeline(project_id, project)
+            indices = timeline.select(start_time, start_time + duration)
+            resolver = ClipSourceResolver()
+            file_paths = self._resolve_timeline_files(
+                timeline, resolver, indices, use_proxy=settings.PREVIEW_USE_PROXIES, sample_rate=sample_rate
+            )
+            file_gains = self._loudness_gains(timeline, resolver, file_paths) if normalize_loudness else None
+            audio_tracks = timeline.mix_inputs(
+                indices, file_paths, offset=start_time,
+                file_gains=file_gains,
+                file_durations=self._source_durations(timeline, resolver, file_paths)
+            )
+            
+            set_span_attributes(**{
+                "project.id": project_id,
+                "preview.format": profile.name,
+                "render.quality": render_quality,
+                "mix.clip_count": len(audio_tracks),
+                "output.duration_seconds": duration,
+            })
             
             # 确保输出目录存在
             os.makedirs("outputs", exist_ok=True)
             
             # 生成预览音频文件
-            output_path = f"outputs/preview_{preview_id}.wav"
+            output_path = f"outputs/preview_{preview_id}.{profile.extension}"
+            encoder_args = profile.ffmpeg_args(quality)
             
             if audio_tracks:
+                audio_tracks = await self._apply_playback_rates(audio_tracks)
                 # 使用FFmpeg进行音频混合
                 result_path = await self.ffmpeg_service.mix_audio_tracks(
                     audio_tracks,
                     output_path,
                     duration,
-                    project.project.sampleRate or 44100
+                    sample_rate,
+                    encoder_args,
+                    resampler_options
                 )
             else:
                 # 如果没有音频轨道，生成静音文件
-                result_path = await self._generate_silence(output_path, duration)
+                result_path = await self._generate_silence(output_path, duration, sample_rate, encoder_args)
             
             return {
                 "preview_file": preview_id,
                 "duration": duration,
-                "sample_rate": project.project.sampleRate or 44100,
+                "sample_rate": sample_rate,
+                "format": profile.name,
+                "media_type": profile.media_type,
+                "bitrate": profile.bitrate(quality),
                 "file_path": result_path
             }
             
         except Exception as e:
             print(f"生成预览音频失败: {e}")
+            set_span_error(str(e))
             return None
     
-    async def _generate_silence(self, output_path: str, duration: float) -> str:
+    async def _generate_silence(
+        self,
+        output_path: str,
+        duration: float,
+        sample_rate: int = 44100,
+        encoder_args: Optional[List[str]] = None
+    ) -> str:
         """
         生成指定时长的静音文件
         """
         cmd = [
             self.ffmpeg_service.ffmpeg_path,
             '-f', 'lavfi',
-            '-i', f'anullsrc=r=44100:cl=stereo',
+            '-i', f'anullsrc=r={sample_rate}:cl=stereo',
             '-t', str(duration),
+            *(encoder_args or []),
             '-y', output_path
         ]
         
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        
-        stdout, stderr = await process.communicate()
+        returncode, stdout, stderr = await self.ffmpeg_service.run_command('silence', cmd, output_path)
         
-        if process.returncode != 0:
+        if returncode != 0:
             raise RuntimeError(f"生成静音文件失败: {stderr.decode()}")
         
         return output_path
@@ -378,6 +661,9 @@ class MultitrackService:
         """
         保存导出任务状态
         """
+        if status == "failed":
+            set_span_error(message)
+        
         status_file = os.path.join(self.exports_dir, f"{export_task_id}_status.json")
         
         status_data = {
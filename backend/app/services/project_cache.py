@@ -0,0 +1,68 @@
+from collections import OrderedDict
+from typing import Optional, Tuple
+from app.schemas.multitrack_project import MultitrackProject
+
+# 项目文件签名: (快照 mtime_ns, 快照大小, 日志 mtime_ns, 日志大小)
+ProjectSignature = Tuple[int, int, int, int]
+
+
+class CachedProject:
+    """缓存条目"""
+    __slots__ = ("project", "pending", "signature", "timeline")
+
+    def __init__(self, project: MultitrackProject, pending: int, signature: ProjectSignature):
+        self.project = project
+        self.pending = pending  # 尚未合并进快照的操作日志条数
+        self.signature = signature
+        self.timeline = None  # 按需编译的 CompiledTimeline，随条目一同失效
+
+
+class ProjectCache:
+    """
+    已解析项目对象的 LRU 缓存
+    以项目文件的 mtime/大小作为签名，文件在进程外被修改时自动失效
+    """
+
+    def __init__(self, max_size: int = 64):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, CachedProject]" = OrderedDict()
+
+    def get(self, project_id: str, signature: ProjectSignature) -> Optional[CachedProject]:
+        """
+        获取缓存条目，签名不一致时视为失效
+        """
+        entry = self._entries.get(project_id)
+        if entry is None:
+            return None
+
+        if entry.signature != signature:
+            del self._entries[project_id]
+            return None
+
+        self._entries.move_to_end(project_id)
+        return entry
+
+    def peek(self, project_id: str) -> Optional[CachedProject]:
+        """
+        不校验签名、不调整顺序地查看缓存条目
+        """
+        return self._entries.get(project_id)
+
+    def put(self, project_id: str, project: MultitrackProject, signature: ProjectSignature, pending: int = 0):
+        self._entries[project_id] = CachedProject(project, pending, signature)
+        self._entries.move_to_end(project_id)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, project_id: str):
+        self._entries.pop(project_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, project_id: str) -> bool:
+        return project_id in self._entries
@@ -0,0 +1,192 @@
+from typing import List, Optional, Set, Tuple
+from app.schemas.multitrack_project import (
+    MultitrackProject,
+    ProjectPatchOperation,
+    PatchOpType,
+    Track,
+    AudioClip
+)
+
+
+class RevisionConflictError(ValueError):
+    """客户端基于的修订号与服务端不一致"""
+
+
+class ProjectPatchService:
+    """
+    项目增量修改服务 - 将细粒度操作直接应用到内存中的项目对象
+    """
+
+    def apply_operations(self, project: MultitrackProject, operations: List[ProjectPatchOperation]) -> int:
+        """
+        按顺序执行操作，返回已应用的操作数量
+        写时复制：被修改的轨道和片段先复制再修改，未涉及的轨道和片段与原对象共享，
+        因此 project 只需是浅拷贝（project 信息和轨道列表已复制）；
+        操作非法时抛出 ValueError，调用方丢弃 project 即可，原对象不受影响
+        """
+        handlers = {
+            PatchOpType.move_clip: self._move_clip,
+            PatchOpType.set_volume: self._set_volume,
+            PatchOpType.add_clip: self._add_clip,
+            PatchOpType.remove_clip: self._remove_clip,
+            PatchOpType.reorder_tracks: self._reorder_tracks,
+            PatchOpType.trim_clip: self._trim_clip,
+        }
+
+        # 本批操作中已复制的轨道/片段（id），同一对象只复制一次
+        copied: Set[int] = set()
+        for operation in operations:
+            handlers[operation.op](project, operation, copied)
+
+        return len(operations)
+
+    def _move_clip(self, project: MultitrackProject, operation: ProjectPatchOperation, copied: Set[int]):
+        """
+        移动片段（可跨轨道）
+        """
+        track, index = self._find_clip(project, operation.trackId, operation.clipId, copied)
+        clip = self._writable_clip(track, index, copied)
+
+        if operation.startTime is not None:
+            if operation.startTime < 0:
+                raise ValueError(f"音频片段 {clip.id} 开始时间不能为负数")
+            clip.startTime = operation.startTime
+
+        if operation.targetTrackId and operation.targetTrackId != track.id:
+            target_track = self._writable_track(project, operation.targetTrackId, copied)
+            track.clips.pop(index)
+            target_track.clips.append(clip)
+
+        self._extend_total_duration(project, clip)
+
+    def _set_volume(self, project: MultitrackProject, operation: ProjectPatchOperation, copied: Set[int]):
+        """
+        修改片段音量，未指定片段时修改轨道音量
+        """
+        if operation.volume is None or operation.volume < 0:
+            raise ValueError("音量必须为非负数")
+
+        if operation.clipId:
+            track, index = self._find_clip(project, operation.trackId, operation.clipId, copied)
+            self._writable_clip(track, index, copied).volume = operation.volume
+        else:
+            self._writable_track(project, operation.trackId, copied).volume = operation.volume
+
+    def _add_clip(self, project: MultitrackProject, operation: ProjectPatchOperation, copied: Set[int]):
+        """
+        新增片段
+        """
+        if operation.clip is None:
+            raise ValueError("add_clip 操作缺少 clip 数据")
+
+        track = self._writable_track(project, operation.trackId, copied)
+        if any(clip.id == operation.clip.id for clip in track.clips):
+            raise ValueError(f"音频片段已存在: {operation.clip.id}")
+
+        clip = operation.clip.model_copy(deep=True)
+        copied.add(id(clip))
+        if operation.index is None:
+            track.clips.append(clip)
+        else:
+            track.clips.insert(operation.index, clip)
+
+        self._extend_total_duration(project, clip)
+
+    def _remove_clip(self, project: MultitrackProject, operation: ProjectPatchOperation, copied: Set[int]):
+        """
+        删除片段
+        """
+        track, index = self._find_clip(project, operation.trackId, operation.clipId, copied)
+        track.clips.pop(index)
+
+    def _reorder_tracks(self, project: MultitrackProject, operation: ProjectPatchOperation, copied: Set[int]):
+        """
+        调整轨道顺序，trackOrder 需包含全部轨道ID
+        """
+        track_order = operation.trackOrder or []
+        tracks_by_id = {track.id: track for track in project.tracks}
+
+        if sorted(track_order) != sorted(tracks_by_id):
+            raise ValueError("trackOrder 必须包含且仅包含项目中的全部轨道ID")
+
+        project.tracks = [tracks_by_id[track_id] for track_id in track_order]
+        for order, track in enumerate(project.tracks, start=1):
+            # 只复制序号发生变化的轨道
+            if track.order != order:
+                self._writable_track(project, track.id, copied).order = order
+
+    def _trim_clip(self, project: MultitrackProject, operation: ProjectPatchOperation, copied: Set[int]):
+        """
+        修改片段的源文件入点/出点（非破坏性裁剪，不生成新文件）
+        从左侧裁剪时可同时传入 startTime 保持片段内容在时间线上的位置
+        """
+        track, index = self._find_clip(project, operation.trackId, operation.clipId, copied)
+        clip = track.clips[index]
+
+        source_start = clip.sourceStart if operation.sourceStart is None else operation.sourceStart
+        source_end = clip.sourceEnd if operation.sourceEnd is None else operation.sourceEnd
+        duration = clip.duration if operation.duration is None else operation.duration
+
+        if source_start < 0:
+            raise ValueError(f"音频片段 {clip.id} 入点不能为负数")
+        if source_end is not None and source_end <= source_start:
+            raise ValueError(f"音频片段 {clip.id} 出点必须大于入点")
+        if duration <= 0:
+            raise ValueError(f"音频片段 {clip.id} 持续时间必须大于0")
+        if operation.startTime is not None and operation.startTime < 0:
+            raise ValueError(f"音频片段 {clip.id} 开始时间不能为负数")
+
+        clip = self._writable_clip(track, index, copied)
+        clip.sourceStart = source_start
+        clip.sourceEnd = source_end
+        clip.duration = duration
+        if operation.startTime is not None:
+            clip.startTime = operation.startTime
+
+        self._extend_total_duration(project, clip)
+
+    def _find_track(self, project: MultitrackProject, track_id: Optional[str]) -> Track:
+        for track in project.tracks:
+            if track.id == track_id:
+                return track
+        raise ValueError(f"轨道不存在: {track_id}")
+
+    def _find_clip(self, project: MultitrackProject, track_id: Optional[str], clip_id: Optional[str],
+                   copied: Set[int]) -> Tuple[Track, int]:
+        """
+        查找片段，返回已复制（可修改）的轨道和片段下标
+        """
+        track = self._find_track(project, track_id)
+        for index, clip in enumerate(track.clips):
+            if clip.id == clip_id:
+                return self._writable_track(project, track.id, copied), index
+        raise ValueError(f"音频片段不存在: {clip_id}")
+
+    def _writable_track(self, project: MultitrackProject, track_id: Optional[str], copied: Set[int]) -> Track:
+        """
+        返回可修改的轨道：首次修改时复制轨道及其片段列表（片段本身仍共享）并替换到 project.tracks
+        """
+        for position, track in enumerate(project.tracks):
+            if track.id == track_id:
+                if id(track) not in copied:
+                    track = track.model_copy(update={"clips": list(track.clips)})
+                    project.tracks[position] = track
+                    copied.add(id(track))
+                return track
+        raise ValueError(f"轨道不存在: {track_id}")
+
+    def _writable_clip(self, track: Track, index: int, copied: Set[int]) -> AudioClip:
+        """
+        返回可修改的片段（track 须已通过 _writable_track 复制）
+        """
+        clip = track.clips[index]
+        if id(clip) not in copied:
+            clip = clip.model_copy()
+            track.clips[index] = clip
+            copied.add(id(clip))
+        return clip
+
+    def _extend_total_duration(self, project: MultitrackProject, clip: AudioClip):
+        end_time = clip.startTime + clip.duration
+        if end_time > project.project.totalDuration:
+            project.project.totalDuration = end_time
@@ -0,0 +1,134 @@
+from typing import Dict, List, Any, Optional
+from app.config.settings import settings
+from app.schemas.multitrack_project import MultitrackProject
+from app.services.timeline import CompiledTimeline
+from app.services.audio.source_resolver import ClipSourceResolver
+
+
+class ProjectValidator:
+    """
+    项目验证引擎
+    基于编译时间线做区间分析（重叠、空隙），并批量核对源文件的存在性、时长和采样率
+    """
+
+    def __init__(self, resolver: Optional[ClipSourceResolver] = None):
+        self.resolver = resolver or ClipSourceResolver()
+        self.gap_threshold = settings.VALIDATION_GAP_THRESHOLD
+        self.duration_tolerance = settings.VALIDATION_DURATION_TOLERANCE
+
+    def validate(self, project: MultitrackProject, timeline: CompiledTimeline) -> Dict[str, Any]:
+        errors: List[str] = []
+        warnings: List[str] = []
+
+        # 验证项目基本信息
+        if not project.project.title:
+            errors.append("项目标题不能为空")
+
+        if project.project.totalDuration <= 0:
+            errors.append("项目总时长必须大于0")
+
+        if not project.tracks:
+            warnings.append("项目没有音轨")
+            return self._result(errors, warnings, timeline, [], [], [])
+
+        # 验证时间范围
+        for i, clip_id in enumerate(timeline.clip_ids):
+            if timeline.start[i] < 0:
+                errors.append(f"音频片段 {clip_id} 开始时间不能为负数")
+
+            if timeline.duration[i] <= 0:
+                errors.append(f"音频片段 {clip_id} 持续时间必须大于0")
+
+            if timeline.source_start[i] < 0:
+                errors.append(f"音频片段 {clip_id} 入点不能为负数")
+
+        # 源文件检查：每个文件只解析一次
+        sources = self.resolver.resolve_many(timeline.files)
+        missing_files = []
+        for file_idx, file_ref in enumerate(timeline.files):
+            source = sources[file_idx]
+            if source is None:
+                missing_files.append(file_ref)
+                errors.append(f"音频文件不存在: {file_ref}")
+                continue
+
+            if source.sample_rate and source.sample_rate != timeline.sample_rate:
+                warnings.append(
+                    f"音频文件 {file_ref} 采样率 {source.sample_rate}Hz 与项目采样率 {timeline.sample_rate}Hz 不一致，渲染时将重采样"
+                )
+
+        # 片段播放区间与源文件实际时长比对（循环片段除外）
+        for i, clip_id in enumerate(timeline.clip_ids):
+            source = sources[timeline.file_index[i]]
+            if not source or not source.duration or timeline.loop[i]:
+                continue
+            source_end = timeline.source_start[i] + timeline.duration[i] * timeline.playback_rate[i]
+            if source_end > source.duration + self.duration_tolerance:
+                warnings.append(
+                    f"音频片段 {clip_id} 播放区间 {timeline.source_start[i]:.2f}-{source_end:.2f}s 超过源文件时长 {source.duration:.2f}s"
+                )
+
+        overlaps, gaps = self._analyze_intervals(timeline)
+        for overlap in overlaps:
+            warnings.append(
+                f"轨道 {overlap['trackId']} 中片段 {overlap['clipId']} 与 {overlap['previousClipId']} 重叠 {overlap['overlap']:.2f}s"
+            )
+
+        return self._result(errors, warnings, timeline, missing_files, overlaps, gaps)
+
+    def _analyze_intervals(self, timeline: CompiledTimeline):
+        """
+        按轨道计算片段重叠与空隙
+        时间线已按开始时间排序，单次遍历即可维护每条轨道当前的最远结束时间
+        """
+        overlaps = []
+        gaps = []
+        track_count = len(timeline.track_ids)
+        last_end: List[Optional[float]] = [None] * track_count
+        last_clip: List[Optional[str]] = [None] * track_count
+
+        for i, clip_id in enumerate(timeline.clip_ids):
+            track_idx = timeline.track_index[i]
+            start = timeline.start[i]
+            end = start + timeline.duration[i]
+            previous_end = last_end[track_idx]
+
+            if previous_end is not None:
+                if start < previous_end:
+                    overlaps.append({
+                        "trackId": timeline.track_ids[track_idx],
+                        "clipId": clip_id,
+                        "previousClipId": last_clip[track_idx],
+                        "start": start,
+                        "end": min(end, previous_end),
+                        "overlap": min(end, previous_end) - start
+                    })
+                elif start - previous_end > self.gap_threshold:
+                    gaps.append({
+                        "trackId": timeline.track_ids[track_idx],
+                        "start": previous_end,
+                        "end": start,
+                        "duration": start - previous_end
+                    })
+
+            if previous_end is None or end > previous_end:
+                last_end[track_idx] = end
+                last_clip[track_idx] = clip_id
+
+        return overlaps, gaps
+
+    def _result(self, errors, warnings, timeline, missing_files, overlaps, gaps) -> Dict[str, Any]:
+        return {
+            "valid": len(errors) == 0,
+            "errors": errors,
+            "warnings": warnings,
+            "stats": {
+                "clipCount": len(timeline),
+                "fileCount": len(timeline.files),
+                "missingFileCount": len(missing_files),
+                "overlapCount": len(overlaps),
+                "gapCount": len(gaps)
+            },
+            "overlaps": overlaps,
+            "gaps": gaps
+        }
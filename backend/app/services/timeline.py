@@ -0,0 +1,174 @@
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional
+from app.schemas.multitrack_project import MultitrackProject
+
+
+class CompiledTimeline:
+    """
+    编译后的时间线 - 渲染路径使用的轻量表示
+    每个片段在并行数组中占一个下标，按开始时间排序，不再持有 Pydantic 对象
+    """
+
+    def __init__(self, project: MultitrackProject):
+        self.revision = project.project.revision
+        self.total_duration = project.project.totalDuration
+        self.sample_rate = project.project.sampleRate or 44100
+
+        # 去重后的源文件列表，片段通过 file_index 引用
+        self.files: List[str] = []
+        self.track_ids: List[str] = []
+        self.track_muted: List[bool] = []
+
+        self.clip_ids: List[str] = []
+        self.file_index = array('i')
+        self.track_index = array('i')
+        self.start = array('d')
+        self.duration = array('d')
+        self.source_start = array('d')
+        # 源文件出点，未设置为 -1
+        self.source_end = array('d')
+        self.gain = array('d')
+        self.fade_in = array('d')
+        self.fade_out = array('d')
+        self.loop = array('b')
+        # 播放速度，片段在时间线上播放 duration 秒消耗源文件 duration * playback_rate 秒
+        self.playback_rate = array('d')
+
+        file_lookup: Dict[str, int] = {}
+        clips = []
+        for track_idx, track in enumerate(project.tracks):
+            self.track_ids.append(track.id)
+            self.track_muted.append(track.muted)
+            for clip in track.clips:
+                clips.append((clip.startTime, track_idx, track.volume, clip))
+
+        # 按开始时间排序，便于按时间窗口二分查找
+        clips.sort(key=lambda item: item[0])
+
+        for start_time, track_idx, track_volume, clip in clips:
+            file_idx = file_lookup.get(clip.filePath)
+            if file_idx is None:
+                file_idx = len(self.files)
+                file_lookup[clip.filePath] = file_idx
+                self.files.append(clip.filePath)
+
+            self.clip_ids.append(clip.id)
+            self.file_index.append(file_idx)
+            self.track_index.append(track_idx)
+            self.start.append(start_time)
+            # 设置了出点时，非循环片段最多播放到出点
+            duration = clip.duration
+            if clip.sourceEnd is not None and not self._is_loop(clip):
+                duration = min(duration, (clip.sourceEnd - clip.sourceStart) / clip.playbackRate)
+            self.duration.append(duration)
+            self.source_start.append(clip.sourceStart)
+            self.source_end.append(-1.0 if clip.sourceEnd is None else clip.sourceEnd)
+            self.gain.append(clip.volume * track_volume)
+            self.fade_in.append(clip.fadeIn)
+            self.fade_out.append(clip.fadeOut)
+            self.loop.append(1 if self._is_loop(clip) else 0)
+            self.playback_rate.append(clip.playbackRate)
+
+        self.max_duration = max(self.duration) if self.duration else 0.0
+
+    @staticmethod
+    def _is_loop(clip) -> bool:
+        return bool(clip.loop or (clip.metadata or {}).get("loop"))
+
+    def __len__(self) -> int:
+        return len(self.clip_ids)
+
+    def audible(self) -> List[int]:
+        """
+        所有未静音轨道上的片段下标
+        """
+        muted = self.track_muted
+        track_index = self.track_index
+        return [i for i in range(len(self.clip_ids)) if not muted[track_index[i]]]
+
+    def select(self, start_time: float, end_time: float) -> List[int]:
+        """
+        与时间窗口 [start_time, end_time) 重叠且可听的片段下标
+        """
+        # 开始时间早于 start_time - max_duration 的片段不可能与窗口重叠
+        lo = bisect_left(self.start, start_time - self.max_duration)
+        hi = bisect_left(self.start, end_time)
+
+        muted = self.track_muted
+        track_index = self.track_index
+        start = self.start
+        duration = self.duration
+        return [
+            i for i in range(lo, hi)
+            if not muted[track_index[i]] and start[i] + duration[i] > start_time
+        ]
+
+    def mix_inputs(self, indices: List[int], file_paths: List[Optional[str]], offset: float = 0.0,
+                   file_gains: Optional[List[float]] = None,
+                   file_durations: Optional[List[Optional[float]]] = None) -> List[Dict]:
+        """
+        生成 FFmpegService.mix_audio_tracks 所需的音轨描述
+        file_paths 与 self.files 一一对应，为 None 的源文件会被跳过；
+        file_gains 为每个源文件的附加增益（如响度归一化），与 self.files 一一对应；
+        file_durations 为源文件时长，用于确定未设置出点的循环片段的循环长度。
+        变速片段带有 playback_rate，source_start/loop_length 仍为原始源文件中的位置和长度
+        """
+        tracks = []
+        for i in indices:
+            file_path = file_paths[self.file_index[i]]
+            if file_path is None:
+                continue
+
+            source_start = self.source_start[i]
+            duration = self.duration[i]
+            fade_in = self.fade_in[i]
+
+            rate = self.playback_rate[i]
+            loop_length = self._loop_length(i, file_durations)
+
+            # 片段在窗口开始前已开始播放：从源文件中对应位置开始，而不是从片段开头播放
+            # （循环片段改为从循环序列中对应位置开始）
+            skipped = max(0.0, offset - self.start[i])
+            if skipped > 0:
+                if not loop_length:
+                    source_start += skipped * rate
+                duration -= skipped
+                fade_in = max(0.0, fade_in - skipped)
+                if duration <= 0:
+                    continue
+
+            tracks.append({
+                "file_path": file_path,
+                "start_time": max(0.0, self.start[i] - offset),
+                "source_start": source_start,
+                "duration": duration,
+                "volume": self.gain[i] * file_gains[self.file_index[i]] if file_gains else self.gain[i],
+                "fade_in": fade_in,
+                "fade_out": self.fade_out[i]
+            })
+            if loop_length:
+                tracks[-1].update({"loop": True, "loop_length": loop_length, "loop_offset": skipped})
+            if rate != 1.0:
+                tracks[-1]["playback_rate"] = rate
+
+        return tracks
+
+    def _loop_length(self, i: int, file_durations: Optional[List[Optional[float]]]) -> Optional[float]:
+        """
+        循环片段的循环单元长度（源文件中的秒数）；片段时长不超过一个单元或源文件时长未知时不需要循环
+        """
+        if not self.loop[i]:
+            return None
+
+        if self.source_end[i] >= 0:
+            loop_length = self.source_end[i] - self.source_start[i]
+        else:
+            source_duration = file_durations[self.file_index[i]] if file_durations else None
+            if not source_duration:
+                return None
+            loop_length = source_duration - self.source_start[i]
+
+        if loop_length <= 0 or loop_length / self.playback_rate[i] >= self.duration[i]:
+            return None
+        return loop_length
@@ -0,0 +1,252 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.config.settings import settings
+
+# 当前协程/线程所在的 span，asyncio 任务创建时自动继承
+_current_span: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar("current_span", default=None)
+
+_SPAN_KINDS = {
+    "internal": "SPAN_KIND_INTERNAL",
+    "server": "SPAN_KIND_SERVER",
+    "client": "SPAN_KIND_CLIENT",
+}
+
+
+class Span:
+    """
+    一次操作的耗时记录，字段与 OpenTelemetry 的 span 对应
+    """
+    __slots__ = ("name", "trace_id", "span_id", "parent_span_id", "kind", "attributes",
+                 "events", "start_ns", "end_ns", "status_code", "status_message")
+
+    def __init__(self, name: str, trace_id: str, parent_span_id: Optional[str] = None,
+                 kind: str = "internal", attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.attributes: Dict[str, Any] = {}
+        self.events: List[Dict[str, Any]] = []
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status_code = "STATUS_CODE_UNSET"
+        self.status_message = ""
+        self.set_attributes(**(attributes or {}))
+
+    def set_attribute(self, key: str, value: Any):
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def set_error(self, message: str):
+        self.status_code = "STATUS_CODE_ERROR"
+        self.status_message = message
+
+    def record_exception(self, exc: BaseException):
+        self.events.append({
+            "name": "exception",
+            "timeUnixNano": str(time.time_ns()),
+            "attributes": _encode_attributes({
+                "exception.type": type(exc).__name__,
+                "exception.message": str(exc),
+            }),
+        })
+        self.set_error(str(exc))
+
+    @property
+    def duration_seconds(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """
+        OTLP/JSON 格式的 span
+        """
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": _SPAN_KINDS.get(self.kind, "SPAN_KIND_INTERNAL"),
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": _encode_attributes(self.attributes),
+            "status": {"code": self.status_code},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        if self.events:
+            span["events"] = self.events
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+
+class SpanExporter:
+    """
+    逐行输出结束的 span，每行是一个 OTLP/JSON 的 ExportTraceServiceRequest，
+    可直接由 OpenTelemetry Collector 的 otlpjsonfile 接收器读取
+    """
+
+    def __init__(self, stream=None, path: Optional[str] = None, service_name: str = settings.PROJECT_NAME):
+        self.stream = stream
+        self.path = path
+        self._lock = threading.Lock()
+        self._resource = {"attributes": _encode_attributes({"service.name": service_name})}
+        if path and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def export(self, span: Span):
+        line = json.dumps({
+            "resourceSpans": [{
+                "resource": self._resource,
+                "scopeSpans": [{"scope": {"name": "app.services.tracing"}, "spans": [span.to_otlp()]}],
+            }]
+        }, ensure_ascii=False)
+        with self._lock:
+            if self.path:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(line + "\n")
+            else:
+                print(line, file=self.stream or sys.stderr, flush=True)
+
+
+class Tracer:
+    """
+    创建嵌套的 span：同一请求内的 span 共享 trace_id，父子关系通过 contextvars 传递
+    未配置导出器时只记录不输出
+    """
+
+    def __init__(self, exporter: Optional[SpanExporter] = None):
+        self.exporter = exporter
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal",
+             parent: Optional[Tuple[str, str]] = None, **attributes) -> Iterator[Span]:
+        """
+        parent 为外部传入的 (trace_id, span_id)（如请求头 traceparent），
+        为空时使用当前上下文中的 span 作为父级
+        """
+        if parent is None:
+            current = _current_span.get()
+            parent = (current.trace_id, current.span_id) if current else None
+        trace_id, parent_span_id = parent or (secrets.token_hex(16), None)
+
+        span = Span(name, trace_id, parent_span_id, kind, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _current_span.reset(token)
+            if self.exporter:
+                try:
+                    self.exporter.export(span)
+                except Exception as e:
+                    print(f"导出 span 失败: {e}")
+
+    def traced(self, name: Optional[str] = None) -> Callable:
+        """
+        为函数创建 span 的装饰器，默认以 类名.方法名 命名，支持同步和异步函数
+        """
+        def decorator(func):
+            span_name = name or func.__qualname__
+
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(span_name):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return func(*args, **kwargs)
+            return wrapper
+
+        return decorator
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def set_span_attributes(**attributes):
+    """
+    为当前 span 添加属性（不在 span 内时忽略）
+    """
+    span = _current_span.get()
+    if span is not None:
+        span.set_attributes(**attributes)
+
+
+def set_span_error(message: str):
+    """
+    将当前 span 标记为失败（用于捕获异常后不再抛出的场景）
+    """
+    span = _current_span.get()
+    if span is not None:
+        span.set_error(message)
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str]]:
+    """
+    解析 W3C traceparent 请求头（00-<trace_id>-<span_id>-<flags>），无效时返回 None
+    """
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    trace_id, span_id = parts[1].lower(), parts[2].lower()
+    try:
+        int(trace_id, 16)
+        int(span_id, 16)
+    except ValueError:
+        return None
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return trace_id, span_id
+
+
+def _encode_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    encoded = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            encoded_value = {"boolValue": value}
+        elif isinstance(value, int):
+            encoded_value = {"intValue": str(value)}
+        elif isinstance(value, float):
+            encoded_value = {"doubleValue": value}
+        else:
+            encoded_value = {"stringValue": str(value)}
+        encoded.append({"key": key, "value": encoded_value})
+    return encoded
+
+
+def _create_exporter() -> Optional[SpanExporter]:
+    if settings.TRACE_EXPORTER == "console":
+        return SpanExporter()
+    if settings.TRACE_EXPORTER == "file":
+        return SpanExporter(path=settings.TRACE_FILE)
+    return None
+
+
+tracer = Tracer(_create_exporter())
+traced = tracer.traced
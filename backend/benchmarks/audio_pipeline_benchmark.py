@@ -0,0 +1,372 @@
+"""
+音频处理流水线基准测试
+
+使用 FFmpeg 的 lavfi 信号源（sine/anoisesrc）在临时目录中生成合成音频，依次测量：
+- waveform: 波形提取（FFmpeg 解码）与预计算峰值读取
+- probe: 逐个 ffprobe 与 DurationProber 并发探测（冷/热缓存）
+- ingest: 上传写入 + 后台分析流水线（probe/工作副本/响度/峰值/代理）
+- mix: 10/100/1,000/5,000 个片段的完整导出混音
+- preview: 大项目中短窗口预览的生成延迟（wav/opus）
+- project_store: 大项目的保存、冷/热加载和项目列表
+输出 JSON，便于不同版本之间对比发现性能回退。所有文件都在临时目录中生成，不影响工作目录。
+
+用法（在 backend 目录下）:
+    python -m benchmarks.audio_pipeline_benchmark --clips 10,100,1000,5000 --output bench.json
+    python -m benchmarks.audio_pipeline_benchmark --stages waveform,probe --repeat 5
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+from fastapi import UploadFile
+
+from app.database import (
+    AsyncSessionLocal, Base, SessionLocal, _async_database_url,
+    create_async_database_engine, create_database_engine
+)
+from app.schemas.multitrack_project import AudioClip, MultitrackProject, ProjectInfo, Track
+from app.services.audio import duration_prober
+from app.services.audio.duration_prober import DurationProber
+from app.services.audio.ffmpeg_service import FFmpegService
+from app.services.audio.ingest_pipeline import IngestPipeline
+from app.services.audio.peaks import load_peaks, save_peaks
+from app.services.audio.source_resolver import ClipSourceResolver
+from app.services.audio.upload_service import AudioUploadService
+from app.services.multitrack_service import MultitrackService, _project_cache
+
+STAGES = ("waveform", "probe", "ingest", "mix", "preview", "project_store")
+
+# 合成素材：对话（TTS 常见的 22.05kHz 单声道）、音效、环境音和音乐（48kHz 立体声）
+SOURCE_SPECS = [
+    ("dialogue", "sine=frequency={freq}:duration={duration}", 22050, 1),
+    ("effect", "anoisesrc=color=pink:duration={duration}:amplitude=0.3", 44100, 2),
+    ("music", "sine=frequency={freq}:duration={duration}", 48000, 2),
+]
+
+
+def _timings(samples):
+    return {
+        "runs": len(samples),
+        "min_seconds": round(min(samples), 4),
+        "median_seconds": round(statistics.median(samples), 4),
+        "max_seconds": round(max(samples), 4),
+    }
+
+
+async def _measure(repeat, func, before=None):
+    """
+    重复执行 func 并返回耗时统计；before 在每次计时前执行（不计入耗时）
+    """
+    samples = []
+    for _ in range(repeat):
+        if before:
+            before()
+        started = time.perf_counter()
+        await func()
+        samples.append(time.perf_counter() - started)
+    return _timings(samples)
+
+
+class PipelineBenchmark:
+    def __init__(self, ffmpeg_service: FFmpegService, repeat: int, source_count: int):
+        self.ffmpeg_service = ffmpeg_service
+        self.repeat = repeat
+        self.source_count = source_count
+        self.sources = []
+
+    def generate_source(self, path: str, index: int, duration: float):
+        kind, source, sample_rate, channels = SOURCE_SPECS[index % len(SOURCE_SPECS)]
+        expression = source.format(freq=220 + 40 * index, duration=duration)
+        subprocess.run(
+            [self.ffmpeg_service.ffmpeg_path, '-v', 'error', '-f', 'lavfi', '-i', expression,
+             '-ar', str(sample_rate), '-ac', str(channels), '-y', path],
+            check=True
+        )
+
+    def generate_sources(self):
+        """
+        上传目录中生成共享素材，片段通过文件ID引用
+        """
+        os.makedirs("uploads/audio", exist_ok=True)
+        for index in range(self.source_count):
+            file_id = f"bench_{index}"
+            self.generate_source(os.path.join("uploads/audio", f"{file_id}.wav"), index, 2.0 + index % 4)
+            self.sources.append(file_id)
+
+    async def bench_waveform(self):
+        long_path = "bench_long.wav"
+        self.generate_source(long_path, 2, 300.0)
+        width = 2000
+
+        extract = await _measure(
+            self.repeat, lambda: self.ffmpeg_service.extract_waveform_data(long_path, width=width)
+        )
+        peaks_path = await save_peaks(
+            "peaks/bench_long.json", await self.ffmpeg_service.extract_waveform_data(long_path, width=width)
+        )
+        cached = await _measure(self.repeat, lambda: load_peaks(peaks_path, 800, width))
+        return {"source_seconds": 300.0, "width": width, "extract": extract, "cached_peaks": cached}
+
+    async def bench_probe(self):
+        paths = [os.path.join("uploads/audio", f"{file_id}.wav") for file_id in self.sources]
+
+        async def sequential():
+            for path in paths:
+                await self.ffmpeg_service.get_audio_info(path)
+
+        prober = DurationProber(ClipSourceResolver(), self.ffmpeg_service)
+        return {
+            "files": len(paths),
+            "sequential_ffprobe": await _measure(self.repeat, sequential),
+            "concurrent_cold": await _measure(
+                self.repeat, lambda: prober.probe_many(paths), before=duration_prober._duration_cache.clear
+            ),
+            "concurrent_cached": await _measure(self.repeat, lambda: prober.probe_many(paths)),
+        }
+
+    async def bench_ingest(self, files: int = 20):
+        upload_service = AudioUploadService()
+        upload_service.ffmpeg_service = self.ffmpeg_service
+        pipeline = IngestPipeline(self.ffmpeg_service)
+
+        payloads = []
+        for index in range(files):
+            path = f"ingest_{index}.wav"
+            self.generate_source(path, index, 5.0)
+            with open(path, "rb") as f:
+                payloads.append(f.read())
+
+        upload_samples, analysis_samples = [], []
+        uploaded = []
+        for index, payload in enumerate(payloads):
+            started = time.perf_counter()
+            record = await upload_service.upload_audio_file(
+                UploadFile(io.BytesIO(payload), filename=f"ingest_{index}.wav"), "dialogue", "bench"
+            )
+            upload_samples.append(time.perf_counter() - started)
+            uploaded.append(record)
+
+        # 后台分析按流水线自身的并发上限同时进行
+        started = time.perf_counter()
+        await asyncio.gather(*(pipeline.run(record["file_id"], record["file_path"]) for record in uploaded))
+        batch_seconds = time.perf_counter() - started
+        records = await asyncio.gather(
+            *(upload_service.get_file_record(record["file_id"], ["status", "error_message"]) for record in uploaded)
+        )
+        failed = [record for record in records if record and record["status"] != "ready"]
+
+        for record in uploaded[:self.repeat]:
+            started = time.perf_counter()
+            await pipeline.run(record["file_id"], record["file_path"])
+            analysis_samples.append(time.perf_counter() - started)
+
+        result = {
+            "files": files,
+            "file_seconds": 5.0,
+            "upload_response": _timings(upload_samples),
+            "analysis_per_file": _timings(analysis_samples),
+            "analysis_batch_seconds": round(batch_seconds, 4),
+            "analysis_failed": len(failed),
+        }
+        if failed:
+            result["error"] = (failed[0]["error_message"] or "")[:500]
+        return result
+
+    def build_project(self, clip_count: int) -> MultitrackProject:
+        """
+        对话轨按顺序排布，音效轨与对话重叠，另有一条循环环境音
+        """
+        dialogue, effects = [], []
+        for index in range(clip_count):
+            clip = AudioClip(
+                id=f"clip_{index}",
+                name=f"clip {index}",
+                filePath=self.sources[index % len(self.sources)],
+                startTime=index * 0.5,
+                duration=1.0,
+                fadeIn=0.05,
+                fadeOut=0.05
+            )
+            (effects if index % 5 == 4 else dialogue).append(clip)
+
+        total_duration = clip_count * 0.5 + 1.0
+        bed = AudioClip(id="bed", name="bed", filePath=self.sources[1], startTime=0.0,
+                        duration=total_duration, volume=0.3, loop=True)
+        return MultitrackProject(
+            project=ProjectInfo(id=f"bench_{clip_count}_{uuid.uuid4().hex[:8]}", title=f"bench {clip_count}",
+                                totalDuration=total_duration),
+            tracks=[
+                Track(id="dialogue", name="对话", type="dialogue", color="#3498db", order=1, clips=dialogue),
+                Track(id="effects", name="音效", type="environment", color="#27ae60", order=2, clips=effects),
+                Track(id="bed", name="环境音", type="environment", color="#2ecc71", order=3, clips=[bed]),
+            ]
+        )
+
+    async def bench_mix(self, service: MultitrackService, clip_counts):
+        results = []
+        for clip_count in clip_counts:
+            project = await service.create_project(self.build_project(clip_count))
+            project_id = project.project.id
+            samples, error = [], None
+            for _ in range(self.repeat):
+                export_task_id = str(uuid.uuid4())
+                started = time.perf_counter()
+                await service.export_project_audio(project_id, export_task_id)
+                elapsed = time.perf_counter() - started
+                status = await service.get_export_status(export_task_id)
+                if status.get("status") != "completed":
+                    error = status.get("message")
+                    break
+                samples.append(elapsed)
+            result = {"clips": clip_count, "project_seconds": project.project.totalDuration}
+            if samples:
+                result.update(_timings(samples))
+            if error:
+                result["error"] = error[:500]
+            results.append(result)
+        return results
+
+    async def bench_preview(self, service: MultitrackService, clip_count: int):
+        project = await service.create_project(self.build_project(clip_count))
+        project_id = project.project.id
+        middle = project.project.totalDuration / 2
+        results = {"clips": clip_count, "window_seconds": 10.0}
+        for format in ("wav", "opus"):
+            results[format] = await _measure(
+                self.repeat,
+                lambda: service.generate_preview_audio(project_id, middle, 10.0, format=format)
+            )
+        return results
+
+    async def bench_project_store(self, service: MultitrackService, clip_count: int, projects: int = 50):
+        project = self.build_project(clip_count)
+        project_id = (await service.create_project(project)).project.id
+
+        for index in range(projects):
+            await service.create_project(self.build_project(10))
+
+        return {
+            "clips": clip_count,
+            "projects": projects + 1,
+            "save": await _measure(self.repeat, lambda: service.save_project(project_id, project)),
+            "load_cold": await _measure(
+                self.repeat, lambda: service.load_project(project_id),
+                before=lambda: _project_cache.invalidate(project_id)
+            ),
+            "load_cached": await _measure(self.repeat, lambda: service.load_project(project_id)),
+            "list": await _measure(self.repeat, service.list_projects),
+        }
+
+
+def _ffmpeg_version(ffmpeg_path: str) -> str:
+    try:
+        result = subprocess.run([ffmpeg_path, '-version'], capture_output=True, text=True)
+        return result.stdout.splitlines()[0] if result.stdout else ""
+    except Exception:
+        return ""
+
+
+async def run(args) -> dict:
+    ffmpeg_service = FFmpegService()
+    stages = [stage for stage in args.stages.split(",") if stage]
+    clip_counts = [int(count) for count in args.clips.split(",") if count]
+
+    # 应用的引擎在导入时已解析为工作目录下的数据库，这里把会话工厂改绑到临时目录中的数据库
+    database_url = f"sqlite:///{os.path.abspath('bench.db')}"
+    engine = create_database_engine(database_url)
+    async_engine = create_async_database_engine(_async_database_url(database_url))
+    Base.metadata.create_all(bind=engine)
+    SessionLocal.configure(bind=engine)
+    AsyncSessionLocal.configure(bind=async_engine)
+
+    benchmark = PipelineBenchmark(ffmpeg_service, args.repeat, args.sources)
+    benchmark.generate_sources()
+    service = MultitrackService()
+
+    results = {}
+    try:
+        for stage in stages:
+            if stage not in STAGES:
+                raise ValueError(f"未知的测试阶段: {stage}. 支持的阶段: {', '.join(STAGES)}")
+            print(f"运行 {stage} ...", file=sys.stderr)
+            try:
+                if stage == "waveform":
+                    results[stage] = await benchmark.bench_waveform()
+                elif stage == "probe":
+                    results[stage] = await benchmark.bench_probe()
+                elif stage == "ingest":
+                    results[stage] = await benchmark.bench_ingest()
+                elif stage == "mix":
+                    results[stage] = await benchmark.bench_mix(service, clip_counts)
+                elif stage == "preview":
+                    results[stage] = await benchmark.bench_preview(service, args.preview_clips)
+                elif stage == "project_store":
+                    results[stage] = await benchmark.bench_project_store(service, max(clip_counts))
+            except Exception as e:
+                # 单个阶段失败（如缺少 ffprobe）不影响其余阶段，错误写入结果
+                print(f"{stage} 失败: {e}", file=sys.stderr)
+                results[stage] = {"error": str(e)[:500]}
+    finally:
+        await async_engine.dispose()
+        engine.dispose()
+
+    return {
+        "benchmark": "audio_pipeline",
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "ffmpeg": _ffmpeg_version(ffmpeg_service.ffmpeg_path),
+            "cpu_count": os.cpu_count(),
+        },
+        "parameters": {
+            "repeat": args.repeat,
+            "sources": args.sources,
+            "clips": clip_counts,
+            "preview_clips": args.preview_clips,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="音频处理流水线基准测试")
+    parser.add_argument("--stages", default=",".join(STAGES), help="逗号分隔的测试阶段")
+    parser.add_argument("--clips", default="10,100,1000,5000", help="混音测试的片段数量（逗号分隔）")
+    parser.add_argument("--preview-clips", type=int, default=1000, help="预览测试项目的片段数量")
+    parser.add_argument("--sources", type=int, default=24, help="生成的合成素材数量")
+    parser.add_argument("--repeat", type=int, default=3, help="每项测试重复次数")
+    parser.add_argument("--output", help="结果写入该 JSON 文件（默认输出到标准输出）")
+    args = parser.parse_args()
+
+    output_path = os.path.abspath(args.output) if args.output else None
+    with tempfile.TemporaryDirectory() as work_dir:
+        # 服务使用相对路径（uploads/、projects/、sound_edit.db），在临时目录中运行
+        cwd = os.getcwd()
+        os.chdir(work_dir)
+        try:
+            # 服务内部的日志输出到 stderr，stdout 只保留 JSON 结果
+            with contextlib.redirect_stdout(sys.stderr):
+                report = asyncio.run(run(args))
+        finally:
+            os.chdir(cwd)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
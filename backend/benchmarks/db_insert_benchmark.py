@@ -0,0 +1,127 @@
+"""
+SQLite 并发写入基准测试
+
+模拟并发上传：多个线程各自使用独立会话逐条插入 AudioFile 记录并提交，
+同时一个读线程不断执行列表查询。分别在 default 与 performance 配置下运行，
+输出 JSON 格式的吞吐量、提交延迟和锁冲突次数。
+
+用法（在 backend 目录下）:
+    python -m benchmarks.db_insert_benchmark --writers 8 --rows 200
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, create_database_engine
+from app.models import AudioFile, AudioCategory
+
+
+def _percentile(values, percent):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def run_profile(profile: str, writers: int, rows: int) -> dict:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        engine = create_database_engine(f"sqlite:///{os.path.join(temp_dir, 'bench.db')}", profile)
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+
+        latencies = []
+        lock_errors = 0
+        reads = 0
+        lock = threading.Lock()
+        stop_reading = threading.Event()
+
+        def writer():
+            nonlocal lock_errors
+            for _ in range(rows):
+                db = Session()
+                started = time.perf_counter()
+                try:
+                    db.add(AudioFile(
+                        file_id=str(uuid.uuid4()),
+                        original_name="bench.wav",
+                        file_path="uploads/audio/bench.wav",
+                        category=AudioCategory.dialogue,
+                        file_size=1024,
+                        duration=3.0,
+                        sample_rate=44100,
+                        channels=2
+                    ))
+                    db.commit()
+                    with lock:
+                        latencies.append(time.perf_counter() - started)
+                except OperationalError:
+                    db.rollback()
+                    with lock:
+                        lock_errors += 1
+                finally:
+                    db.close()
+
+        def reader():
+            nonlocal reads
+            while not stop_reading.is_set():
+                db = Session()
+                try:
+                    db.query(AudioFile.file_id).order_by(AudioFile.created_at.desc()).limit(100).all()
+                    reads += 1
+                except OperationalError:
+                    pass
+                finally:
+                    db.close()
+
+        threads = [threading.Thread(target=writer) for _ in range(writers)]
+        reader_thread = threading.Thread(target=reader)
+
+        started = time.perf_counter()
+        reader_thread.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        stop_reading.set()
+        reader_thread.join()
+        engine.dispose()
+
+        return {
+            "profile": profile,
+            "writers": writers,
+            "rows_per_writer": rows,
+            "inserted": len(latencies),
+            "lock_errors": lock_errors,
+            "elapsed_seconds": round(elapsed, 4),
+            "inserts_per_second": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            "commit_latency_ms": {
+                "p50": round(_percentile(latencies, 50) * 1000, 3),
+                "p95": round(_percentile(latencies, 95) * 1000, 3),
+                "max": round(max(latencies) * 1000, 3) if latencies else 0.0,
+            },
+            "concurrent_reads": reads,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite 并发写入基准测试")
+    parser.add_argument("--writers", type=int, default=8, help="并发写线程数")
+    parser.add_argument("--rows", type=int, default=200, help="每个线程插入的记录数")
+    parser.add_argument("--profiles", default="default,performance", help="逗号分隔的数据库配置")
+    args = parser.parse_args()
+
+    results = [run_profile(profile, args.writers, args.rows) for profile in args.profiles.split(",")]
+    print(json.dumps({"benchmark": "db_concurrent_insert", "results": results}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,12 @@
 import pytest
+import pytest_asyncio
 import asyncio
+import io
 import json
+import os
+import subprocess
 from datetime import datetime
+from fastapi import UploadFile
 from app.services.multitrack_service import MultitrackService
 from app.services.conversion_service import ConversionService
 from app.schemas.multitrack_project import MultitrackProject, ProjectInfo
@@ -90,6 +95,47 @@ class TestMultitrackProject:
             "loop": True
         }
 
+    @pytest_asyncio.fixture
+    async def workspace(self, tmp_path, monkeypatch):
+        """在临时目录中运行，数据库会话绑定到临时 SQLite 库"""
+        from app.database import (
+            AsyncSessionLocal, Base, SessionLocal, _async_database_url,
+            create_async_database_engine, create_database_engine
+        )
+
+        monkeypatch.chdir(tmp_path)
+        url = f"sqlite:///{tmp_path / 'test.db'}"
+        sync_engine = create_database_engine(url)
+        async_engine = create_async_database_engine(_async_database_url(url))
+        Base.metadata.create_all(bind=sync_engine)
+        sync_bind, async_bind = SessionLocal.kw["bind"], AsyncSessionLocal.kw["bind"]
+        SessionLocal.configure(bind=sync_engine)
+        AsyncSessionLocal.configure(bind=async_engine)
+        try:
+            yield tmp_path
+        finally:
+            SessionLocal.configure(bind=sync_bind)
+            AsyncSessionLocal.configure(bind=async_bind)
+            await async_engine.dispose()
+            sync_engine.dispose()
+
+    async def _upload_tone(self, duration: float = 1.0, name: str = "tone.wav",
+                           sample_rate: int = 44100, channels: int = 1) -> dict:
+        """用 FFmpeg 生成正弦波并通过上传服务写入"""
+        from app.services.audio.upload_service import AudioUploadService
+
+        upload_service = AudioUploadService()
+        subprocess.run(
+            [upload_service.ffmpeg_service.ffmpeg_path, "-v", "error", "-f", "lavfi",
+             "-i", f"sine=frequency=440:duration={duration}",
+             "-ar", str(sample_rate), "-ac", str(channels), "-y", name],
+            check=True
+        )
+        with open(name, "rb") as f:
+            payload = f.read()
+        os.remove(name)
+        return await upload_service.upload_audio_file(UploadFile(io.BytesIO(payload), filename=name))
+
     @pytest.mark.asyncio
     async def test_format_conversion(self, sample_dialogue_data, sample_environment_data, sample_background_music):
         """测试格式转换功能"""
@@ -176,6 +222,131 @@ class TestMultitrackProject:
         deleted_project = await service.load_project(project_id)
         assert deleted_project is None
 
+    @pytest.mark.asyncio
+    async def test_project_patch_operations(self, sample_dialogue_data):
+        """测试项目增量修改与操作日志重放"""
+        from app.services import multitrack_service as multitrack_module
+        from app.schemas.multitrack_project import ProjectPatchOperation, AudioClip
+        from app.services.project_patch_service import RevisionConflictError
+        
+        service = MultitrackService()
+        conversion_service = ConversionService()
+        
+        project = await conversion_service.convert_to_standard_format(
+            dialogue_data=sample_dialogue_data
+        )
+        created_project = await service.create_project(project)
+        project_id = created_project.project.id
+        
+        operations = [
+            ProjectPatchOperation(op="move_clip", trackId="track_dialogue", clipId="dialogue_1", startTime=30.0),
+            ProjectPatchOperation(op="set_volume", trackId="track_dialogue", clipId="dialogue_2", volume=0.5),
+            ProjectPatchOperation(op="set_volume", trackId="track_environment", volume=0.2),
+            ProjectPatchOperation(
+                op="add_clip",
+                trackId="track_environment",
+                clip=AudioClip(id="env_new", name="雨声", filePath="rain", startTime=1.0, duration=5.0)
+            ),
+            ProjectPatchOperation(op="remove_clip", trackId="track_dialogue", clipId="dialogue_3"),
+            ProjectPatchOperation(
+                op="reorder_tracks",
+                trackOrder=["track_background", "track_dialogue", "track_environment"]
+            ),
+        ]
+        loaded = await service.load_project(project_id)
+        patched = await service.patch_project(project_id, operations, base_revision=0)
+        assert patched.project.revision == 1
+        assert patched.project.totalDuration == 33.5
+        # 修改前取得的对象（如正在导出的项目）不受影响
+        assert loaded is not patched
+        assert loaded.project.revision == 0
+        assert loaded.tracks[0].clips[0].startTime != 30.0
+        assert await service.load_project(project_id) is patched
+        
+        # 基于过期修订号的修改会被拒绝
+        with pytest.raises(RevisionConflictError):
+            await service.patch_project(project_id, operations[:1], base_revision=0)
+        
+        # 非法操作不会污染工作副本（前面的操作已生效时也是如此）
+        snapshot = patched.model_dump()
+        with pytest.raises(ValueError):
+            await service.patch_project(project_id, [
+                ProjectPatchOperation(op="set_volume", trackId="track_dialogue", clipId="dialogue_1", volume=0.1),
+                ProjectPatchOperation(op="move_clip", trackId="track_dialogue", clipId="dialogue_2",
+                                      targetTrackId="track_background"),
+                ProjectPatchOperation(op="remove_clip", trackId="track_dialogue", clipId="missing")
+            ])
+        cached = await service.load_project(project_id)
+        assert cached is patched
+        assert cached.model_dump() == snapshot
+        
+        # 只复制被修改的轨道和片段，其余与修改前的对象共享
+        repatched = await service.patch_project(project_id, [
+            ProjectPatchOperation(op="set_volume", trackId="track_dialogue", clipId="dialogue_2", volume=0.8)
+        ])
+        assert repatched.tracks[1] is not patched.tracks[1]
+        assert repatched.tracks[1].clips[0] is patched.tracks[1].clips[0]
+        assert repatched.tracks[1].clips[1].volume == 0.8
+        assert patched.tracks[1].clips[1].volume == 0.5
+        assert repatched.tracks[0] is patched.tracks[0]
+        assert repatched.tracks[2] is patched.tracks[2]
+        
+        # 清空内存工作副本后，从快照和操作日志重建出相同的项目
+        multitrack_module._project_cache.clear()
+        reloaded = await service.load_project(project_id)
+        assert reloaded.project.revision == 2
+        assert [track.id for track in reloaded.tracks] == ["track_background", "track_dialogue", "track_environment"]
+        dialogue_track = reloaded.tracks[1]
+        assert [clip.id for clip in dialogue_track.clips] == ["dialogue_1", "dialogue_2"]
+        assert dialogue_track.clips[0].startTime == 30.0
+        assert dialogue_track.clips[1].volume == 0.8
+        assert reloaded.tracks[2].volume == 0.2
+        assert reloaded.tracks[2].clips[-1].id == "env_new"
+        
+        # 清理
+        await service.delete_project(project_id)
+        assert not os.path.exists(service._oplog_path(project_id))
+
+    @pytest.mark.asyncio
+    async def test_project_cache(self, sample_dialogue_data):
+        """测试已解析项目缓存的命中与失效"""
+        service = MultitrackService()
+        conversion_service = ConversionService()
+        
+        project = await conversion_service.convert_to_standard_format(
+            dialogue_data=sample_dialogue_data
+        )
+        created_project = await service.create_project(project)
+        project_id = created_project.project.id
+        
+        # 未修改文件时重复加载命中缓存
+        first = await service.load_project(project_id)
+        second = await service.load_project(project_id)
+        assert first is second
+        
+        # 文件在进程外被修改后缓存失效
+        project_file = os.path.join(service.projects_dir, f"{project_id}.json")
+        with open(project_file, 'r', encoding='utf-8') as f:
+            project_data = json.load(f)
+        project_data["project"]["title"] = "外部修改的标题"
+        with open(project_file, 'w', encoding='utf-8') as f:
+            json.dump(project_data, f, ensure_ascii=False)
+        
+        reloaded = await service.load_project(project_id)
+        assert reloaded is not first
+        assert reloaded.project.title == "外部修改的标题"
+        
+        # 项目列表直接读取快照，不填充缓存
+        from app.services.multitrack_service import _project_cache
+        _project_cache.clear()
+        projects_list = await service.list_projects()
+        assert any(p.id == project_id and p.title == "外部修改的标题" for p in projects_list)
+        assert len(_project_cache) == 0
+        
+        # 删除后不再返回缓存对象
+        await service.delete_project(project_id)
+        assert await service.load_project(project_id) is None
+
     @pytest.mark.asyncio
     async def test_project_validation(self, sample_dialogue_data):
         """测试项目数据验证"""
@@ -199,6 +370,289 @@ class TestMultitrackProject:
         # 清理
         await service.delete_project(project_id)
 
+    @pytest.mark.asyncio
+    async def test_missing_upload_validation_and_export(self, workspace):
+        """测试已删除的上传文件：验证报错，导出跳过该片段"""
+        from app.schemas.multitrack_project import AudioClip, Track
+
+        kept = await self._upload_tone(name="kept.wav")
+        deleted = await self._upload_tone(name="deleted.wav")
+        # 数据库记录仍在，文件已从磁盘删除
+        os.remove(deleted["file_path"])
+
+        service = MultitrackService()
+        project = MultitrackProject(
+            project=ProjectInfo(id="", title="缺失文件", totalDuration=2.0),
+            tracks=[Track(id="track1", name="对话", type="dialogue", color="#FF6B6B", order=0, clips=[
+                AudioClip(id="kept", name="保留", filePath=kept["file_id"], startTime=0.0, duration=1.0),
+                AudioClip(id="deleted", name="删除", filePath=deleted["file_id"], startTime=1.0, duration=1.0),
+            ])]
+        )
+        project_id = (await service.create_project(project)).project.id
+
+        result = await service.validate_project(project_id)
+        assert not result["valid"]
+        assert f"音频文件不存在: {deleted['file_id']}" in result["errors"]
+        assert result["stats"]["missingFileCount"] == 1
+
+        await service.export_project_audio(project_id, "missing_clip_export")
+        status = await service.get_export_status("missing_clip_export")
+        assert status["status"] == "completed", status
+        assert os.path.getsize(await service.get_exported_file_path("missing_clip_export")) > 0
+
+    @pytest.mark.asyncio
+    async def test_sqlite_performance_profile(self, tmp_path, monkeypatch):
+        """测试 SQLite 性能配置在同步和异步连接上生效"""
+        from sqlalchemy import text
+        from app.config.settings import settings
+        from app.database import (
+            _async_database_url, create_async_database_engine, create_database_engine, sqlite_pragmas
+        )
+
+        url = f"sqlite:///{tmp_path / 'profile.db'}"
+        monkeypatch.setattr(settings, "SQLITE_JOURNAL_MODE", "WAL")
+        monkeypatch.setattr(settings, "SQLITE_SYNCHRONOUS", "NORMAL")
+        monkeypatch.setattr(settings, "SQLITE_BUSY_TIMEOUT_MS", 10000)
+        sync_engine = create_database_engine(url, profile="performance")
+        async_engine = create_async_database_engine(_async_database_url(url), profile="performance")
+        try:
+            with sync_engine.connect() as conn:
+                assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+                # NORMAL = 1
+                assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+            async with async_engine.connect() as conn:
+                assert (await conn.execute(text("PRAGMA busy_timeout"))).scalar() == 10000
+                assert (await conn.execute(text("PRAGMA temp_store"))).scalar() == 2
+        finally:
+            await async_engine.dispose()
+            sync_engine.dispose()
+
+        default_engine = create_database_engine(f"sqlite:///{tmp_path / 'default.db'}", profile="default")
+        with default_engine.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == "delete"
+        default_engine.dispose()
+        with pytest.raises(ValueError):
+            sqlite_pragmas("turbo")
+
+    @pytest.mark.asyncio
+    async def test_async_upload_list_delete(self, workspace):
+        """测试并发上传、列表和删除共用异步会话连接池"""
+        from app.services.audio.upload_service import AudioUploadService
+
+        upload_service = AudioUploadService()
+        uploads = await asyncio.gather(*(
+            upload_service.upload_audio_file(UploadFile(io.BytesIO(b"RIFF" + bytes(i)), filename=f"{i}.wav"))
+            for i in range(12)
+        ))
+        assert all(upload["upload_success"] for upload in uploads)
+        assert len({upload["file_id"] for upload in uploads}) == 12
+
+        page = await upload_service.list_uploaded_files(limit=100)
+        assert {item["file_id"] for item in page["items"]} == {upload["file_id"] for upload in uploads}
+        assert all(item["status"] == "analyzing" for item in page["items"])
+
+        deleted = uploads[0]
+        assert await upload_service.delete_file(deleted["file_id"])
+        assert not await upload_service.delete_file(deleted["file_id"])
+        assert not os.path.exists(deleted["file_path"])
+        assert await upload_service.get_file_record(deleted["file_id"], ["file_id"]) is None
+        assert len((await upload_service.list_uploaded_files())["items"]) == 11
+
+    @pytest.mark.asyncio
+    async def test_audio_file_cursor_pagination(self, workspace):
+        """测试文件列表的游标分页：排序、同一时间的记录、字段投影和无效游标"""
+        import httpx
+        from app.database import AsyncSessionLocal
+        from app.main import app
+        from app.models import AudioFile
+
+        created = [datetime(2024, 1, 1, 12, 0, 0), datetime(2024, 1, 1, 12, 0, 0),
+                   datetime(2024, 1, 2), datetime(2024, 1, 3), datetime(2024, 1, 1, 12, 0, 0)]
+        async with AsyncSessionLocal() as db:
+            for i, created_at in enumerate(created):
+                db.add(AudioFile(file_id=f"file_{i}", original_name=f"{i}.wav", file_path=f"uploads/audio/file_{i}.wav",
+                                 file_size=100, created_at=created_at))
+            await db.commit()
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            pages, cursor = [], None
+            while True:
+                params = {"limit": 2, "fields": "original_name"}
+                if cursor:
+                    params["cursor"] = cursor
+                page = (await client.get("/api/v1/audio-files/list", params=params)).json()
+                pages.append(page)
+                if not page["has_more"]:
+                    assert page["next_cursor"] is None
+                    break
+                cursor = page["next_cursor"]
+                assert cursor == page["data"][-1]["file_id"]
+
+            # 按创建时间倒序，同一时间按 file_id 倒序，记录不重复不遗漏
+            assert [len(page["data"]) for page in pages] == [2, 2, 1]
+            assert [item["file_id"] for page in pages for item in page["data"]] == [
+                "file_3", "file_2", "file_4", "file_1", "file_0"
+            ]
+            assert set(pages[0]["data"][0]) == {"file_id", "original_name", "filename"}
+
+            # 游标记录已删除时返回 400，而不是空页
+            response = await client.get("/api/v1/audio-files/list", params={"cursor": "deleted"})
+            assert response.status_code == 400
+            response = await client.get("/api/v1/audio-files/list", params={"fields": "secret"})
+            assert response.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_proxy_generation_and_use(self, workspace):
+        """测试代理文件：生成低采样率单声道副本，预览使用代理、导出使用原始文件，删除时一并清理"""
+        import wave
+        from sqlalchemy import update
+        from app.database import AsyncSessionLocal
+        from app.models import AudioFile
+        from app.services.audio.proxy_service import ProxyService
+        from app.services.audio.source_resolver import ClipSourceResolver
+        from app.services.audio.upload_service import AudioUploadService
+
+        record = await self._upload_tone(sample_rate=48000, channels=2)
+        proxy_service = ProxyService()
+        assert proxy_service.needs_proxy(48000, 2, "wav")
+        assert not proxy_service.needs_proxy(proxy_service.sample_rate, 1, "wav")
+
+        proxy_path = await proxy_service.create_proxy(record["file_id"], record["file_path"])
+        with wave.open(proxy_path) as proxy:
+            assert proxy.getframerate() == proxy_service.sample_rate
+            assert proxy.getnchannels() == proxy_service.channels
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(AudioFile).where(AudioFile.file_id == record["file_id"]).values(proxy_path=proxy_path)
+            )
+            await db.commit()
+
+        source = ClipSourceResolver().resolve(record["file_id"])
+        assert source.render_path(use_proxy=True) == proxy_path
+        assert source.render_path() == record["file_path"]
+        upload_service = AudioUploadService()
+        assert await upload_service.get_file_path(record["file_id"], prefer_proxy=True) == proxy_path
+
+        assert await upload_service.delete_file(record["file_id"])
+        assert not os.path.exists(proxy_path)
+
+    @pytest.mark.asyncio
+    async def test_ingest_status_transitions(self, workspace):
+        """测试上传后后台分析的状态变化：analyzing -> ready / failed"""
+        import httpx
+        import wave
+        from app.main import app
+        from app.services.audio.ffmpeg_service import FFmpegService
+        from app.services.audio.ingest_pipeline import IngestPipeline
+        from app.services.audio.upload_service import AudioUploadService
+
+        class WaveProbeFFmpeg(FFmpegService):
+            """probe 阶段直接读取 WAV 文件头，其余阶段使用 FFmpeg"""
+
+            async def get_audio_info(self, file_path):
+                try:
+                    with wave.open(file_path) as f:
+                        frames, sample_rate, channels = f.getnframes(), f.getframerate(), f.getnchannels()
+                except (wave.Error, EOFError) as e:
+                    raise RuntimeError(f"获取音频信息失败: {e}")
+                return {"duration": frames / sample_rate, "bitrate": 0, "size": os.path.getsize(file_path),
+                        "format": "wav", "sample_rate": sample_rate, "channels": channels,
+                        "codec": "pcm_s16le", "file_path": file_path}
+
+        valid = await self._upload_tone(duration=2.0)
+        invalid = await AudioUploadService().upload_audio_file(
+            UploadFile(io.BytesIO(b"not audio"), filename="broken.wav")
+        )
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            async def status(file_id):
+                return (await client.get(f"/api/v1/audio-files/status/{file_id}")).json()["data"]
+
+            assert (await status(valid["file_id"]))["status"] == "analyzing"
+            assert (await status(invalid["file_id"]))["status"] == "analyzing"
+
+            pipeline = IngestPipeline(WaveProbeFFmpeg())
+            await asyncio.gather(
+                pipeline.run(valid["file_id"], valid["file_path"]),
+                pipeline.run(invalid["file_id"], invalid["file_path"])
+            )
+
+            ready = await status(valid["file_id"])
+            assert ready["status"] == "ready"
+            assert ready["duration"] == pytest.approx(2.0)
+            assert os.path.exists(pipeline.peaks_path_for(valid["file_id"]))
+            failed = await status(invalid["file_id"])
+            assert failed["status"] == "failed"
+            assert failed["error_message"]
+
+    @pytest.mark.asyncio
+    async def test_trim_cache(self, workspace):
+        """测试裁剪结果按参数缓存，裁剪文件被删除后重新生成"""
+        import wave
+        from app.services.audio.trim_service import TrimService
+
+        record = await self._upload_tone(duration=3.0)
+        trim_service = TrimService()
+
+        first = await trim_service.trim(record["file_id"], 0.5, 1.0)
+        assert first["cached"] is False
+        with wave.open(first["file_path"]) as f:
+            assert f.getnframes() / f.getframerate() == pytest.approx(1.0, abs=0.01)
+
+        second = await trim_service.trim(record["file_id"], 0.5, 1.0)
+        assert second["cached"] is True
+        assert second["file_id"] == first["file_id"]
+
+        # 不同模式是不同的裁剪结果
+        copied = await trim_service.trim(record["file_id"], 0.5, 1.0, mode="copy")
+        assert copied["file_id"] != first["file_id"]
+
+        # 记录仍在但文件已删除：清除失效记录并重新生成
+        os.remove(first["file_path"])
+        regenerated = await trim_service.trim(record["file_id"], 0.5, 1.0)
+        assert regenerated["cached"] is False
+        assert regenerated["file_id"] == first["file_id"]
+        assert os.path.exists(regenerated["file_path"])
+
+        assert await trim_service.trim("missing", 0.0, 1.0) is None
+        with pytest.raises(ValueError):
+            await trim_service.trim(record["file_id"], 0.0, 1.0, mode="fast")
+
+    @pytest.mark.asyncio
+    async def test_generate_endpoint(self, workspace):
+        """测试服务端一步生成：只保存项目、保存并导出、无效参数"""
+        import httpx
+        from app.main import app
+
+        record = await self._upload_tone(duration=1.0)
+        payload = {"dialogueData": {"title": "一步生成", "dialogues": [
+            {"character": "张三", "text": "第一句", "file_path": record["file_id"], "duration": 1.0},
+            {"character": "李四", "text": "第二句", "file_path": record["file_id"], "duration": 1.0},
+        ]}}
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/api/v1/multitrack/generate", json=payload)
+            assert response.status_code == 200
+            result = response.json()
+            assert result["export_task_id"] is None
+            project = await MultitrackService().load_project(result["project_id"])
+            assert project.project.title == "一步生成"
+            assert [clip.startTime for clip in project.tracks[0].clips] == [0.0, 1.5]
+
+            # 导出在响应之后的后台任务中完成
+            response = await client.post("/api/v1/multitrack/generate", params={"export": "true"}, json=payload)
+            assert response.status_code == 200
+            export_task_id = response.json()["export_task_id"]
+            status = (await client.get(f"/api/v1/multitrack/export/status/{export_task_id}")).json()
+            assert status["status"] == "completed", status
+
+            response = await client.post(
+                "/api/v1/multitrack/generate", params={"export": "true", "render_quality": "ultra"}, json=payload
+            )
+            assert response.status_code == 400
+            response = await client.post("/api/v1/multitrack/generate", json={"projectInfo": {}})
+            assert response.status_code == 422
+
     @pytest.mark.asyncio
     async def test_export_workflow(self, sample_dialogue_data):
         """测试导出工作流程"""
@@ -276,5 +730,425 @@ class TestMultitrackProject:
         total_duration = conversion_service._calculate_total_duration(tracks)
         assert total_duration == 10.0  # max(5.0, 9.0, 10.0) = 10.0
 
+    def test_compiled_timeline(self):
+        """测试编译时间线的片段选择"""
+        from app.schemas.multitrack_project import Track, AudioClip
+        from app.services.timeline import CompiledTimeline
+        
+        project = MultitrackProject(
+            project=ProjectInfo(id="timeline_test", title="时间线测试", totalDuration=20.0),
+            tracks=[
+                Track(
+                    id="track1", name="轨道1", type="dialogue", color="#000000", order=1, volume=0.5,
+                    clips=[
+                        AudioClip(id="clip2", name="clip2", filePath="b", startTime=6.0, duration=3.0),
+                        AudioClip(id="clip1", name="clip1", filePath="a", startTime=0.0, duration=5.0, volume=0.8),
+                    ]
+                ),
+                Track(
+                    id="track2", name="轨道2", type="environment", color="#000000", order=2,
+                    clips=[AudioClip(id="clip3", name="clip3", filePath="a", startTime=2.0, duration=15.0)]
+                ),
+                Track(
+                    id="track3", name="轨道3", type="background", color="#000000", order=3, muted=True,
+                    clips=[AudioClip(id="clip4", name="clip4", filePath="c", startTime=4.0, duration=1.0)]
+                )
+            ]
+        )
+        
+        timeline = CompiledTimeline(project)
+        
+        # 片段按开始时间排序，同一源文件只出现一次
+        assert timeline.clip_ids == ["clip1", "clip3", "clip4", "clip2"]
+        assert timeline.files == ["a", "c", "b"]
+        assert timeline.gain[0] == 0.4
+        
+        # 静音轨道被排除，长片段即使开始较早也会被选中
+        selected = [timeline.clip_ids[i] for i in timeline.select(10.0, 12.0)]
+        assert selected == ["clip3"]
+        selected = [timeline.clip_ids[i] for i in timeline.select(4.5, 6.5)]
+        assert selected == ["clip1", "clip3", "clip2"]
+        
+        tracks = timeline.mix_inputs(timeline.select(4.5, 6.5), ["/a.wav", None, None], offset=4.5)
+        assert [t["start_time"] for t in tracks] == [0.0, 0.0]
+        # 窗口开始前已在播放的片段从源文件中对应位置开始
+        assert [t["source_start"] for t in tracks] == [4.5, 2.5]
+        assert [t["duration"] for t in tracks] == [0.5, 12.5]
+
+    def test_clip_source_range(self):
+        """测试片段入点/出点（非破坏性裁剪）"""
+        from app.schemas.multitrack_project import Track, AudioClip, ProjectPatchOperation
+        from app.services.timeline import CompiledTimeline
+        from app.services.project_patch_service import ProjectPatchService
+        
+        project = MultitrackProject(
+            project=ProjectInfo(id="source_range_test", title="裁剪测试", totalDuration=10.0),
+            tracks=[Track(
+                id="track1", name="轨道1", type="dialogue", color="#000000", order=1,
+                clips=[AudioClip(id="clip1", name="clip1", filePath="a", startTime=1.0, duration=8.0)]
+            )]
+        )
+        
+        ProjectPatchService().apply_operations(project, [
+            ProjectPatchOperation(op="trim_clip", trackId="track1", clipId="clip1", sourceStart=2.0, sourceEnd=5.0, startTime=3.0)
+        ])
+        clip = project.tracks[0].clips[0]
+        assert (clip.sourceStart, clip.sourceEnd, clip.startTime) == (2.0, 5.0, 3.0)
+        
+        # 出点限制实际播放时长
+        timeline = CompiledTimeline(project)
+        tracks = timeline.mix_inputs(timeline.audible(), ["/a.wav"])
+        assert tracks[0]["source_start"] == 2.0
+        assert tracks[0]["duration"] == 3.0
+        
+        with pytest.raises(ValueError):
+            ProjectPatchService().apply_operations(project, [
+                ProjectPatchOperation(op="trim_clip", trackId="track1", clipId="clip1", sourceEnd=1.0)
+            ])
+
+    def test_loop_clip_inputs(self):
+        """测试循环片段生成单个循环输入"""
+        from app.schemas.multitrack_project import Track, AudioClip
+        from app.services.timeline import CompiledTimeline
+
+        project = MultitrackProject(
+            project=ProjectInfo(id="loop_test", title="循环测试", totalDuration=60.0),
+            tracks=[Track(
+                id="track1", name="环境音", type="environment", color="#000000", order=1,
+                clips=[AudioClip(id="bed", name="bed", filePath="a", startTime=0.0, duration=60.0, loop=True)]
+            )]
+        )
+        timeline = CompiledTimeline(project)
+
+        # 源文件时长未知时按普通片段处理
+        assert "loop" not in timeline.mix_inputs(timeline.audible(), ["/a.wav"])[0]
+
+        tracks = timeline.mix_inputs(timeline.audible(), ["/a.wav"], offset=25.0, file_durations=[10.0])
+        assert len(tracks) == 1
+        assert tracks[0]["loop"] and tracks[0]["loop_length"] == 10.0
+        # 窗口从循环序列中间开始，而不是移动源文件入点
+        assert tracks[0]["loop_offset"] == 25.0
+        assert tracks[0]["source_start"] == 0.0
+        assert tracks[0]["duration"] == 35.0
+
+    def test_playback_rate_inputs(self):
+        """测试变速片段的源文件区间换算"""
+        from app.schemas.multitrack_project import Track, AudioClip
+        from app.services.timeline import CompiledTimeline
+        from app.services.audio.ffmpeg_service import FFmpegService
+
+        project = MultitrackProject(
+            project=ProjectInfo(id="rate_test", title="变速测试", totalDuration=10.0),
+            tracks=[Track(
+                id="track1", name="对话", type="dialogue", color="#000000", order=1,
+                clips=[AudioClip(id="line", name="line", filePath="a", startTime=2.0, duration=8.0,
+                                 sourceStart=1.0, sourceEnd=7.0, playbackRate=1.5)]
+            )]
+        )
+        timeline = CompiledTimeline(project)
+        # 1.5 倍速播放 6 秒源文件只占用 4 秒时间线
+        assert timeline.duration[0] == 4.0
+
+        tracks = timeline.mix_inputs(timeline.audible(), ["/a.wav"], offset=4.0)
+        assert tracks[0]["playback_rate"] == 1.5
+        assert tracks[0]["source_start"] == 4.0
+        assert tracks[0]["duration"] == 2.0
+
+        assert FFmpegService._atempo_factors(0.3) == [0.5, 0.6]
+        assert FFmpegService._atempo_factors(5.0) == [2.0, 2.0, 1.25]
+
+    def test_validator_interval_analysis(self):
+        """测试按轨道的片段重叠与空隙分析"""
+        from app.schemas.multitrack_project import Track, AudioClip
+        from app.services.timeline import CompiledTimeline
+        from app.services.project_validator import ProjectValidator
+        
+        clips = [
+            AudioClip(id="a", name="a", filePath="f", startTime=0.0, duration=4.0),
+            AudioClip(id="b", name="b", filePath="f", startTime=3.0, duration=2.0),
+            AudioClip(id="c", name="c", filePath="f", startTime=20.0, duration=1.0),
+        ]
+        project = MultitrackProject(
+            project=ProjectInfo(id="validator_test", title="验证测试", totalDuration=21.0),
+            tracks=[
+                Track(id="track1", name="轨道1", type="dialogue", color="#000000", order=1, clips=clips),
+                Track(
+                    id="track2", name="轨道2", type="environment", color="#000000", order=2,
+                    clips=[AudioClip(id="d", name="d", filePath="g", startTime=1.0, duration=30.0)]
+                )
+            ]
+        )
+        
+        validator = ProjectValidator()
+        overlaps, gaps = validator._analyze_intervals(CompiledTimeline(project))
+        
+        # 不同轨道之间的重叠不计入
+        assert [(o["clipId"], o["previousClipId"], o["overlap"]) for o in overlaps] == [("b", "a", 1.0)]
+        assert [(g["trackId"], g["start"], g["end"]) for g in gaps] == [("track1", 5.0, 20.0)]
+
+    def test_range_header_parsing(self):
+        """测试下载接口的 Range 请求头解析"""
+        from app.api.ranged_response import RangedFileResponse
+
+        parse = RangedFileResponse._parse_range
+        assert parse("bytes=0-99", 1000) == (0, 99)
+        assert parse("bytes=900-", 1000) == (900, 999)
+        assert parse("bytes=-100", 1000) == (900, 999)
+        assert parse("bytes=500-5000", 1000) == (500, 999)
+        assert parse("bytes=1000-", 1000) == "unsatisfiable"
+        # 多段范围和无法解析的请求头按完整文件返回
+        assert parse("bytes=0-1,5-6", 1000) is None
+        assert parse("items=0-1", 1000) is None
+
+    def test_preview_encoding_profiles(self):
+        """测试预览编码配置"""
+        from app.services.audio.encoding_profiles import get_preview_profile
+
+        opus = get_preview_profile("opus")
+        assert opus.output_sample_rate(44100) == 48000
+        assert opus.ffmpeg_args("low")[-2:] == ["-b:a", "48k"]
+        assert get_preview_profile("WAV").ffmpeg_args("high") == ["-c:a", "pcm_s16le"]
+        assert get_preview_profile("aac").extension == "m4a"
+        with pytest.raises(ValueError):
+            get_preview_profile("flac")
+
+    @pytest.mark.asyncio
+    async def test_bulk_import_probes_durations(self, tmp_path):
+        """测试批量导入按实际音频时长排布对话"""
+        from app.services.audio.duration_prober import DurationProber
+        from app.services.audio.source_resolver import ClipSourceResolver
+
+        lengths = {}
+        for i, length in enumerate([1.5, 4.0]):
+            path = tmp_path / f"line{i}.wav"
+            path.write_bytes(b"RIFF")
+            lengths[str(path)] = length
+
+        class FakeFFmpeg:
+            calls = 0
+
+            async def probe_duration(self, file_path):
+                FakeFFmpeg.calls += 1
+                return lengths[file_path]
+
+        prober = DurationProber(ClipSourceResolver(str(tmp_path)), FakeFFmpeg(), concurrency=2)
+        project = await ConversionService(prober).convert_to_standard_format(
+            dialogue_data={"dialogues": [
+                {"character": "张三", "text": "第一句", "file_path": str(tmp_path / "line0.wav")},
+                {"character": "李四", "text": "第二句", "file_path": str(tmp_path / "line1.wav")},
+                {"character": "张三", "text": "第三句", "file_path": str(tmp_path / "line0.wav"), "duration": 2.0},
+            ]},
+            probe_durations=True
+        )
+
+        clips = project.tracks[0].clips
+        assert [clip.duration for clip in clips] == [1.5, 4.0, 2.0]
+        assert [clip.startTime for clip in clips] == [0.0, 2.0, 6.5]
+        # 重复引用的文件只探测一次
+        assert FakeFFmpeg.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_bulk_import_chapter_markers(self, tmp_path):
+        """测试章节标记与按探测时长排布后的片段开始时间一致"""
+        from app.services.audio.duration_prober import DurationProber
+        from app.services.audio.source_resolver import ClipSourceResolver
+
+        path = tmp_path / "line.wav"
+        path.write_bytes(b"RIFF")
+
+        class FakeFFmpeg:
+            async def probe_duration(self, file_path):
+                return 6.0
+
+        prober = DurationProber(ClipSourceResolver(str(tmp_path)), FakeFFmpeg())
+        project = await ConversionService(prober).convert_to_standard_format(
+            dialogue_data={"dialogues": [
+                {"character": "张三", "text": f"第{i}句", "file_path": str(path)} for i in range(25)
+            ]},
+            probe_durations=True
+        )
+
+        clips = project.tracks[0].clips
+        chapters = [marker for marker in project.markers if marker.id.startswith("marker_chapter_")]
+        assert [marker.time for marker in chapters] == [clips[10].startTime, clips[20].startTime]
+        assert chapters[0].time == 65.0
+
+    @pytest.mark.asyncio
+    async def test_ndjson_stream_import(self):
+        """测试 NDJSON 流式导入（记录跨数据块）"""
+        payload = (
+            '{"type": "project", "title": "长篇导入"}\n'
+            '{"type": "dialogue", "character": "张三", "text": "第一句", "file_path": "a", "duration": 2.0}\n'
+            '{"type": "dialogue", "character": "李四", "text": "第二句", "file_path": "b", "duration": 1.0}\n'
+            '\n'
+            '{"type": "environment", "name": "雨声", "file_path": "rain", "duration": 20.0}'
+        ).encode("utf-8")
+
+        async def chunks():
+            for offset in range(0, len(payload), 7):
+                yield payload[offset:offset + 7]
+
+        project = await ConversionService().convert_ndjson_stream(chunks())
+        assert project.project.title == "长篇导入"
+        dialogue_track = project.tracks[0]
+        assert [clip.startTime for clip in dialogue_track.clips] == [0.0, 2.5]
+        assert len(dialogue_track.clips) == 2
+        assert project.tracks[1].clips[0].name == "雨声"
+        assert project.project.totalDuration == 20.0
+
+        async def invalid():
+            yield b'{"type": "dialogue"}\n{"type": "unknown"}\n'
+
+        with pytest.raises(ValueError):
+            await ConversionService().convert_ndjson_stream(invalid())
+
+        # 字段类型错误的记录返回 422 并指出行号
+        import httpx
+        from app.main import app
+
+        body = b'{"type": "dialogue", "text": "ok"}\n{"type": "dialogue", "text": 42}\n'
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/api/v1/multitrack/convert/stream", content=body)
+        assert response.status_code == 422
+        assert "第 2 行" in response.json()["detail"]
+
+    def test_render_quality_profiles(self):
+        """测试渲染质量配置及无 libsoxr 时的回退"""
+        from app.services.audio.render_quality import get_render_quality
+
+        assert "soxr" in get_render_quality("master").resampler_args(soxr_available=True)
+        assert "soxr" not in get_render_quality("master").resampler_args(soxr_available=False)
+        assert get_render_quality("draft").resampler_args(soxr_available=False)
+        with pytest.raises(ValueError):
+            get_render_quality("ultra")
+
+    def test_loudness_normalization_gain(self):
+        """测试 EBU R128 汇总解析与归一化增益"""
+        from app.services.audio.loudness import parse_ebur128_summary, loudness_gain
+
+        summary = parse_ebur128_summary(
+            "  Integrated loudness:\n    I:         -26.0 LUFS\n"
+            "  True peak:\n    Peak:       -12.0 dBFS\n"
+        )
+        assert summary == {"integrated_lufs": -26.0, "true_peak_db": -12.0}
+
+        # 提升 10dB 达到目标响度
+        assert loudness_gain(-26.0, -12.0, target_lufs=-16.0, peak_ceiling_db=-1.0) == pytest.approx(10 ** 0.5)
+        # 真峰值限制提升幅度
+        assert loudness_gain(-26.0, -3.0, target_lufs=-16.0, peak_ceiling_db=-1.0) == pytest.approx(10 ** 0.1)
+        # 没有测量数据时不调整
+        assert loudness_gain(None, None) == 1.0
+
+    def test_working_copy_render_path(self):
+        """测试渲染路径选择：代理文件、工作副本与原始文件"""
+        from app.services.audio.source_resolver import ClipSource
+
+        source = ClipSource("a", "/uploads/a.mp3", proxy_path="/proxies/a.wav",
+                            working_path="/working/a.wav", working_sample_rate=44100)
+        assert source.render_path(use_proxy=True) == "/proxies/a.wav"
+        assert source.render_path(sample_rate=44100) == "/working/a.wav"
+        # 工作副本采样率与渲染采样率不一致时从原始文件重采样
+        assert source.render_path(sample_rate=48000) == "/uploads/a.mp3"
+
+    def test_metrics_exposition(self):
+        """测试指标注册表的 Prometheus 文本输出"""
+        from app.services.metrics import MetricsRegistry
+
+        metrics = MetricsRegistry()
+        calls = metrics.counter("calls_total", "调用次数", ["operation"])
+        wall = metrics.histogram("wall_seconds", "耗时", ["operation"], buckets=(0.1, 1.0))
+        calls.inc(operation="mix")
+        calls.inc(2, operation="mix")
+        wall.observe(0.05, operation="probe")
+        wall.observe(3.0, operation="probe")
+
+        text = metrics.render()
+        assert '# TYPE calls_total counter' in text
+        assert 'calls_total{operation="mix"} 3' in text
+        assert 'wall_seconds_bucket{operation="probe",le="0.1"} 1' in text
+        assert 'wall_seconds_bucket{operation="probe",le="+Inf"} 2' in text
+        assert 'wall_seconds_count{operation="probe"} 2' in text
+        with pytest.raises(ValueError):
+            calls.inc(operation="mix", status="ok")
+        with pytest.raises(ValueError):
+            metrics.counter("calls_total", "重复注册")
+
+    @pytest.mark.asyncio
+    async def test_tracing_spans(self, tmp_path):
+        """测试 span 的父子关系、traceparent 延续与 OTLP/JSON 导出"""
+        from app.services.tracing import Tracer, SpanExporter, parse_traceparent, set_span_attributes
+
+        trace_file = tmp_path / "traces.jsonl"
+        tracer = Tracer(SpanExporter(path=str(trace_file)))
+
+        @tracer.traced("service.render")
+        async def render():
+            set_span_attributes(**{"mix.clip_count": 3})
+            with tracer.span("ffmpeg.mix"):
+                raise RuntimeError("混音失败")
+
+        parent = parse_traceparent("00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01")
+        assert parent == ("4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7")
+        assert parse_traceparent("00-invalid-00f067aa0ba902b7-01") is None
+
+        with pytest.raises(RuntimeError):
+            with tracer.span("POST /preview", kind="server", parent=parent):
+                await render()
+
+        lines = trace_file.read_text(encoding="utf-8").splitlines()
+        spans = {}
+        for line in lines:
+            span = json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+            spans[span["name"]] = span
+        # 子 span 先结束先导出
+        assert list(spans) == ["ffmpeg.mix", "service.render", "POST /preview"]
+        assert {span["traceId"] for span in spans.values()} == {parent[0]}
+        assert spans["POST /preview"]["parentSpanId"] == parent[1]
+        assert spans["ffmpeg.mix"]["parentSpanId"] == spans["service.render"]["spanId"]
+        assert spans["ffmpeg.mix"]["status"]["code"] == "STATUS_CODE_ERROR"
+        assert spans["POST /preview"]["kind"] == "SPAN_KIND_SERVER"
+        assert {"key": "mix.clip_count", "value": {"intValue": "3"}} in spans["service.render"]["attributes"]
+
+    @pytest.mark.asyncio
+    async def test_tracing_middleware_ranged_download(self, workspace, monkeypatch):
+        """测试追踪中间件透传下载接口的 zerocopy 消息并记录状态码"""
+        from app.main import app
+        from app.services.tracing import SpanExporter, tracer
+
+        trace_file = workspace / "traces.jsonl"
+        monkeypatch.setattr(tracer, "exporter", SpanExporter(path=str(trace_file)))
+        record = await self._upload_tone()
+        path = f"/api/v1/audio-files/download/{record['file_id']}"
+
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            if message["type"] == "http.response.zerocopy":
+                # 文件句柄在 send 返回后关闭，这里先读出对应区间
+                os.lseek(message["file"].fileno(), message["offset"], os.SEEK_SET)
+                message = {**message, "body": os.read(message["file"].fileno(), message["count"])}
+            messages.append(message)
+
+        await app({
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+            "root_path": "", "query_string": b"", "client": ("127.0.0.1", 50000), "server": ("test", 80),
+            "headers": [(b"host", b"test"), (b"range", b"bytes=100-199")],
+            "extensions": {"http.response.zerocopy": {}},
+        }, receive, send)
+
+        assert [message["type"] for message in messages] == ["http.response.start", "http.response.zerocopy"]
+        assert messages[0]["status"] == 206
+        with open(record["file_path"], "rb") as f:
+            assert messages[1]["body"] == f.read()[100:200]
+
+        span = json.loads(trace_file.read_text(encoding="utf-8").splitlines()[-1])
+        span = span["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+        assert span["name"] == "GET /api/v1/audio-files/download/{file_id}"
+        assert {"key": "http.response.status_code", "value": {"intValue": "206"}} in span["attributes"]
+
 if __name__ == "__main__":
     pytest.main([__file__]) 
\ No newline at end of file
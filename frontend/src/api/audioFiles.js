@@ -69,8 +69,33 @@ export async function uploadMultipleAudioFiles(files, category = 'dialogue', pro
  * 获取已上传的音频文件列表
  */
 export async function listAudioFiles() {
+  // 逐页拉取全部文件，保持原有返回格式
+  const data = []
+  let cursor = null
+  
+  do {
+    const page = await listAudioFilesPage({ limit: 500, cursor })
+    data.push(...page.data)
+    cursor = page.has_more ? page.next_cursor : null
+  } while (cursor)
+  
+  return { success: true, data }
+}
+
+/**
+ * 分页获取音频文件列表
+ * options: { projectId, category, limit, cursor, fields }
+ */
+export async function listAudioFilesPage({ projectId = null, category = null, limit = 100, cursor = null, fields = null } = {}) {
+  const params = new URLSearchParams()
+  params.append('limit', limit)
+  if (projectId) params.append('project_id', projectId)
+  if (category) params.append('category', category)
+  if (cursor) params.append('cursor', cursor)
+  if (fields) params.append('fields', fields.join(','))
+  
   try {
-    const response = await fetch(`${API_BASE}/list`)
+    const response = await fetch(`${API_BASE}/list?${params}`)
     
     if (!response.ok) {
       throw new Error(`获取文件列表失败: ${response.statusText}`)
@@ -101,6 +126,39 @@ export async function getAudioFileInfo(fileId) {
   }
 }
 
+/**
+ * 查询上传文件的后台分析状态（analyzing/ready/failed）
+ */
+export async function getAudioFileStatus(fileId) {
+  try {
+    const response = await fetch(`${API_BASE}/status/${fileId}`)
+    
+    if (!response.ok) {
+      throw new Error(`获取分析状态失败: ${response.statusText}`)
+    }
+    
+    return await response.json()
+  } catch (error) {
+    console.error('获取音频分析状态失败:', error)
+    throw error
+  }
+}
+
+/**
+ * 轮询直到后台分析结束，返回最终状态数据
+ */
+export async function waitForAudioAnalysis(fileId, { interval = 1000, timeout = 120000 } = {}) {
+  const deadline = Date.now() + timeout
+  while (Date.now() < deadline) {
+    const result = await getAudioFileStatus(fileId)
+    if (result.data.status !== 'analyzing') {
+      return result.data
+    }
+    await new Promise(resolve => setTimeout(resolve, interval))
+  }
+  throw new Error('音频分析超时')
+}
+
 /**
  * 获取音频文件波形数据
  */
@@ -198,17 +256,17 @@ export async function downloadAudioFile(fileId) {
 /**
  * 裁剪音频文件
  */
-export async function trimAudioFile(fileId, startTime, duration) {
+export async function trimAudioFile(fileId, startTime, duration, mode = 'accurate') {
+  // 接口参数为查询参数；相同参数的裁剪结果由后端缓存复用
+  const params = new URLSearchParams({
+    start_time: startTime,
+    duration: duration,
+    mode
+  })
+  
   try {
-    const response = await fetch(`${API_BASE}/trim/${fileId}`, {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json'
-      },
-      body: JSON.stringify({
-        start_time: startTime,
-        duration: duration
-      })
+    const response = await fetch(`${API_BASE}/trim/${fileId}?${params}`, {
+      method: 'POST'
     })
     
     if (!response.ok) {
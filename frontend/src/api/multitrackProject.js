@@ -18,6 +18,12 @@ export async function saveProject(projectId, projectData) {
   return res.data
 }
 
+// 增量修改：operations 为 move_clip / set_volume / add_clip / remove_clip / reorder_tracks 操作列表
+export async function patchProject(projectId, operations, baseRevision = null) {
+  const res = await axios.patch(`${API_BASE}/patch/${projectId}`, { operations, baseRevision })
+  return res.data
+}
+
 export async function listProjects() {
   const res = await axios.get(`${API_BASE}/list`)
   return res.data
@@ -34,6 +40,32 @@ export async function convertToStandardFormat(conversionData) {
   return res.data
 }
 
+// 服务端一步完成转换、保存和（可选）导出，只返回项目ID和导出任务ID
+export async function generateProject(conversionData, { exportAudio = false, normalizeLoudness = false, renderQuality = null } = {}) {
+  const params = {}
+  if (exportAudio) {
+    params.export = true
+  }
+  if (normalizeLoudness) {
+    params.normalize_loudness = true
+  }
+  if (renderQuality) {
+    params.render_quality = renderQuality
+  }
+  const res = await axios.post(`${API_BASE}/generate`, conversionData, { params })
+  return res.data
+}
+
+// 流式导入：body 为 NDJSON 文本或 Blob（每行一条 project/dialogue/environment/background 记录）
+export async function importProjectStream(body, { probeDurations = false } = {}) {
+  const params = probeDurations ? { probe_durations: true } : {}
+  const res = await axios.post(`${API_BASE}/convert/stream`, body, {
+    params,
+    headers: { 'Content-Type': 'application/x-ndjson' }
+  })
+  return res.data
+}
+
 // 项目验证接口
 export async function validateProject(projectId) {
   const res = await axios.get(`${API_BASE}/validate/${projectId}`)
@@ -41,8 +73,12 @@ export async function validateProject(projectId) {
 }
 
 // 导出相关接口
-export async function exportProject(projectId) {
-  const res = await axios.post(`${API_BASE}/export/${projectId}`)
+export async function exportProject(projectId, { normalizeLoudness = false, renderQuality = null } = {}) {
+  const params = normalizeLoudness ? { normalize_loudness: true } : {}
+  if (renderQuality) {
+    params.render_quality = renderQuality
+  }
+  const res = await axios.post(`${API_BASE}/export/${projectId}`, null, { params })
   return res.data
 }
 
@@ -68,11 +104,31 @@ export async function downloadExportedAudio(exportTaskId) {
 }
 
 // 预览播放相关接口
-export async function generatePreviewAudio(projectId, startTime = 0, duration = null) {
+// 浏览器支持时使用压缩预览（Opus 优先，其次 AAC），传输量约为 WAV 的 1/10
+export function pickPreviewFormat() {
+  const audio = document.createElement('audio')
+  if (audio.canPlayType('audio/ogg; codecs="opus"')) return 'opus'
+  if (audio.canPlayType('audio/mp4; codecs="mp4a.40.2"')) return 'aac'
+  return 'wav'
+}
+
+export async function generatePreviewAudio(projectId, startTime = 0, duration = null, { format = null, quality = null, normalizeLoudness = false, renderQuality = null } = {}) {
   const params = { start_time: startTime }
   if (duration !== null) {
     params.duration = duration
   }
+  if (format) {
+    params.format = format
+  }
+  if (quality) {
+    params.quality = quality
+  }
+  if (normalizeLoudness) {
+    params.normalize_loudness = true
+  }
+  if (renderQuality) {
+    params.render_quality = renderQuality
+  }
   
   const res = await axios.post(`${API_BASE}/preview/${projectId}`, null, { params })
   return res.data
@@ -103,7 +159,8 @@ export function createEmptyProject(title = '新建项目') {
       bitDepth: 16,
       exportFormat: 'wav',
       createdAt: null,
-      version: '1.0'
+      version: '1.0',
+      revision: 0
     },
     tracks: [
       {